@@ -0,0 +1,138 @@
+"""
+sanitize_text のマイクロベンチマーク
+
+書き換え前の実装（re.sub を十数回＋1文字ずつの unicodedata.category）と
+現在の実装を、チャットでよくある行のコーパスで比べる。
+出力が一致することも確かめる。
+
+使い方（pyfiles ディレクトリで）:
+    python benchmarks/bench_sanitize.py [--number 2000]
+"""
+import argparse
+import re
+import sys
+import timeit
+import unicodedata
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.tts import sanitize_text  # noqa: E402
+
+CORPUS = [
+    "おはよう",
+    "おはようございます！今日もよろしくお願いします",
+    "www",
+    "草",
+    "それな〜",
+    "今からマイクラ入るね",
+    "<@123456789012345678> これ見て https://example.com/watch?v=abc123&t=42s",
+    "<@!234567890123456789> おつかれさま〜🎉🎉",
+    "<#345678901234567890> に貼っておいたよ",
+    "<:flan_smile:456789012345678901> <a:flan_dance:567890123456789012>",
+    "えっ、まじで！？(笑)",
+    "やばすぎるｗｗｗｗ😂😂😂",
+    "明日の20:00からイベントやります！参加できる人は👍つけてね",
+    "3 + 4 = 7 だよ、あと10% オフ",
+    "C:\\Users\\flan\\Desktop\\test.txt を開いて",
+    "【告知】新しいサーバーを立てました！ https://discord.gg/abcdef",
+    "ｷﾀ━━━━(ﾟ∀ﾟ)━━━━!!",
+    "今日はいい天気ですね。明日も晴れるといいな。",
+    "#雑談 @everyone 見てる？",
+    "`print(\"hello\")` って書けば動くよ",
+    "お疲れ様でした～！また明日！！",
+    "レッドストーン回路むずかしすぎる…",
+    "ダイヤ見つけた💎💎💎",
+    "あれ？ {config} の値が [null] になってる",
+    "~~取り消し線~~ と **太字** と __下線__",
+    "あ" * 120,
+    "Hello, world! This is an English message with some punctuation.",
+    "そうなの？そうなのだ！ｿｰﾅﾉﾀﾞｰ",
+    "🍰🍰🍰 ケーキ食べたい 🍰🍰🍰",
+    "<@123456789012345678><@234567890123456789> 二人ともありがとう♡",
+]
+
+
+class _Member:
+    def __init__(self, name):
+        self.display_name = name
+
+
+class _Guild:
+    def __init__(self):
+        self._members = {
+            123456789012345678: _Member("ふらん"),
+            234567890123456789: _Member("れみりあ🦇"),
+        }
+
+    def get_member(self, uid):
+        return self._members.get(uid)
+
+
+def legacy_sanitize_text(text: str, guild=None) -> str:
+    """書き換え前の sanitize_text"""
+    text = re.sub(r'https?://\S+', '', text)
+
+    def repl_mention(match):
+        if guild:
+            uid = int(match.group(1))
+            m = guild.get_member(uid)
+            if m:
+                return m.display_name + "さん"
+            return ""
+        return ""
+
+    text = re.sub(r'<@!?(\d+)>', repl_mention, text)
+    text = re.sub(r'<#\d+>', '', text)
+    text = re.sub(r'<a?:\w+:\d+>', '', text)
+    text = ''.join(
+        ch for ch in text
+        if unicodedata.category(ch)[0] != 'S'
+    )
+    text = re.sub(r'[\[\]{}()<>]', '', text)
+    text = re.sub(r'[=+*/^_|~`]', '', text)
+    text = re.sub(r'[@#$%&]', '', text)
+    text = re.sub(r'[¥\\]', '', text)
+    text = re.sub(r'[、。，。.!?!？;:,\'"\"\'"`]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    if not text or len(text.strip()) < 1:
+        return ""
+    return text[:200]
+
+
+def run(func, guild):
+    for line in CORPUS:
+        func(line, guild)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="コーパスを回す回数")
+    args = parser.parse_args()
+
+    guild = _Guild()
+
+    mismatches = [
+        (line, legacy_sanitize_text(line, guild), sanitize_text(line, guild))
+        for line in CORPUS
+        if legacy_sanitize_text(line, guild) != sanitize_text(line, guild)
+    ]
+    for line, old, new in mismatches:
+        print(f"出力が異なる: {line!r}\n  旧: {old!r}\n  新: {new!r}")
+
+    calls = args.number * len(CORPUS)
+    results = {}
+    for name, func in (("legacy", legacy_sanitize_text), ("current", sanitize_text)):
+        seconds = min(timeit.repeat(
+            lambda: run(func, guild), number=args.number, repeat=3
+        ))
+        results[name] = seconds
+        print(f"{name:8s}: {seconds * 1e6 / calls:7.2f} µs/行 ({calls} 行)")
+
+    print(f"speedup : {results['legacy'] / results['current']:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
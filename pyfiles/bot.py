@@ -6,17 +6,52 @@ Discord botのメインクラス
 """
 import discord
 from discord.ext import commands
+import os
 import sys
 import asyncio
-import aiosqlite
-import os
+from typing import Awaitable, Callable, Dict, Optional, Set
 
 from .commands.images import images
 from .services.logger import logger
-from .services.tts import sanitize_text, tts_worker
+from .services.tts import (
+    sanitize_text,
+    sanitize_sentences,
+    enqueue_tts,
+    announcement_text,
+    schedule_prerender,
+    get_tts_dictionary,
+    warm_up_engines
+)
+from .services.storage import AsyncTTSDictStorage, tts_dict_storage
 from .services.storage.tts_settings import TTSSettingsStorage
 from .services.storage.init_db import DBInitializer
+from .services.storage.database import Database, get_database, close_all as close_databases
 from .services.voicevox import VoicevoxEngine
+from .services.audio_cache import AudioCache, DiskAudioCache, flush_index_periodically
+from .services.audio import encode_opus, load_opus, opus_available
+from .services.tts_pool import OpenJTalkPool
+from .services.tts_frontend import LabelCache
+from .services.tts_scheduler import SynthesisScheduler
+from .services.reply_cache import MessageAuthorCache, resolve_reply_author
+from .services.voice_text_index import VoiceTextIndex
+from .services.tts_dictionary import TTSDictionary
+from .services.tts_queue import TTSQueue
+from .config import (
+    DB_PATH,
+    LEGACY_DB_PATH,
+    TTS_PREFETCH,
+    TTS_WORKERS,
+    TTS_OPENJTALK_CONCURRENCY,
+    TTS_VOICEVOX_CONCURRENCY,
+    TTS_VOICEVOX_TIMEOUT,
+    TTS_CACHE_BYTES,
+    TTS_DISK_CACHE_DIR,
+    TTS_DISK_CACHE_BYTES,
+    TTS_DISK_CACHE_WARM,
+    TTS_WARMUP_TIMEOUT,
+    TTS_REPLY_FETCH_TIMEOUT,
+    TTS_REPLY_FETCH_BACKLOG
+)
 
 # Windows対応
 if sys.platform == "win32":
@@ -25,6 +60,55 @@ if sys.platform == "win32":
 # コマンドモジュールをインポート
 from .commands import help, admin, fun, voices, minecraft_discord
 
+class TTSBot(commands.Bot):
+    """
+    読み上げの状態を属性に持つ Bot
+
+    属性は FlandreBot の __init__ と setup_hook で設定する（ここでは型だけ宣言する）。
+    close では Discord から切断したあとに cleanup を呼ぶ
+    """
+
+    tts_queues: Dict[int, TTSQueue]
+    tts_tasks: Dict[int, asyncio.Task]
+    manual_disconnect: Set[int]
+    skip_flags: Dict[int, bool]
+    playback_queues: Dict[int, asyncio.Queue]
+    tts_streams: Dict[int, asyncio.Task]
+    tts_prefetch: int
+    audio_cache: AudioCache
+    tts_frontend: LabelCache
+    prerender_tasks: Dict[int, asyncio.Task]
+    member_prerender_tasks: Dict[int, Set[asyncio.Task]]
+    tts_ready: asyncio.Event
+    tts_dictionaries: Dict[int, TTSDictionary]
+    message_authors: MessageAuthorCache
+    voice_text_index: VoiceTextIndex
+    watchdog_tasks: Dict[int, asyncio.Task]
+
+    # setup_hook で設定するもの
+    db: Database
+    db_initializer: DBInitializer
+    tts_settings_storage: TTSSettingsStorage
+    tts_dict_storage: AsyncTTSDictStorage
+    disk_cache: DiskAudioCache
+    disk_cache_flusher: asyncio.Task
+    tts_pool: OpenJTalkPool
+    tts_scheduler: SynthesisScheduler
+    voicevox: VoicevoxEngine
+
+    def __init__(self, *args,
+                 cleanup: Optional[Callable[[], Awaitable[None]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cleanup = cleanup
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            if self._cleanup is not None:
+                await self._cleanup()
+
+
 class FlandreBot:
     """ふらんちゃんbotのメインクラス"""
     
@@ -44,10 +128,12 @@ class FlandreBot:
         intents.message_content = True
         
         # Bot作成
-        self.bot = commands.Bot(
+        # 終了時の後片付けはイベントループが止まる前に（close の中で）行う
+        self.bot = TTSBot(
             command_prefix="!",
             intents=intents,
-            help_command=None
+            help_command=None,
+            cleanup=self._cleanup
         )
 
         self._setup_events()
@@ -57,6 +143,16 @@ class FlandreBot:
         self.bot.manual_disconnect = set()
         self.bot.skip_flags = {}  # ギルドごとのスキップフラグ
         self.bot.playback_queues = {}  # ギルドごとの合成済み再生キュー
+        self.bot.tts_streams = {}  # ギルドごとの合成中のメッセージ（/skip で止める）
+        self.bot.tts_prefetch = TTS_PREFETCH  # 先読み合成するクリップ数
+        self.bot.audio_cache = AudioCache(TTS_CACHE_BYTES)  # 合成済み音声キャッシュ
+        self.bot.tts_frontend = LabelCache()  # プールを使わないときの OpenJTalk テキスト解析結果キャッシュ
+        self.bot.prerender_tasks = {}  # ギルドごとのアナウンス先読みタスク
+        self.bot.member_prerender_tasks = {}  # ギルドごとのメンバー単位の先読みタスク
+        self.bot.tts_ready = asyncio.Event()  # TTS エンジンのウォームアップ完了
+        self.bot.tts_dictionaries = {}  # ギルドごとの TTS 辞書（置換オートマトン）
+        self.bot.message_authors = MessageAuthorCache()  # リプライ先の発言者名
+        self.bot.voice_text_index = VoiceTextIndex()  # 読み上げ対象チャンネル -> VC
 
     def _setup_events(self):
         """イベントハンドラの登録"""
@@ -70,16 +166,56 @@ class FlandreBot:
         async def setup_hook():
             """Bot初期化時の処理"""
             
-            db_path = os.getenv("DB_PATH") or "flandre_bot.db"
-            self.bot.db = await aiosqlite.connect(db_path)
+            # 全てのストレージで共有する接続プール（DB_PATH は環境変数で変更できる）
+            self.bot.db = get_database(DB_PATH)
 
-            self.bot.db_initializer = DBInitializer(db_path)
+            self.bot.db_initializer = DBInitializer(DB_PATH)
             await self.bot.db_initializer.init()
+            await self._import_legacy_db()
             
-            self.bot.tts_settings_storage = TTSSettingsStorage(db_path)
+            # TTS設定は全ギルドぶんメモリに読み込む（失敗してもギルドごとに読み直す）
+            self.bot.tts_settings_storage = TTSSettingsStorage(DB_PATH)
+            try:
+                loaded = await asyncio.wait_for(
+                    self.bot.tts_settings_storage.load_all(),
+                    TTSSettingsStorage.LOAD_TIMEOUT
+                )
+                logger.info(f"TTS設定: {loaded} ギルドぶん読み込みました")
+            except Exception as e:
+                logger.warning(f"TTS設定の一括読み込み失敗: {e!r}")
+            self.bot.tts_dict_storage = tts_dict_storage
             
-            # これを追加
-            self.bot.voicevox = VoicevoxEngine()
+            # ディスクキャッシュを開いて頻出フレーズをメモリに読み込む
+            self.bot.disk_cache = await asyncio.to_thread(
+                DiskAudioCache, TTS_DISK_CACHE_DIR, TTS_DISK_CACHE_BYTES
+            )
+            # Opus は先に読み込んでおき、キャッシュにはエンコード済みのクリップを置く
+            if not await asyncio.to_thread(load_opus):
+                logger.warning("Opus ライブラリを読み込めませんでした（PCM のままキャッシュします）")
+            warmed = await asyncio.to_thread(
+                self.bot.disk_cache.warm, self.bot.audio_cache, TTS_DISK_CACHE_WARM,
+                encode_opus if opus_available() else None
+            )
+            logger.info(f"音声キャッシュ: ディスクから {warmed} 件読み込みました")
+            # ヒット回数などのインデックスは定期的にスレッドで書き出す
+            self.bot.disk_cache_flusher = asyncio.create_task(
+                flush_index_periodically(self.bot.disk_cache)
+            )
+
+            # OpenJTalk 合成用のプロセスプール
+            self.bot.tts_pool = OpenJTalkPool(TTS_WORKERS or None)
+            logger.info(f"OpenJTalk ワーカー: {self.bot.tts_pool.workers} プロセス")
+
+            # 全ギルド共通の合成スケジューラ（エンジンごとの同時実行上限）
+            self.bot.tts_scheduler = SynthesisScheduler({
+                "openjtalk": TTS_OPENJTALK_CONCURRENCY or self.bot.tts_pool.workers,
+                "voicevox": TTS_VOICEVOX_CONCURRENCY,
+            })
+
+            # VOICEVOX の接続プールはスケジューラの同時実行数と同じ大きさにする
+            self.bot.voicevox = VoicevoxEngine(
+                pool_size=TTS_VOICEVOX_CONCURRENCY, timeout=TTS_VOICEVOX_TIMEOUT
+            )
             self.watchdog_tasks = {}
             self.bot.watchdog_tasks = {}
             self.bot.tts_tasks = {}
@@ -87,68 +223,75 @@ class FlandreBot:
             self.bot.manual_disconnect = set()
 
             self._setup_commands()
-            await self.bot.tree.sync()
+
+            # コマンドの同期とエンジンのウォームアップを並行して行う
+            await asyncio.gather(
+                self.bot.tree.sync(),
+                warm_up_engines(self.bot, TTS_WARMUP_TIMEOUT)
+            )
 
         @self.bot.event
         async def on_message(message: discord.Message):
             
-            if message.author.bot:
-                return
-
             if not message.guild:
                 return
 
-            # 発言者がVC参加中か（B）
-            if not message.author.voice or not message.author.voice.channel:
-                return
+            # リプライ先の発言者名の解決用に覚えておく（Botの発言も対象）
+            self.bot.message_authors.remember_message(message)
 
-            user_vc = message.author.voice.channel
+            if message.author.bot:
+                return
 
             # ===== A: このチャンネルがVCテキストか判定 =====
-            # Discordの仕様上、VCテキストは
-            # 「同名のVCが存在するテキストチャンネル」として扱われる
-
-            matching_vc = discord.utils.get(
-                message.guild.voice_channels,
-                name=message.channel.name
+            # VC組み込みのテキストチャット、または同名のVCが存在するテキストチャンネル
+            voice_channel_id = self.bot.voice_text_index.voice_channel_id(
+                message.guild, message.channel.id
             )
-
-            if not matching_vc:
+            if voice_channel_id is None:
                 return
 
-            # 同名VCがあっても、参加中VCと一致しなければ無効
-            if matching_vc.id != user_vc.id:
+            # 発言者がそのVCに参加中か（B）
+            voice = message.author.voice
+            if not voice or not voice.channel or voice.channel.id != voice_channel_id:
                 return
 
             gid = message.guild.id
-            settings = await self.bot.tts_settings_storage.get(gid)
+            settings = self.bot.tts_settings_storage.get_cached(gid)
 
             if not settings or not settings.get("enabled", False):
                 return
 
-            # リプライ情報
+            # リプライ情報（手元で分からなければ REST、キューが詰まっていれば省略）
             reply_prefix = ""
             if message.reference:
+                queue = self.bot.tts_queues.get(gid)
+                backlog = queue.qsize() if queue is not None else 0
                 try:
-                    replied_msg = await message.channel.fetch_message(
-                        message.reference.message_id
+                    author_name = await resolve_reply_author(
+                        message,
+                        self.bot.message_authors,
+                        fetch=backlog < TTS_REPLY_FETCH_BACKLOG,
+                        timeout=TTS_REPLY_FETCH_TIMEOUT
                     )
-                    if replied_msg and replied_msg.author:
-                        reply_prefix = (
-                            f"{replied_msg.author.display_name}さんへのリプライ。"
-                        )
+                    if author_name:
+                        reply_prefix = f"{sanitize_text(author_name)}さんへのリプライ。"
                 except Exception as e:
                     logger.debug(f"リプライ情報取得エラー: {e}")
 
             # メッセージ本文取得
             content = message.content or ""
 
-            # サニタイズ
+            # 辞書の適用とサニタイズ（文の区切りは TTS ワーカーでのチャンク分割用に残す）
+            # 辞書は記号を含む表記（C++ など）にも当たるよう、サニタイズの前に適用する。
+            # 済んでいれば TTS ワーカーでは辞書の適用もサニタイズもし直さない
             try:
-                sanitized = sanitize_text(content, message.guild)
+                dictionary = await get_tts_dictionary(self.bot, gid)
+                sanitized = sanitize_sentences(dictionary.apply(content), message.guild)
+                is_sanitized = True
             except Exception as e:
                 logger.debug(f"sanitizeエラー: {e}")
                 sanitized = content
+                is_sanitized = False
 
             if not sanitized:
                 return
@@ -161,16 +304,31 @@ class FlandreBot:
 
             text = reply_prefix + sanitized + suffix
 
-            # TTSキュー初期化
-            if gid not in self.bot.tts_queues:
-                self.bot.tts_queues[gid] = asyncio.Queue()
-                self.bot.tts_tasks[gid] = self.bot.loop.create_task(
-                    tts_worker(self.bot, gid)
-                )
-
-            await self.bot.tts_queues[gid].put((text, message.author.id))
+            # TTSキューに追加（キュー・ワーカーが無ければ作る）
+            await enqueue_tts(
+                self.bot, gid, text, message.author.id, settings,
+                sanitized=is_sanitized
+            )
             logger.debug(f"[Guild {gid}] TTS キューに追加: {text[:5]}...")
 
+        @self.bot.event
+        async def on_guild_channel_create(channel):
+            self.bot.voice_text_index.refresh(channel.guild)
+
+        @self.bot.event
+        async def on_guild_channel_delete(channel):
+            self.bot.voice_text_index.refresh(channel.guild)
+
+        @self.bot.event
+        async def on_guild_channel_update(before, after):
+            # 名前が変わったときだけ対応関係が変わる
+            if before.name != after.name:
+                self.bot.voice_text_index.refresh(after.guild)
+
+        @self.bot.event
+        async def on_guild_remove(guild):
+            self.bot.voice_text_index.discard(guild.id)
+
         @self.bot.event
         async def on_voice_state_update(member, before, after):
             """ユーザーの VC 参加/退出を監視して読み上げる
@@ -193,29 +351,59 @@ class FlandreBot:
             # 退出: before が bot_chan で after が bot_chan ではない
             left = (before.channel == bot_chan) and (after.channel != bot_chan)
 
+            # VCにいる人のアナウンスを先読みしておく。表示名の変更は members
+            # インテントなしでは届かないので、ミュートなどの状態変化のたびに作り直す
+            # （キャッシュキーに表示名が入るので、変わっていなければ何もしない）
+            if after.channel and not joined:
+                schedule_prerender(self.bot, member.guild, members=[member])
+
             if not (joined or left):
                 return
 
             gid = member.guild.id
-            settings = await self.bot.tts_settings_storage.get(gid)
+            settings = self.bot.tts_settings_storage.get_cached(gid)
             if not settings["enabled"]:
                 return
 
-            if joined:
-                text = f"{member.display_name}さんが接続しました"
-            else:
-                text = f"{member.display_name}さんが退出しました"
+            text = announcement_text(member, joined)
 
             # キューとワーカーを確保して enqueue
-            if gid not in self.bot.tts_queues:
-                self.bot.tts_queues[gid] = asyncio.Queue()
-                self.bot.tts_tasks[gid] = self.bot.loop.create_task(
-                    tts_worker(self.bot, gid)
-                )
-
-            await self.bot.tts_queues[gid].put((text, member.id))
+            await enqueue_tts(self.bot, gid, text, member.id, settings)
             logger.info(f"[Guild {gid}] VC イベント読み上げキュー追加: {text}")
 
+    async def _import_legacy_db(self):
+        """以前の既定の DB（flandre_bot.db）に残っている音声設定と TTS 設定を取り込む"""
+        if not LEGACY_DB_PATH or not os.path.exists(LEGACY_DB_PATH):
+            return
+        if os.path.abspath(DB_PATH) == LEGACY_DB_PATH:
+            return
+
+        try:
+            imported = await self.bot.db_initializer.import_legacy(LEGACY_DB_PATH)
+        except Exception as e:
+            logger.warning(
+                f"{LEGACY_DB_PATH} の音声設定・TTS設定を {DB_PATH} に取り込めませんでした: {e!r}"
+                "（環境変数 DB_PATH で使う DB を指定してください）"
+            )
+            return
+        if imported:
+            logger.info(f"{LEGACY_DB_PATH} から音声設定・TTS設定を {imported} 件取り込みました")
+
+    async def _cleanup(self):
+        """Bot終了時の処理（Discord から切断したあと、HTTP セッションを閉じてキャッシュを書き出す）"""
+        voicevox = getattr(self.bot, "voicevox", None)
+        if voicevox is not None:
+            logger.info(f"VOICEVOX 接続: {voicevox.stats()}")
+            await voicevox.close()
+
+        # 最後の書き出し以降の更新を失わないよう、インデックスを書き出しておく
+        flusher = getattr(self.bot, "disk_cache_flusher", None)
+        if flusher is not None:
+            flusher.cancel()
+        disk_cache = getattr(self.bot, "disk_cache", None)
+        if disk_cache is not None:
+            await asyncio.to_thread(disk_cache.save_index)
+
     def _setup_commands(self):
         """各モジュールのコマンドを登録"""
         help.setup_commands(self.bot)
@@ -227,4 +415,14 @@ class FlandreBot:
     
     def run(self):
         """Botを起動"""
-        self.bot.run(self.token)
+        try:
+            self.bot.run(self.token)
+        finally:
+            tts_pool = getattr(self.bot, "tts_pool", None)
+            if tts_pool:
+                tts_pool.shutdown()
+            # _cleanup のあとに終わったディスクへの書き込みのぶんも残す
+            disk_cache = getattr(self.bot, "disk_cache", None)
+            if disk_cache is not None and disk_cache.dirty:
+                disk_cache.save_index()
+            close_databases()
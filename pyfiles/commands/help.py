@@ -58,6 +58,11 @@ def setup_commands(bot):
             value="現在再生中・待機中のTTS読み上げをスキップ", 
             inline=False
         )
+        embed2.add_field(
+            name="/tts_queue 件数 秒数 動作（管理者専用）", 
+            value="読み上げ待ちの上限件数・有効期限・あふれたときの動作を設定\n例: `/tts_queue max_size:10 ttl:30`", 
+            inline=False
+        )
         
         embed2.add_field(name="━━ TTS辞書管理（管理者専用）━━", value="", inline=False)
         embed2.add_field(
@@ -1,10 +1,12 @@
 import discord
 from discord import app_commands
 import asyncio
-from ...services.permission import can_use_vc
+from typing import Optional
+from ...services.permission import can_use_vc, is_admin_or_dev
 from ...services.storage import vc_allow_storage
-from ...services.tts import tts_worker
+from ...services.tts import ensure_tts_worker, schedule_prerender, skip_tts
 from ...services.logger import logger
+from ...services.tts_queue import DROP_OLDEST, DROP_NEWEST, PER_USER
 from .watchdog import vc_watchdog
 
 
@@ -16,9 +18,9 @@ def setup_commands(bot):
         await interaction.response.defer()
 
         gid = interaction.guild.id
-        allow_data = vc_allow_storage.load(gid)
+        permissions = await vc_allow_storage.permissions(gid)
 
-        if not can_use_vc(interaction, allow_data):
+        if not can_use_vc(interaction, permissions):
             await interaction.followup.send("権限がありません", ephemeral=True)
             return
 
@@ -42,14 +44,17 @@ def setup_commands(bot):
             vc_watchdog(bot, gid)
         )
 
+        # 参加/退出アナウンスをバックグラウンドで先読み
+        schedule_prerender(bot, interaction.guild, channel)
+
         await interaction.followup.send(f"「{channel}」に参加しました")
 
     @bot.tree.command(name="leave", description="VC退出")
     async def leave(interaction: discord.Interaction):
         gid = interaction.guild.id
-        allow_data = vc_allow_storage.load(gid)
+        permissions = await vc_allow_storage.permissions(gid)
 
-        if not can_use_vc(interaction, allow_data):
+        if not can_use_vc(interaction, permissions):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
@@ -73,15 +78,21 @@ def setup_commands(bot):
             bot.watchdog_tasks[gid].cancel()
             del bot.watchdog_tasks[gid]
 
+        prerender = bot.prerender_tasks.pop(gid, None)
+        if prerender:
+            prerender.cancel()
+        for task in bot.member_prerender_tasks.pop(gid, ()):
+            task.cancel()
+
         await interaction.response.send_message("VCから退出しました")
         logger.info(f"/leave: {interaction.user} left VC")
 
     @bot.tree.command(name="skip", description="TTS再生をスキップ")
     async def skip(interaction: discord.Interaction):
         gid = interaction.guild.id
-        allow_data = vc_allow_storage.load(gid)
+        permissions = await vc_allow_storage.permissions(gid)
 
-        if not can_use_vc(interaction, allow_data):
+        if not can_use_vc(interaction, permissions):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
@@ -94,15 +105,8 @@ def setup_commands(bot):
             await interaction.response.send_message("再生中ではありません", ephemeral=True)
             return
 
-        vc.stop()
-
-        queue = bot.tts_queues.get(gid)
-        if queue:
-            while not queue.empty():
-                try:
-                    queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
+        # 合成中のメッセージの残りと、未合成・合成済みのキューをまとめて捨てて再生を止める
+        skip_tts(bot, gid, vc)
 
         await interaction.response.send_message("TTS再生をスキップしました")
         logger.info(f"/skip: {interaction.user} skipped TTS in guild {gid}")
@@ -110,9 +114,9 @@ def setup_commands(bot):
     @bot.tree.command(name="tts_on", description="TTS読み込みを有効化")
     async def tts_on(interaction: discord.Interaction):
         gid = interaction.guild.id
-        allow_data = vc_allow_storage.load(gid)
+        permissions = await vc_allow_storage.permissions(gid)
 
-        if not can_use_vc(interaction, allow_data):
+        if not can_use_vc(interaction, permissions):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
@@ -123,13 +127,7 @@ def setup_commands(bot):
 
         await bot.tts_settings_storage.set_enabled(gid, True)
 
-        if gid not in bot.tts_queues:
-            bot.tts_queues[gid] = asyncio.Queue()
-
-        if gid not in bot.tts_tasks:
-            bot.tts_tasks[gid] = bot.loop.create_task(
-                tts_worker(bot, gid)
-            )
+        await ensure_tts_worker(bot, gid)
 
         await interaction.response.send_message("TTS読み込みを有効化しました")
         logger.info(f"/tts_on: {interaction.user} enabled TTS in guild {gid}")
@@ -137,9 +135,9 @@ def setup_commands(bot):
     @bot.tree.command(name="tts_off", description="TTS読み込みを無効化")
     async def tts_off(interaction: discord.Interaction):
         gid = interaction.guild.id
-        allow_data = vc_allow_storage.load(gid)
+        permissions = await vc_allow_storage.permissions(gid)
 
-        if not can_use_vc(interaction, allow_data):
+        if not can_use_vc(interaction, permissions):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
@@ -159,7 +157,63 @@ def setup_commands(bot):
         await interaction.response.send_message("TTS読み込みを無効化しました")
         logger.info(f"/tts_off: {interaction.user} disabled TTS in guild {gid}")
 
-    @bot.event
+    @bot.tree.command(name="tts_queue", description="TTSキューの上限・有効期限・あふれたときの動作を設定")
+    @app_commands.describe(
+        max_size="キューの最大件数（1〜100）",
+        ttl="この秒数より古いメッセージは読み上げずに捨てる（5〜600）",
+        policy="キューがあふれたときの動作"
+    )
+    @app_commands.choices(policy=[
+        app_commands.Choice(name="一番古いものを捨てる", value=DROP_OLDEST),
+        app_commands.Choice(name="新しく来たものを捨てる", value=DROP_NEWEST),
+        app_commands.Choice(name="同じ人の古いものを捨てる", value=PER_USER),
+    ])
+    async def tts_queue(
+        interaction: discord.Interaction,
+        max_size: Optional[int] = None,
+        ttl: Optional[int] = None,
+        policy: Optional[app_commands.Choice[str]] = None
+    ):
+        if not is_admin_or_dev(interaction):
+            await interaction.response.send_message("権限がありません", ephemeral=True)
+            return
+
+        if not interaction.guild:
+            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            return
+        gid = interaction.guild.id
+        settings = await bot.tts_settings_storage.get(gid)
+
+        if max_size is not None and not (1 <= max_size <= 100):
+            await interaction.response.send_message("max_sizeは1〜100", ephemeral=True)
+            return
+        if ttl is not None and not (5 <= ttl <= 600):
+            await interaction.response.send_message("ttlは5〜600", ephemeral=True)
+            return
+
+        new_max = max_size if max_size is not None else settings["queue_max"]
+        new_ttl = float(ttl) if ttl is not None else settings["queue_ttl"]
+        new_policy = policy.value if policy is not None else settings["overflow_policy"]
+
+        await bot.tts_settings_storage.set_queue_policy(gid, new_max, new_ttl, new_policy)
+
+        # 動いているキューにもすぐ反映する
+        queue = bot.tts_queues.get(gid)
+        dropped = {}
+        if queue:
+            queue.configure(new_max, new_ttl, new_policy)
+            dropped = dict(queue.dropped)
+
+        await interaction.response.send_message(
+            f"TTSキュー設定: 最大 {new_max} 件 / {new_ttl:g} 秒 / {new_policy}\n"
+            f"これまでに捨てた件数: あふれ {dropped.get('overflow', 0)} 件・"
+            f"期限切れ {dropped.get('expired', 0)} 件",
+            ephemeral=True
+        )
+        logger.info(f"/tts_queue: {interaction.user} set queue policy in guild {gid}")
+
+    # bot.py 側の読み上げ用 on_voice_state_update を上書きしないようリスナーで登録
+    @bot.listen("on_voice_state_update")
     async def on_voice_state_update(member, before, after):
 
         if member.id != bot.user.id:
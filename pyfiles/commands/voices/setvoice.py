@@ -1,6 +1,7 @@
 import discord
 from discord import app_commands
 from ...services.logger import logger
+from ...services.tts import schedule_prerender
 
 
 def setup_commands(bot):
@@ -130,6 +131,9 @@ def setup_commands(bot):
             current_pitch
         )
 
+        # 新しい声でアナウンスを作り直しておく
+        schedule_prerender(interaction.client, interaction.guild, members=[interaction.user])
+
         await interaction.response.send_message("音声設定を更新しました")
 
     @bot.tree.command(name="setmembervoice", description="メンバーの音声設定を変更")
@@ -211,6 +215,8 @@ def setup_commands(bot):
             current_pitch
         )
 
+        schedule_prerender(interaction.client, interaction.guild, members=[member])
+
         await interaction.response.send_message(
             f"{member.display_name} の音声設定を更新しました"
         )
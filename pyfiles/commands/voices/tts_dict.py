@@ -8,6 +8,7 @@ import discord
 from discord import app_commands
 from ...services.permission import is_admin_or_dev
 from ...services.storage import tts_dict_storage
+from ...services.tts import update_tts_dictionary
 
 def setup_commands(bot):
     @bot.tree.command(name="tts_dict_add", description="TTS辞書に単語を追加（読み方を指定して読み上げを制御）")
@@ -24,6 +25,11 @@ def setup_commands(bot):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
+        if not interaction.guild:
+            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            return
+        gid = interaction.guild.id
+
         # 入力長チェック（セキュリティ対策）
         if not surface.strip() or len(surface) > 100:
             await interaction.response.send_message("表記は1文字以上100文字以下である必要があります", ephemeral=True)
@@ -32,8 +38,8 @@ def setup_commands(bot):
             await interaction.response.send_message("読み方は1文字以上200文字以下である必要があります", ephemeral=True)
             return
 
-        ok = tts_dict_storage.add(
-            interaction.guild.id,
+        ok = await tts_dict_storage.add(
+            gid,
             surface,
             reading
         )
@@ -42,6 +48,8 @@ def setup_commands(bot):
             await interaction.response.send_message("すでに登録されています", ephemeral=True)
             return
 
+        update_tts_dictionary(interaction.client, gid, surface, reading)
+
         await interaction.response.send_message(
             f"✅ 辞書に追加しました\n\n📝 登録内容\n表記: `{surface}` → 読み方: `{reading}`\n\n💡 使用例: メッセージに「{surface}」と書くと「{reading}」と読み上げられます",
             ephemeral=True
@@ -59,8 +67,13 @@ def setup_commands(bot):
             await interaction.response.send_message("権限がありません", ephemeral=True)
             return
 
-        ok = tts_dict_storage.remove(
-            interaction.guild.id,
+        if not interaction.guild:
+            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            return
+        gid = interaction.guild.id
+
+        ok = await tts_dict_storage.remove(
+            gid,
             surface
         )
 
@@ -68,6 +81,8 @@ def setup_commands(bot):
             await interaction.response.send_message("見つかりませんでした", ephemeral=True)
             return
 
+        update_tts_dictionary(interaction.client, gid, surface)
+
         await interaction.response.send_message(
             f"✅ 削除完了: `{surface}`\n\n(`/tts_dict_list` で現在の登録状況を確認できます)",
             ephemeral=True
@@ -75,7 +90,12 @@ def setup_commands(bot):
 
     @bot.tree.command(name="tts_dict_list", description="TTS辞書一覧（登録されている単語と読み方を表示）")
     async def tts_dict_list(interaction: discord.Interaction):
-        辞書リスト = tts_dict_storage.list(interaction.guild.id)
+        if not interaction.guild:
+            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            return
+        gid = interaction.guild.id
+
+        辞書リスト = await tts_dict_storage.list(gid)
 
         if not 辞書リスト:
             await interaction.response.send_message(
@@ -1,6 +1,6 @@
 import asyncio
 from ...services.logger import logger
-from ...services.tts import tts_worker
+from ...services.tts import ensure_tts_worker, schedule_prerender
 
 
 async def ensure_voice(bot, guild, channel):
@@ -50,12 +50,12 @@ async def vc_watchdog(bot, guild_id: int):
 
         # worker再起動
         if guild_id in bot.tts_tasks:
-            bot.tts_tasks[guild_id].cancel()
+            bot.tts_tasks.pop(guild_id).cancel()
+        bot.tts_queues.pop(guild_id, None)
 
-        bot.tts_queues[guild_id] = asyncio.Queue()
-        bot.tts_tasks[guild_id] = bot.loop.create_task(
-            tts_worker(bot, guild_id)
-        )
+        await ensure_tts_worker(bot, guild_id, settings)
+
+        schedule_prerender(bot, guild, channel)
 
         logger.info("VC再接続成功")
 
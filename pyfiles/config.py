@@ -38,7 +38,43 @@ if not RCON_PASSWORD:
 
 # データベースパス（絶対パスを使用してセキュリティを強化）
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(os.path.dirname(BASE_DIR), "bot_data.db")
+# DB ファイル（全てのストレージで共通。環境変数 DB_PATH で変更できる）
+DB_PATH = os.getenv("DB_PATH") or os.path.join(os.path.dirname(BASE_DIR), "bot_data.db")
+# 以前の TTS 側の既定の DB（作業ディレクトリの flandre_bot.db）。
+# DB_PATH を指定していなければ、起動時に音声設定と TTS 設定を DB_PATH へ取り込む
+LEGACY_DB_PATH = None if os.getenv("DB_PATH") else os.path.abspath("flandre_bot.db")
 
 # 定数
 MAX_DELETE = 50
+
+# TTS: 再生キューに先読み合成しておくクリップ数
+TTS_PREFETCH = int(os.getenv("TTS_PREFETCH") or 3)
+
+# TTS: OpenJTalk 合成用のワーカープロセス数（0 ならCPUコア数）
+TTS_WORKERS = int(os.getenv("TTS_WORKERS") or 0)
+
+# TTS: エンジンごとの合成の同時実行数（OpenJTalk は 0 ならワーカー数）
+TTS_OPENJTALK_CONCURRENCY = int(os.getenv("TTS_OPENJTALK_CONCURRENCY") or 0)
+TTS_VOICEVOX_CONCURRENCY = int(os.getenv("TTS_VOICEVOX_CONCURRENCY") or 4)
+
+# TTS: VOICEVOX への1リクエストあたりのタイムアウト（秒）
+TTS_VOICEVOX_TIMEOUT = float(os.getenv("TTS_VOICEVOX_TIMEOUT") or 30)
+
+# TTS: 合成済み音声のメモリキャッシュ上限（バイト）
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_BYTES") or 64 * 1024 * 1024)
+
+# TTS: 合成済み音声のディスクキャッシュ（再起動後も残る）
+TTS_DISK_CACHE_DIR = os.getenv("TTS_DISK_CACHE_DIR") or os.path.join(
+    os.path.dirname(BASE_DIR), "tts_cache"
+)
+TTS_DISK_CACHE_BYTES = int(os.getenv("TTS_DISK_CACHE_BYTES") or 512 * 1024 * 1024)
+# 起動時にメモリへ読み込んでおく頻出エントリ数
+TTS_DISK_CACHE_WARM = int(os.getenv("TTS_DISK_CACHE_WARM") or 200)
+
+# TTS: 起動時のエンジンのウォームアップの各手順のタイムアウト（秒）
+TTS_WARMUP_TIMEOUT = float(os.getenv("TTS_WARMUP_TIMEOUT") or 60)
+
+# TTS: リプライ先の発言者名を REST で取りに行くときのタイムアウト（秒）
+TTS_REPLY_FETCH_TIMEOUT = float(os.getenv("TTS_REPLY_FETCH_TIMEOUT") or 2.0)
+# TTS: TTS キューにこの件数以上たまっていたら REST を省略する（0 なら常に省略）
+TTS_REPLY_FETCH_BACKLOG = int(os.getenv("TTS_REPLY_FETCH_BACKLOG") or 5)
@@ -0,0 +1,272 @@
+"""
+音声データ変換・再生サービス
+
+合成した波形を Discord が要求する 48kHz ステレオ s16le の PCM に変換し、
+FFmpeg を介さずにそのまま再生する AudioSource を提供する。
+繰り返し再生するクリップは Opus に一度だけエンコードしておき、
+再生時のエンコードを省略できる
+"""
+import io
+import struct
+from typing import Iterable
+import numpy as np
+import soundfile as sf
+import discord
+
+# Discord の音声フォーマット（48kHz / ステレオ / 16bit / 20msフレーム）
+SAMPLING_RATE = 48000
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+FRAME_LENGTH = 20  # ミリ秒
+SAMPLES_PER_FRAME = SAMPLING_RATE * FRAME_LENGTH // 1000
+FRAME_SIZE = SAMPLES_PER_FRAME * CHANNELS * SAMPLE_WIDTH  # 3840 バイト
+
+# 事前エンコードする Opus のビットレート（kbps、読み上げには十分）
+OPUS_BITRATE = 64
+
+# Opus パケットの長さプレフィックス（パケットは最大 1275 バイト）
+_PACKET_LENGTH = struct.Struct("<H")
+
+
+def to_pcm(wav: np.ndarray, sr: int, normalize: bool = True) -> np.ndarray:
+    """
+    モノラル波形を 48kHz ステレオ s16le の PCM に変換する
+
+    ピーク正規化 → 線形補間でリサンプリング → 両チャンネルへ複製、を
+    すべて numpy のベクトル演算で行う。末尾は 20ms フレーム境界まで無音で埋める。
+
+    Args:
+        wav: モノラル波形（多チャンネルの場合は平均してモノラル化する）
+        sr: 入力のサンプリングレート
+        normalize: True ならピーク正規化する。False なら int16 スケールとみなす
+
+    Returns:
+        shape=(n, 2) の int16 配列（C連続・フレーム境界に揃え済み）
+    """
+    samples = np.asarray(wav, dtype=np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+
+    # 正規化
+    if normalize and samples.size:
+        max_amp = float(np.max(np.abs(samples)))
+        if max_amp > 0:
+            samples *= 32767.0 / max_amp
+
+    # リサンプリング（線形補間）
+    if sr != SAMPLING_RATE and samples.size:
+        length = int(round(samples.size * SAMPLING_RATE / sr))
+        positions = np.arange(length, dtype=np.float64) * (sr / SAMPLING_RATE)
+        samples = np.interp(
+            positions, np.arange(samples.size), samples
+        ).astype(np.float32)
+
+    # 20ms フレーム境界まで無音で埋めつつステレオ化
+    frames = -(-samples.size // SAMPLES_PER_FRAME)
+    pcm = np.zeros((frames * SAMPLES_PER_FRAME, CHANNELS), dtype=np.int16)
+    mono = samples.astype(np.int16)
+    pcm[:mono.size, 0] = mono
+    pcm[:mono.size, 1] = mono
+    return pcm
+
+
+def clip_duration(clip) -> float:
+    """クリップ（PCM または OpusClip）の再生時間（秒）"""
+    if isinstance(clip, OpusClip):
+        return clip.frames * FRAME_LENGTH / 1000
+    return memoryview(clip).nbytes / (SAMPLING_RATE * CHANNELS * SAMPLE_WIDTH)
+
+
+def wav_to_pcm(data) -> np.ndarray:
+    """
+    WAV データ（VOICEVOX の出力など）を 48kHz ステレオ s16le の PCM に変換する
+
+    16bit PCM の WAV はヘッダだけを解析して np.frombuffer で直接参照する
+    （コピーなし）。それ以外の形式は soundfile で読み込む。
+
+    Args:
+        data: WAV データ（bytes / memoryview / BytesIO）
+
+    Returns:
+        shape=(n, 2) の int16 配列
+    """
+    if isinstance(data, io.BytesIO):
+        data = data.getbuffer()
+    view = memoryview(data).cast("B")
+
+    parsed = _parse_pcm16_wav(view)
+    if parsed is None:
+        wav, sr = sf.read(io.BytesIO(view), dtype="int16")
+        return to_pcm(wav, sr, normalize=False)
+
+    samples, sr, channels = parsed
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return to_pcm(samples, sr, normalize=False)
+
+
+def _parse_pcm16_wav(view: memoryview):
+    """16bit PCM の WAV なら (サンプル配列, サンプリングレート, チャンネル数) を返す"""
+    if len(view) < 12 or view[0:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        chunk_size = struct.unpack_from("<I", view, pos + 4)[0]
+        body = pos + 8
+
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            audio_format, channels, sr, _, _, bits = fmt
+            if audio_format != 1 or bits != 16:
+                return None
+            count = min(chunk_size, len(view) - body) // 2
+            samples = np.frombuffer(view, dtype="<i2", count=count, offset=body)
+            return samples, sr, channels
+
+        pos = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+
+class PCMAudioSource(discord.AudioSource):
+    """
+    メモリ上の 48kHz ステレオ s16le PCM をそのまま再生する AudioSource
+
+    FFmpeg プロセスを起動せず、memoryview で 20ms ずつ切り出して返す
+    """
+
+    def __init__(self, pcm):
+        """
+        Args:
+            pcm: 48kHz ステレオ s16le の PCM（バッファプロトコル対応オブジェクト）
+        """
+        self._view = memoryview(pcm).cast("B")
+        self._pos = 0
+
+    def read(self) -> bytes:
+        end = self._pos + FRAME_SIZE
+        if end > len(self._view):
+            return b""
+
+        # opus エンコーダが bytes を要求するため、ここで1フレーム分だけコピーする
+        frame: bytes = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return frame
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self) -> None:
+        self._view.release()
+
+
+class OpusClip:
+    """
+    事前エンコード済みの Opus フレーム列
+
+    パケットは「2バイトの長さ + 本体」を1つの bytes に詰めて持つ
+    （パケットごとに bytes オブジェクトを作らないのでメモリが増えない）
+    """
+
+    __slots__ = ("data", "frames")
+
+    def __init__(self, data: bytes, frames: int):
+        self.data = data
+        self.frames = frames
+
+    @classmethod
+    def pack(cls, packets: Iterable[bytes]) -> "OpusClip":
+        """パケット列を1つのバッファに詰める"""
+        buffer = bytearray()
+        frames = 0
+        for packet in packets:
+            buffer += _PACKET_LENGTH.pack(len(packet))
+            buffer += packet
+            frames += 1
+        return cls(bytes(buffer), frames)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+
+def load_opus() -> bool:
+    """
+    Opus ライブラリを読み込む（起動時に呼ぶ）
+
+    discord.py は最初のエンコーダを作るときに読み込むので、それまでは
+    opus_available() が False のままになる。先に読み込んでおき、
+    最初の合成からエンコード済みのクリップをキャッシュに置けるようにする
+
+    Returns:
+        bool: 読み込めたらTrue
+    """
+    if discord.opus.is_loaded():
+        return True
+    try:
+        # 既定の場所から読み込ませる（見つからなければ OpusNotLoaded）
+        discord.opus.Encoder()
+    except discord.opus.OpusNotLoaded:
+        return False
+    return discord.opus.is_loaded()
+
+
+def opus_available() -> bool:
+    """Opus ライブラリが読み込まれているか（load_opus か VC接続時に読み込まれる）"""
+    return discord.opus.is_loaded()
+
+
+def encode_opus(pcm, bitrate: int = OPUS_BITRATE) -> OpusClip:
+    """
+    48kHz ステレオ s16le の PCM を Opus フレーム列にエンコードする
+
+    Args:
+        pcm: フレーム境界に揃った PCM（to_pcm の出力）
+        bitrate: ビットレート（kbps）
+
+    Returns:
+        OpusClip
+    """
+    encoder = discord.opus.Encoder()
+    encoder.set_bitrate(bitrate)
+
+    view = memoryview(pcm).cast("B")
+    usable = len(view) - len(view) % FRAME_SIZE
+    return OpusClip.pack(
+        # opus エンコーダは bytes を要求する
+        encoder.encode(view[pos:pos + FRAME_SIZE].tobytes(), SAMPLES_PER_FRAME)
+        for pos in range(0, usable, FRAME_SIZE)
+    )
+
+
+class OpusAudioSource(discord.AudioSource):
+    """事前エンコード済みの Opus フレームをそのまま送る AudioSource（エンコーダを通らない）"""
+
+    def __init__(self, clip: OpusClip):
+        self._data = clip.data
+        self._pos = 0
+
+    def read(self) -> bytes:
+        if self._pos + _PACKET_LENGTH.size > len(self._data):
+            return b""
+
+        (length,) = _PACKET_LENGTH.unpack_from(self._data, self._pos)
+        start = self._pos + _PACKET_LENGTH.size
+        self._pos = start + length
+        return self._data[start:self._pos]
+
+    def is_opus(self) -> bool:
+        return True
+
+
+def make_audio_source(clip) -> discord.AudioSource:
+    """クリップの種類に合った AudioSource を作る"""
+    if isinstance(clip, OpusClip):
+        return OpusAudioSource(clip)
+    return PCMAudioSource(clip)
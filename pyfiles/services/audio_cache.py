@@ -0,0 +1,406 @@
+"""
+合成済み音声のキャッシュ
+
+同じ声・同じテキストの再合成を避けるため、合成済み PCM を
+バイト数上限つきの LRU でメモリに保持する（AudioCache）。
+その後ろに再起動をまたいで残るディスク層（DiskAudioCache）を置く
+"""
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import CHANNELS
+from .logger import logger
+from .lru import LRUCache
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用にテキストを正規化する（NFKC・空白の統一）"""
+    text = unicodedata.normalize("NFKC", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def make_key(engine: str, speaker_id, speed, pitch, text: str) -> Tuple:
+    """
+    音声キャッシュのキーを作る
+
+    Args:
+        engine: "openjtalk" / "voicevox"
+        speaker_id: 話者ID
+        speed: 速度
+        pitch: ピッチ
+        text: 読み上げテキスト
+
+    Returns:
+        (engine, speaker_id, speed, pitch, 正規化テキスト) のタプル
+    """
+    return (
+        str(engine).lower(),
+        int(speaker_id),
+        round(float(speed), 3),
+        round(float(pitch), 3),
+        normalize_text(text),
+    )
+
+
+class AudioCache(LRUCache):
+    """
+    バイト数上限つき LRU の音声キャッシュ
+
+    値は PCM などバッファプロトコルに対応したオブジェクト（nbytes か len で大きさを測る）
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: キャッシュ全体のバイト数上限
+        """
+        super().__init__(max_bytes, sizeof=_sizeof)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.max_size
+
+    @property
+    def current_bytes(self) -> int:
+        return self.size
+
+    def stats(self) -> dict:
+        """ヒット率などの統計を返す"""
+        return {
+            **super().stats(),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _sizeof(value) -> int:
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    return len(value)
+
+
+class DiskAudioCache:
+    """
+    ディスク上の音声キャッシュ（内容アドレス方式）
+
+    ファイル名はキャッシュキーのハッシュ。中身は 48kHz ステレオ s16le の PCM で、
+    読み出しはメモリマップしたファイルをそのまま numpy 配列として参照する。
+    容量上限を超えたらアクセス時刻の古いものから削除する。
+    ヒット回数はインデックスファイルに保存し、起動時のウォームアップに使う。
+
+    インデックスの書き出し（save_index）は I/O なので、イベントループからは
+    flush_index_periodically などでスレッドに任せる。
+    メモリ層のヒット（note_hit）はメモリ上で数えるだけで、I/O もしない
+    """
+
+    SUFFIX = ".pcm"
+    INDEX_FILE = "index.json"
+    # インデックスを書き出す間隔（秒、flush_index_periodically 用）
+    INDEX_FLUSH_SECONDS = 60.0
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            directory: キャッシュファイルを置くディレクトリ
+            max_bytes: ディスク上の合計バイト数上限
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}  # digest -> {"size", "atime", "hits", "key"}
+        self._dirty = 0
+        # メモリ層のヒット回数（イベントループから数える。I/O 中は持たないロックで守る）
+        self._hit_lock = threading.Lock()
+        self._pending_hits: Dict[str, int] = {}
+        # インデックスの書き出しを1つずつにする
+        self._index_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def digest(key) -> str:
+        """キャッシュキーからファイル名用のハッシュを作る"""
+        raw = json.dumps(list(key), ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + self.SUFFIX)
+
+    def _load_index(self):
+        """ディレクトリを走査してインデックスを復元する"""
+        meta = {}
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE),
+                      encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.SUFFIX):
+                continue
+            digest = entry.name[:-len(self.SUFFIX)]
+            st = entry.stat()
+            info = meta.get(digest, {})
+            self._entries[digest] = {
+                "size": st.st_size,
+                "atime": st.st_atime,
+                "hits": info.get("hits", 0),
+                "key": info.get("key"),
+            }
+            self.current_bytes += st.st_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return self.digest(key) in self._entries
+
+    def get(self, key) -> Optional[np.ndarray]:
+        """
+        キャッシュから読み出す（ブロッキング I/O なのでスレッドで呼ぶこと）
+
+        Returns:
+            メモリマップされた読み取り専用の PCM 配列。なければ None
+        """
+        digest = self.digest(key)
+        with self._lock:
+            if digest not in self._entries:
+                self.misses += 1
+                return None
+
+        pcm = self._map(digest)
+        if pcm is None:
+            with self._lock:
+                self._drop_locked(digest)
+                self.misses += 1
+            return None
+
+        now = time.time()
+        try:
+            os.utime(self._path(digest), (now, now))
+        except OSError:
+            pass
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                entry["atime"] = now
+                entry["hits"] += 1
+                entry["key"] = list(key)
+            self.hits += 1
+            self._mark_dirty_locked()
+
+        return pcm
+
+    def note_hit(self, key):
+        """
+        メモリ層でヒットした分もヒット回数に数える
+
+        イベントループから呼ぶので、I/O をせず、I/O 中に持たれるロックも取らない。
+        数えた分は次の save_index / most_frequent でインデックスに反映する
+        """
+        digest = self.digest(key)
+        with self._hit_lock:
+            self._pending_hits[digest] = self._pending_hits.get(digest, 0) + 1
+
+    def _merge_hits_locked(self):
+        """note_hit で数えた分をインデックスに足す"""
+        with self._hit_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        for digest, count in pending.items():
+            entry = self._entries.get(digest)
+            if entry is not None:
+                entry["hits"] += count
+                self._dirty += 1
+
+    @property
+    def dirty(self) -> bool:
+        """書き出していない更新があるか"""
+        return bool(self._dirty or self._pending_hits)
+
+    def _map(self, digest: str) -> Optional[np.ndarray]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 消えている・空ファイルなど
+            return None
+        return np.frombuffer(mm, dtype=np.int16).reshape(-1, CHANNELS)
+
+    def put(self, key, pcm) -> bool:
+        """
+        キャッシュに書き込む（ブロッキング I/O なのでスレッドで呼ぶこと）
+
+        Returns:
+            bool: 書き込めたらTrue
+        """
+        data = memoryview(pcm).cast("B")
+        size = len(data)
+        if size > self.max_bytes:
+            return False
+
+        digest = self.digest(key)
+        path = self._path(digest)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"音声キャッシュ書き込みエラー: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+        with self._lock:
+            old = self._entries.get(digest)
+            if old is not None:
+                self.current_bytes -= old["size"]
+
+            self._entries[digest] = {
+                "size": size,
+                "atime": time.time(),
+                "hits": old["hits"] if old else 0,
+                "key": list(key),
+            }
+            self.current_bytes += size
+            self._evict_locked()
+            self._mark_dirty_locked()
+
+        return True
+
+    def _drop_locked(self, digest: str):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            self.current_bytes -= entry["size"]
+
+    def _evict_locked(self):
+        """容量上限を超えていたらアクセス時刻の古いものから削除する"""
+        if self.current_bytes <= self.max_bytes:
+            return
+
+        victims = sorted(self._entries, key=lambda d: self._entries[d]["atime"])
+        for digest in victims:
+            if self.current_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(digest))
+            except OSError as e:
+                # Windows ではマップ中のファイルを消せない。次回起動時に再走査される
+                logger.debug(f"音声キャッシュ削除エラー: {e}")
+            self._drop_locked(digest)
+            self.evictions += 1
+
+    def _mark_dirty_locked(self):
+        self._dirty += 1
+
+    def save_index(self) -> bool:
+        """
+        ヒット回数などのインデックスを書き出す（ブロッキング I/O なのでスレッドで呼ぶこと）
+
+        Returns:
+            bool: 書き出せたらTrue
+        """
+        with self._index_lock:
+            with self._lock:
+                self._merge_hits_locked()
+                meta = {
+                    digest: {"hits": entry["hits"], "key": entry["key"]}
+                    for digest, entry in self._entries.items()
+                    if entry["key"] is not None
+                }
+                dirty = self._dirty
+
+            # ファイルへの書き込みはロックの外で行う（get / put を待たせない）
+            path = os.path.join(self.directory, self.INDEX_FILE)
+            try:
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                logger.warning(f"音声キャッシュのインデックス保存エラー: {e}")
+                return False
+
+            with self._lock:
+                self._dirty -= dirty
+            return True
+
+    def most_frequent(self, limit: int) -> List[Tuple]:
+        """ヒット回数の多いキャッシュキーを上位から返す"""
+        with self._lock:
+            self._merge_hits_locked()
+            ranked = sorted(
+                (e for e in self._entries.values() if e["key"] is not None),
+                key=lambda e: e["hits"],
+                reverse=True,
+            )
+            return [tuple(e["key"]) for e in ranked[:limit]]
+
+    def warm(self, memory_cache: AudioCache, limit: int,
+             encode: Optional[Callable] = None) -> int:
+        """
+        ヒット回数の多いものからメモリキャッシュへ読み込む（起動時用）
+
+        Args:
+            memory_cache: 読み込み先のメモリキャッシュ
+            limit: 読み込む最大件数
+            encode: PCM を再生用のクリップに変換する関数（encode_opus など）
+
+        Returns:
+            int: 読み込んだ件数
+        """
+        loaded = 0
+        for key in self.most_frequent(limit):
+            pcm = self._map(self.digest(key))
+            if pcm is None:
+                continue
+            clip = encode(pcm) if encode is not None else pcm
+            if not memory_cache.put(key, clip):
+                break
+            loaded += 1
+        return loaded
+
+    def stats(self) -> dict:
+        """ヒット率などの統計を返す"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+async def flush_index_periodically(disk_cache: DiskAudioCache,
+                                   interval: float = DiskAudioCache.INDEX_FLUSH_SECONDS):
+    """更新があればインデックスを定期的にスレッドで書き出す（Botの起動中ずっと動かす）"""
+    while True:
+        await asyncio.sleep(interval)
+        if disk_cache.dirty:
+            await asyncio.to_thread(disk_cache.save_index)
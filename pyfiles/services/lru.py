@@ -0,0 +1,130 @@
+"""
+LRU キャッシュの共通部品
+
+音声クリップ・テキスト解析結果・発言者名・音声設定・audio_query の
+各キャッシュが使う「上限つき OrderedDict」と、ヒット率の統計をまとめる
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class CacheStats:
+    """ヒット・ミスの回数とヒット率"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        """1回の参照結果を数える"""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """ヒット率などの統計を返す"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class LRUCache(CacheStats):
+    """
+    上限つきの LRU キャッシュ
+
+    上限は件数で数える。sizeof を渡すと値の大きさの合計で数える。
+    上限を超えたら使われていないものから追い出す。
+    スレッドセーフではないので、スレッドから使うときは呼び出し側でロックする
+    """
+
+    def __init__(self, max_size: int,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        Args:
+            max_size: 件数（sizeof を渡したときは大きさの合計）の上限
+            sizeof: 値の大きさを返す関数
+        """
+        super().__init__()
+        self.max_size = max_size
+        self.size = 0
+        self.evictions = 0
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def _measure(self, value) -> int:
+        return self._sizeof(value) if self._sizeof is not None else 1
+
+    def get(self, key, default=None):
+        """取り出す（ヒットしたエントリは最新扱いにする）"""
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """統計も順序も変えずに取り出す"""
+        return self._entries.get(key, default)
+
+    def put(self, key, value) -> bool:
+        """
+        登録する（同じキーがあれば置き換える）
+
+        Returns:
+            bool: 登録できたらTrue（単体で上限を超える大きさなら登録しない）
+        """
+        size = self._measure(value)
+        if size > self.max_size:
+            return False
+
+        self.pop(key)
+        self._entries[key] = value
+        self.size += size
+
+        while self.size > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self._measure(evicted)
+            self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        """取り除く（統計には数えない）"""
+        value = self._entries.pop(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.size -= self._measure(value)
+        return value
+
+    def values(self):
+        return self._entries.values()
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """件数・ヒット率などの統計を返す"""
+        return {
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            **super().stats(),
+        }
@@ -4,10 +4,38 @@
 ユーザーの権限チェックを担当する
 """
 import discord
-from typing import Dict, Any, List
+from dataclasses import dataclass
+from typing import Dict, Any, List, Union
 from ..config import DEVELOPER_ID
 
 
+@dataclass(frozen=True)
+class VCPermissions:
+    """
+    ギルドごとの VC 許可リストのスナップショット
+
+    ユーザーIDとロールIDを frozenset で持ち、判定は集合演算だけで済ませる
+    """
+    users: frozenset = frozenset()
+    roles: frozenset = frozenset()
+
+    @classmethod
+    def from_data(cls, allow_data: dict) -> "VCPermissions":
+        """{"users": [...], "roles": [...]} 形式から作る"""
+        return cls(
+            frozenset(allow_data.get("users", ())),
+            frozenset(allow_data.get("roles", ()))
+        )
+
+    def with_user(self, user_id: int, allowed: bool = True) -> "VCPermissions":
+        users = self.users | {user_id} if allowed else self.users - {user_id}
+        return VCPermissions(users, self.roles)
+
+    def with_role(self, role_id: int, allowed: bool = True) -> "VCPermissions":
+        roles = self.roles | {role_id} if allowed else self.roles - {role_id}
+        return VCPermissions(self.users, roles)
+
+
 def is_admin_or_dev(interaction: discord.Interaction) -> bool:
     """
     管理者または開発者かチェック
@@ -24,13 +52,14 @@ def is_admin_or_dev(interaction: discord.Interaction) -> bool:
     )
 
 
-def can_use_vc(interaction: discord.Interaction, allow_data: dict) -> bool:
+def can_use_vc(interaction: discord.Interaction,
+               allow_data: Union[VCPermissions, dict]) -> bool:
     """
     VCコマンドを使用できるかチェック
     
     Args:
         interaction: Discordのインタラクション
-        allow_data: VC許可リストのデータ
+        allow_data: VC許可リスト（VCPermissions か、storage.load の辞書）
         
     Returns:
         bool: 使用可能ならTrue
@@ -39,15 +68,16 @@ def can_use_vc(interaction: discord.Interaction, allow_data: dict) -> bool:
     if is_admin_or_dev(interaction):
         return True
     
+    if not isinstance(allow_data, VCPermissions):
+        allow_data = VCPermissions.from_data(allow_data)
+
     member = interaction.user
     
     # ユーザー許可チェック
-    if member.id in allow_data.get("users", []):
-        return True
-    
-    # ロール許可チェック
-    member_role_ids = {r.id for r in member.roles}
-    if any(rid in member_role_ids for rid in allow_data.get("roles", [])):
+    if member.id in allow_data.users:
         return True
     
-    return False
+    # ロール許可チェック（許可ロールがなければメンバーのロールは見ない）
+    if not allow_data.roles:
+        return False
+    return not allow_data.roles.isdisjoint(r.id for r in member.roles)
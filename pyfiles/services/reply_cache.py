@@ -0,0 +1,111 @@
+"""
+リプライ先の発言者名の解決
+
+リプライの読み上げでは「〇〇さんへのリプライ」と前置きする。
+毎回 REST でリプライ先のメッセージを取りに行くと、遅い上にレート制限に
+かかるので、次の順に手元の情報から探す。
+
+1. message.reference.resolved（Discord がリプライに添えて送ってくるもの）
+2. message.reference.cached_message（discord.py のメッセージキャッシュ）
+3. チャンネルごとの「最近見たメッセージID -> 発言者名」の LRU
+4. 最後の手段として REST（タイムアウトつき、負荷が高いときは省略）
+"""
+import asyncio
+from typing import Optional
+
+import discord
+
+from .lru import CacheStats, LRUCache
+
+# チャンネルごとに覚えておくメッセージ数
+DEFAULT_PER_CHANNEL = 256
+# 覚えておくチャンネル数
+DEFAULT_MAX_CHANNELS = 512
+
+
+class MessageAuthorCache(CacheStats):
+    """
+    チャンネルごとの「メッセージID -> 発言者名」の LRU
+
+    チャンネル数とチャンネルごとの件数の両方に上限がある
+    """
+
+    def __init__(self, per_channel: int = DEFAULT_PER_CHANNEL,
+                 max_channels: int = DEFAULT_MAX_CHANNELS):
+        """
+        Args:
+            per_channel: チャンネルごとに覚えておくメッセージ数
+            max_channels: 覚えておくチャンネル数
+        """
+        super().__init__()
+        self.per_channel = per_channel
+        self.max_channels = max_channels
+        self._channels = LRUCache(max_channels)  # チャンネルID -> LRUCache
+
+    def remember(self, channel_id: int, message_id: int, name: str):
+        """メッセージの発言者名を覚える"""
+        messages = self._channels.get(channel_id)
+        if messages is None:
+            messages = LRUCache(self.per_channel)
+            self._channels.put(channel_id, messages)
+        messages.put(message_id, name)
+
+    def remember_message(self, message: discord.Message):
+        """受け取ったメッセージの発言者名を覚える"""
+        self.remember(message.channel.id, message.id, message.author.display_name)
+
+    def get(self, channel_id: int, message_id: int) -> Optional[str]:
+        """覚えている発言者名を返す（なければ None）"""
+        messages = self._channels.peek(channel_id)
+        name = messages.get(message_id) if messages is not None else None
+        self.record(name is not None)
+        return name
+
+    def stats(self) -> dict:
+        """キャッシュの統計を返す"""
+        return {
+            "channels": len(self._channels),
+            "messages": sum(len(m) for m in self._channels.values()),
+            **super().stats(),
+        }
+
+
+async def resolve_reply_author(message: discord.Message, cache: MessageAuthorCache,
+                               fetch: bool = True,
+                               timeout: float = 2.0) -> Optional[str]:
+    """
+    リプライ先の発言者名を返す（分からなければ None）
+
+    Args:
+        message: リプライのメッセージ
+        cache: 最近見たメッセージの発言者名
+        fetch: 手元で見つからないとき REST で取りに行くか
+        timeout: REST のタイムアウト（秒）
+    """
+    reference = message.reference
+    if reference is None or reference.message_id is None:
+        return None
+
+    for referenced in (reference.resolved, reference.cached_message):
+        if isinstance(referenced, discord.Message):
+            return referenced.author.display_name
+
+    channel_id = reference.channel_id or message.channel.id
+    name = cache.get(channel_id, reference.message_id)
+    if name is not None or not fetch:
+        return name
+
+    # 別チャンネルのメッセージへの参照は取りに行かない
+    if channel_id != message.channel.id:
+        return None
+
+    try:
+        replied = await asyncio.wait_for(
+            message.channel.fetch_message(reference.message_id), timeout
+        )
+    except (asyncio.TimeoutError, discord.HTTPException):
+        return None
+
+    name = replied.author.display_name
+    cache.remember(channel_id, replied.id, name)
+    return name
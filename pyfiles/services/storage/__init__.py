@@ -1,6 +1,6 @@
-from .vc_allow import VCAllowStorage
-from .tts_dict import TTSDictStorage
+from .vc_allow import AsyncVCAllowStorage, VCAllowChanges
+from .tts_dict import AsyncTTSDictStorage
 
-# グローバルインスタンス
-vc_allow_storage = VCAllowStorage()
-tts_dict_storage = TTSDictStorage()
+# グローバルインスタンス（コマンドからはイベントループを止めない async 版を使う）
+vc_allow_storage = AsyncVCAllowStorage()
+tts_dict_storage = AsyncTTSDictStorage()
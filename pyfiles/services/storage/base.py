@@ -1,11 +1,14 @@
-import sqlite3
+from typing import Optional
+
 from ...config import DB_PATH
+from .database import Database, get_database
 
 class SQLiteBase:
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, database: Optional[Database] = None):
         self.db_path = db_path
+        # 接続は DB ファイルごとの共有プールから借りる
+        self.database = database or get_database(db_path)
 
     def connect(self):
-        # タイムアウト設定でコンカレンシー問題を軽減（セキュリティ強化）
-        conn = sqlite3.connect(self.db_path, timeout=10.0)
-        return conn
+        """共有プールの接続でトランザクションを張る（with で使う）"""
+        return self.database.transaction()
@@ -0,0 +1,170 @@
+"""
+SQLite の共有接続レイヤー
+
+呼び出しごとに接続を開き直すと、ファイルのオープンや PRAGMA の設定、
+SQL のコンパイルを毎回やり直すことになる。ここでは DB ファイルごとに
+長寿命の接続を数本だけ持ち、全てのストレージクラスで使い回す。
+
+- 接続は作成時に一度だけ WAL・synchronous=NORMAL・busy_timeout を設定する
+- 接続ごとの文キャッシュ（cached_statements）で同じ SQL を再コンパイルしない
+- async からは専用のスレッドプールで実行し、イベントループを止めない
+"""
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 接続プールの大きさ（DB 用スレッド数も同じ）
+DEFAULT_POOL_SIZE = 4
+# ロックが解けるのを待つ時間（ミリ秒）
+BUSY_TIMEOUT_MS = 5000
+# 接続ごとにコンパイル済みで持っておく SQL の数
+CACHED_STATEMENTS = 256
+
+
+class Database:
+    """
+    1つの DB ファイルに対する接続プール
+
+    同期コードは connection() / transaction() で接続を借り、
+    async コードは run() / execute() / fetchone() などで DB 用スレッドに任せる
+    """
+
+    def __init__(self, path: str, pool_size: int = DEFAULT_POOL_SIZE):
+        """
+        Args:
+            path: DB ファイルのパス
+            pool_size: 接続数
+        """
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """プールから接続を借りる（なければ上限まで開き、上限なら空くまで待つ）"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("database is closed")
+
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.pool_size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """接続を借りてトランザクションを張る（例外なら rollback、正常なら commit）"""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def _call(self, func: Callable[..., T], args: tuple) -> T:
+        with self.transaction() as conn:
+            return func(conn, *args)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        func(conn, *args) を DB 用スレッドでトランザクション内で実行する
+
+        Returns:
+            func の戻り値
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size, thread_name_prefix="db"
+                    )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args)
+
+    async def execute(self, sql: str, params: Iterable = ()) -> int:
+        """SQL を1つ実行して変更した行数を返す"""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable) -> int:
+        """同じ SQL を複数のパラメータで実行して変更した行数を返す"""
+        return await self.run(lambda conn: conn.executemany(sql, seq_of_params).rowcount)
+
+    async def fetchone(self, sql: str, params: Iterable = ()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: Iterable = ()) -> list:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    def close(self):
+        """DB 用スレッドを止めて全ての接続を閉じる"""
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+_databases: Dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path: str) -> Database:
+    """DB ファイルごとに共有の Database を返す"""
+    key = os.path.abspath(path)
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None or database._closed:
+            database = _databases[key] = Database(path)
+        return database
+
+
+def close_all():
+    """開いている全ての Database を閉じる（終了時に呼ぶ）"""
+    with _databases_lock:
+        databases = list(_databases.values())
+        _databases.clear()
+    for database in databases:
+        database.close()
@@ -1,95 +1,197 @@
-import aiosqlite
+import sqlite3
+from pathlib import Path
+
 from ..logger import logger
+from ..lru import LRUCache
+from .database import get_database
+
+# 音声設定が無いユーザーの音声（engine, speaker_id, speed, pitch）
+DEFAULT_VOICE = ("openjtalk", 1, 1.0, 0.0)
+
+# 以前の既定の DB（作業ディレクトリの flandre_bot.db）から引き継ぐテーブル
+LEGACY_TABLES = ("tts_voice_profiles", "tts_settings")
 
 class DBInitializer:
 
-    def __init__(self, db_path: str):
+    # get_user_voice のキャッシュ件数
+    VOICE_CACHE_SIZE = 4096
+
+    def __init__(self, db_path: str, voice_cache_size: int = VOICE_CACHE_SIZE):
         self.db_path = db_path
+        self.db = get_database(db_path)
+
+        # (guild_id, user_id) -> 音声設定 の LRU（未設定のユーザーはデフォルトを入れる）
+        self.voice_cache_size = voice_cache_size
+        self._voice_cache = LRUCache(voice_cache_size)
+        self._voice_generation = 0  # set_user_voice のたびに増やす
 
     async def init(self):
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS vc_allows (
-                        guild_id INTEGER NOT NULL,
-                        type TEXT NOT NULL,
-                        target_id INTEGER NOT NULL,
-                        PRIMARY KEY (guild_id, type, target_id)
-                    );
-                """)
-
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS tts_settings (
-                        guild_id INTEGER PRIMARY KEY,
-                        enabled INTEGER NOT NULL DEFAULT 1,
-                        speaker_id INTEGER NOT NULL DEFAULT 1
-                    );
-                """)
-
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS tts_dict (
-                        guild_id INTEGER NOT NULL,
-                        surface TEXT NOT NULL,
-                        reading TEXT NOT NULL,
-                        PRIMARY KEY (guild_id, surface)
-                    );
-                """)
-
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS levels (
-                        guild_id INTEGER NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        xp INTEGER NOT NULL DEFAULT 0,
-                        level INTEGER NOT NULL DEFAULT 1,
-                        last_message REAL NOT NULL DEFAULT 0,
-                        PRIMARY KEY (guild_id, user_id)
-                    );
-                """)
-                
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS tts_voice_profiles (
-                        guild_id INTEGER NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        engine TEXT NOT NULL,
-                        speaker_id INTEGER NOT NULL,
-                        speed REAL NOT NULL DEFAULT 1.0,
-                        pitch REAL NOT NULL DEFAULT 0.0,
-                        PRIMARY KEY (guild_id, user_id)
-                    );
-                """)
-
-                await db.commit()
-
+            await self.db.run(self._create_tables)
         except Exception:
             logger.exception("DB初期化エラー")
             raise
+
+    def _create_tables(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS vc_allows (
+                guild_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                target_id INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, type, target_id)
+            );
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tts_settings (
+                guild_id INTEGER PRIMARY KEY,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                speaker_id INTEGER NOT NULL DEFAULT 1,
+                queue_max INTEGER NOT NULL DEFAULT 20,
+                queue_ttl REAL NOT NULL DEFAULT 30.0,
+                overflow_policy TEXT NOT NULL DEFAULT 'drop_oldest'
+            );
+        """)
+
+        # 既存DBには後から増えたカラムを追加する
+        self._add_missing_columns(conn, "tts_settings", {
+            "queue_max": "INTEGER NOT NULL DEFAULT 20",
+            "queue_ttl": "REAL NOT NULL DEFAULT 30.0",
+            "overflow_policy": "TEXT NOT NULL DEFAULT 'drop_oldest'",
+        })
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tts_dict (
+                guild_id INTEGER NOT NULL,
+                surface TEXT NOT NULL,
+                reading TEXT NOT NULL,
+                PRIMARY KEY (guild_id, surface)
+            );
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS levels (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                xp INTEGER NOT NULL DEFAULT 0,
+                level INTEGER NOT NULL DEFAULT 1,
+                last_message REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            );
+        """)
+        
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tts_voice_profiles (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                engine TEXT NOT NULL,
+                speaker_id INTEGER NOT NULL,
+                speed REAL NOT NULL DEFAULT 1.0,
+                pitch REAL NOT NULL DEFAULT 0.0,
+                PRIMARY KEY (guild_id, user_id)
+            );
+        """)
+
+    async def import_legacy(self, legacy_path: str) -> int:
+        """
+        以前の DB から音声設定と TTS 設定を取り込む
+
+        既にある行は上書きしないので、起動のたびに呼んでも変わらない
+
+        Args:
+            legacy_path: 以前の DB ファイルのパス
+
+        Returns:
+            int: 取り込んだ行数
+        """
+        return await self.db.run(self._import_legacy, legacy_path)
+
+    def _import_legacy(self, conn, legacy_path: str) -> int:
+        legacy = sqlite3.connect(f"{Path(legacy_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            imported = 0
+            for table in LEGACY_TABLES:
+                # 古い DB に無いカラムはデフォルト値のままにする
+                current = {
+                    row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()
+                }
+                columns = [
+                    row[1] for row in legacy.execute(f"PRAGMA table_info({table})").fetchall()
+                    if row[1] in current
+                ]
+                if not columns:
+                    continue
+
+                names = ", ".join(columns)
+                rows = legacy.execute(f"SELECT {names} FROM {table}").fetchall()
+                imported += conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({names}) "
+                    f"VALUES ({', '.join('?' * len(columns))})",
+                    rows
+                ).rowcount
+            return imported
+        finally:
+            legacy.close()
+
+    def _add_missing_columns(self, conn, table: str, columns: dict):
+        """テーブルに無いカラムだけ ALTER TABLE で追加する"""
+        existing = {
+            row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()
+        }
+
+        for name, definition in columns.items():
+            if name not in existing:
+                conn.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {name} {definition}"
+                )
     
     async def set_user_voice(self, guild_id, user_id,
                             engine, speaker_id,
                             speed=1.0, pitch=0.0):
 
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO tts_voice_profiles
-                (guild_id, user_id, engine, speaker_id, speed, pitch)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (guild_id, user_id, engine,
-                speaker_id, speed, pitch))
-            await db.commit()
+        await self.db.execute("""
+            INSERT OR REPLACE INTO tts_voice_profiles
+            (guild_id, user_id, engine, speaker_id, speed, pitch)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (guild_id, user_id, engine,
+            speaker_id, speed, pitch))
+
+        # 読み込み中の古い値がキャッシュに入らないよう世代も進める
+        self._voice_generation += 1
+        self._voice_cache.pop((guild_id, user_id), None)
 
     async def get_user_voice(self, guild_id, user_id):
 
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT engine, speaker_id, speed, pitch
-                FROM tts_voice_profiles
-                WHERE guild_id=? AND user_id=?
-            """, (guild_id, user_id)) as cursor:
+        key = (guild_id, user_id)
+        profile = self._voice_cache.get(key)
+        if profile is not None:
+            return profile
+
+        generation = self._voice_generation
+
+        row = await self.db.fetchone("""
+            SELECT engine, speaker_id, speed, pitch
+            FROM tts_voice_profiles
+            WHERE guild_id=? AND user_id=?
+        """, (guild_id, user_id))
+
+        profile = tuple(row) if row else DEFAULT_VOICE
+
+        if generation == self._voice_generation:
+            self._voice_cache.put(key, profile)
+
+        return profile
 
-                row = await cursor.fetchone()
+    def voice_cache_stats(self) -> dict:
+        """get_user_voice のキャッシュの統計を返す"""
+        return {**self._voice_cache.stats(), "max_entries": self.voice_cache_size}
 
-                if row:
-                    return row
+    async def get_used_speakers(self, engine: str):
+        """音声設定で使われている話者IDの一覧（起動時のウォームアップ用）"""
 
-        return "openjtalk", 1, 1.0, 0.0
+        rows = await self.db.fetchall("""
+            SELECT DISTINCT speaker_id
+            FROM tts_voice_profiles
+            WHERE lower(engine)=?
+        """, (engine.lower(),))
+        return [row[0] for row in rows]
@@ -1,39 +1,162 @@
-import aiosqlite
+import asyncio
+import sqlite3
+from typing import Dict
+from ..logger import logger
+from .database import get_database
+from ..tts_queue import DEFAULT_MAX_SIZE, DEFAULT_TTL, DROP_OLDEST
 
 
 class TTSSettingsStorage:
+    """
+    ギルドごとの TTS 設定
+
+    起動時に load_all で全ギルドぶんをメモリに読み込み、
+    読み出しはメモリから、書き込みは DB とメモリの両方に行う（ライトスルー）。
+    メッセージごとの読み出しは get_cached を使う（await しない）
+    """
+
+    # 起動時の一括読み込みと、1ギルドぶん読むときのタイムアウト（秒）
+    LOAD_TIMEOUT = 10.0
+    READ_TIMEOUT = 2.0
+
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.db = get_database(db_path)
+        self._cache: Dict[int, dict] = {}
+        self._loaded = False
+        self._loading: Dict[int, asyncio.Task] = {}  # 読み込み中のタスク
+
+    @staticmethod
+    def _defaults() -> dict:
+        return {
+            "enabled": False,
+            "speaker": 1,
+            "queue_max": DEFAULT_MAX_SIZE,
+            "queue_ttl": DEFAULT_TTL,
+            "overflow_policy": DROP_OLDEST
+        }
+
+    @staticmethod
+    def _from_row(row) -> dict:
+        return {
+            "enabled": bool(row[0]),
+            "speaker": row[1],
+            "queue_max": row[2],
+            "queue_ttl": row[3],
+            "overflow_policy": row[4]
+        }
+
+    async def load_all(self):
+        """全ギルドの設定をメモリに読み込む（起動時に一度呼ぶ）"""
+        rows = await self.db.fetchall(
+            """
+            SELECT guild_id, enabled, speaker_id, queue_max, queue_ttl, overflow_policy
+            FROM tts_settings
+            """
+        )
+
+        for row in rows:
+            self._cache[row[0]] = self._from_row(row[1:])
+        self._loaded = True
+        return len(rows)
+
+    def get_cached(self, guild_id: int) -> dict:
+        """
+        メモリ上の設定を返す（読み取り専用として扱うこと）
+
+        起動時の読み込みが済んでいないギルドはデフォルト値を返し、
+        裏で DB から読み込んでおく（次のメッセージからはそちらを使う）
+        """
+        settings = self._cache.get(guild_id)
+        if settings is not None:
+            return settings
+
+        if not self._loaded and guild_id not in self._loading:
+            task = asyncio.get_running_loop().create_task(self.get(guild_id))
+            task.add_done_callback(self._log_load_error)
+            self._loading[guild_id] = task
+        return self._defaults()
+
+    @staticmethod
+    def _log_load_error(task: asyncio.Task):
+        """裏での読み込みで起きた想定外のエラーをログに出す（例外を取り出しておく）"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"TTS設定の読み込みエラー: {error!r}")
 
     async def get(self, guild_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT enabled, speaker_id FROM tts_settings WHERE guild_id = ?",
-                (guild_id,)
-            )
-            row = await cursor.fetchone()
+        settings = self._cache.get(guild_id)
+        if settings is not None or self._loaded:
+            return settings or self._defaults()
 
-            if row:
-                return {
-                    "enabled": bool(row[0]),
-                    "speaker": row[1]
-                }
+        # 起動時の読み込みが済んでいなければ DB を読む（遅ければデフォルト値）
+        try:
+            row = await asyncio.wait_for(self._fetch(guild_id), self.READ_TIMEOUT)
+        except (asyncio.TimeoutError, sqlite3.Error) as e:
+            logger.warning(f"TTS設定の読み込み失敗 (Guild {guild_id}): {e!r}")
+            return self._defaults()
+        finally:
+            self._loading.pop(guild_id, None)
+
+        settings = self._from_row(row) if row else self._defaults()
+        self._cache.setdefault(guild_id, settings)
+        return self._cache[guild_id]
 
-            # デフォルト値
-            return {
-                "enabled": False,
-                "speaker": 1
-            }
+    async def _fetch(self, guild_id: int):
+        return await self.db.fetchone(
+            """
+            SELECT enabled, speaker_id, queue_max, queue_ttl, overflow_policy
+            FROM tts_settings WHERE guild_id = ?
+            """,
+            (guild_id,)
+        )
+
+    async def _update(self, guild_id: int, **values):
+        """
+        メモリ上の設定を更新する（辞書は作り直し、渡したものは書き換えない）
+
+        まだ読み込んでいないギルドは、書き込んだ後の行を DB から読み直す
+        （一括読み込みに失敗していても、他の列をデフォルト値で上書きしない）
+        """
+        current = self._cache.get(guild_id)
+        if current is None and not self._loaded:
+            row = await self._fetch(guild_id)
+            if row:
+                self._cache[guild_id] = self._from_row(row)
+                return
+        self._cache[guild_id] = {**(current or self._defaults()), **values}
 
     async def set_enabled(self, guild_id: int, enabled: bool):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO tts_settings (guild_id, enabled)
-                VALUES (?, ?)
-                ON CONFLICT(guild_id)
-                DO UPDATE SET enabled = excluded.enabled
-                """,
-                (guild_id, int(enabled))
-            )
-            await db.commit()
+        await self.db.execute(
+            """
+            INSERT INTO tts_settings (guild_id, enabled)
+            VALUES (?, ?)
+            ON CONFLICT(guild_id)
+            DO UPDATE SET enabled = excluded.enabled
+            """,
+            (guild_id, int(enabled))
+        )
+
+        await self._update(guild_id, enabled=bool(enabled))
+
+    async def set_queue_policy(self, guild_id: int, max_size: int,
+                               ttl: float, policy: str):
+        """キューの上限・有効期限・オーバーフローポリシーを保存する"""
+        await self.db.execute(
+            """
+            INSERT INTO tts_settings
+            (guild_id, enabled, queue_max, queue_ttl, overflow_policy)
+            VALUES (?, 0, ?, ?, ?)
+            ON CONFLICT(guild_id)
+            DO UPDATE SET queue_max = excluded.queue_max,
+                          queue_ttl = excluded.queue_ttl,
+                          overflow_policy = excluded.overflow_policy
+            """,
+            (guild_id, max_size, ttl, policy)
+        )
+
+        await self._update(
+            guild_id, queue_max=max_size, queue_ttl=ttl, overflow_policy=policy
+        )
@@ -1,90 +1,210 @@
 import sqlite3
-from typing import Dict, Any
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
 from .base import SQLiteBase
 from ..logger import logger
+from ..permission import VCPermissions
 
-class VCAllowStorage(SQLiteBase):
 
-    def load(self, guild_id: int) -> Dict[str, Any]:
+def _load(conn: sqlite3.Connection, guild_id: int) -> Dict[str, Any]:
+    cur = conn.cursor()
+
+    cur.execute(
+        "SELECT target_id FROM vc_allows WHERE guild_id = ? AND type = 'user'",
+        (guild_id,)
+    )
+    users = [r[0] for r in cur.fetchall()]
+
+    cur.execute(
+        "SELECT target_id FROM vc_allows WHERE guild_id = ? AND type = 'role'",
+        (guild_id,)
+    )
+    roles = [r[0] for r in cur.fetchall()]
+
+    return {"users": users, "roles": roles}
+
+
+@dataclass(frozen=True)
+class VCAllowChanges:
+    """save で実際に追加・削除した ID（キャッシュの差分更新に使う）"""
+    added_users: frozenset = frozenset()
+    removed_users: frozenset = frozenset()
+    added_roles: frozenset = frozenset()
+    removed_roles: frozenset = frozenset()
+
+    @property
+    def changed(self) -> bool:
+        return bool(
+            self.added_users or self.removed_users
+            or self.added_roles or self.removed_roles
+        )
+
+    def apply(self, permissions: VCPermissions) -> VCPermissions:
+        """保存前のスナップショットに差分を当てる"""
+        return VCPermissions(
+            (permissions.users - self.removed_users) | self.added_users,
+            (permissions.roles - self.removed_roles) | self.added_roles
+        )
+
+
+def _save(conn: sqlite3.Connection, guild_id: int, data: Dict[str, Any]) -> VCAllowChanges:
+    """
+    今の行との差分だけを書き込む
+
+    全部消して入れ直すと行数ぶんの書き込みになり、その間ほかの処理が
+    DB を待たされるので、追加・削除する行だけを executemany でまとめて流す
+    """
+    # 差分を取ってから書き終えるまで、ほかの書き込みを入れない
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    current = set(conn.execute(
+        "SELECT type, target_id FROM vc_allows WHERE guild_id = ?",
+        (guild_id,)
+    ).fetchall())
+    wanted = (
+        {("user", uid) for uid in data.get("users", [])}
+        | {("role", rid) for rid in data.get("roles", [])}
+    )
+
+    added = wanted - current
+    removed = current - wanted
+
+    if removed:
+        conn.executemany(
+            "DELETE FROM vc_allows WHERE guild_id = ? AND type = ? AND target_id = ?",
+            [(guild_id, kind, target_id) for kind, target_id in removed]
+        )
+    if added:
+        conn.executemany(
+            "INSERT INTO vc_allows VALUES (?, ?, ?)",
+            [(guild_id, kind, target_id) for kind, target_id in added]
+        )
+
+    return VCAllowChanges(
+        frozenset(t for k, t in added if k == "user"),
+        frozenset(t for k, t in removed if k == "user"),
+        frozenset(t for k, t in added if k == "role"),
+        frozenset(t for k, t in removed if k == "role")
+    )
+
+
+def _insert(conn: sqlite3.Connection, guild_id: int, kind: str, target_id: int):
+    conn.execute(
+        "INSERT INTO vc_allows VALUES (?, ?, ?)",
+        (guild_id, kind, target_id)
+    )
+
+
+def _delete(conn: sqlite3.Connection, guild_id: int, kind: str, target_id: int) -> bool:
+    cur = conn.execute(
+        "DELETE FROM vc_allows WHERE guild_id = ? AND type = ? AND target_id = ?",
+        (guild_id, kind, target_id)
+    )
+    return cur.rowcount > 0
+
+
+class AsyncVCAllowStorage(SQLiteBase):
+    """
+    VC 許可リストのストレージ（DB 用スレッドで実行し、イベントループを止めない）
+
+    権限チェック用に、ギルドごとの許可リストを VCPermissions として
+    メモリに持つ（permissions で初回だけ読み込み、追加・削除・保存で更新する）
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._permissions: Dict[int, VCPermissions] = {}
+        self._versions: Dict[int, int] = {}  # 書き込み回数（読み込み中の更新の検出用）
+
+    async def permissions(self, guild_id: int) -> VCPermissions:
+        """
+        ギルドの許可リストのスナップショットを返す
+
+        2回目以降は DB を読まない。DB エラーのときは空の許可リストを返し、
+        キャッシュはせずに次回読み直す
+        """
+        snapshot = self._permissions.get(guild_id)
+        if snapshot is not None:
+            return snapshot
+
+        version = self._versions.get(guild_id, 0)
+        try:
+            data = await self.database.run(_load, guild_id)
+        except sqlite3.Error as e:
+            logger.error(f"DB読み込みエラー: {e}")
+            return VCPermissions()
+
+        snapshot = VCPermissions.from_data(data)
+        # 読み込み中に書き込みがあれば古いかもしれないのでキャッシュしない
+        if self._versions.get(guild_id, 0) == version:
+            self._permissions[guild_id] = snapshot
+        return snapshot
+
+    def _changed(self, guild_id: int, update=None):
+        """
+        書き込み後にスナップショットを更新する
+
+        update はスナップショットを受け取って新しいものを返す関数。
+        まだ読み込んでいないギルドは何もしない（次の permissions で読む）
+        """
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        snapshot = self._permissions.get(guild_id)
+        if snapshot is not None and update is not None:
+            self._permissions[guild_id] = update(snapshot)
+
+    async def load(self, guild_id: int) -> Dict[str, Any]:
         try:
-            with self.connect() as conn:
-                cur = conn.cursor()
-
-                cur.execute(
-                    "SELECT target_id FROM vc_allows WHERE guild_id = ? AND type = 'user'",
-                    (guild_id,)
-                )
-                users = [r[0] for r in cur.fetchall()]
-
-                cur.execute(
-                    "SELECT target_id FROM vc_allows WHERE guild_id = ? AND type = 'role'",
-                    (guild_id,)
-                )
-                roles = [r[0] for r in cur.fetchall()]
-
-                return {"users": users, "roles": roles}
+            return await self.database.run(_load, guild_id)
         except sqlite3.Error as e:
             logger.error(f"DB読み込みエラー: {e}")
             return {"users": [], "roles": []}
 
-    def save(self, guild_id: int, data: Dict[str, Any]) -> bool:
+    async def save(self, guild_id: int, data: Dict[str, Any]) -> Optional[VCAllowChanges]:
+        """
+        許可リストを data の内容に置き換える
+
+        Returns:
+            追加・削除した ID（失敗したら None）
+        """
         try:
-            with self.connect() as conn:
-                cur = conn.cursor()
-                cur.execute("DELETE FROM vc_allows WHERE guild_id = ?", (guild_id,))
-
-                for uid in data.get("users", []):
-                    cur.execute(
-                        "INSERT INTO vc_allows VALUES (?, 'user', ?)",
-                        (guild_id, uid)
-                    )
-
-                for rid in data.get("roles", []):
-                    cur.execute(
-                        "INSERT INTO vc_allows VALUES (?, 'role', ?)",
-                        (guild_id, rid)
-                    )
-
-                conn.commit()
-            return True
+            changes = await self.database.run(_save, guild_id, data)
         except sqlite3.Error as e:
             logger.error(f"DB保存エラー: {e}")
-            return False
+            # どこまで書けたか分からないので、次回は読み直す
+            self._changed(guild_id)
+            self._permissions.pop(guild_id, None)
+            return None
+
+        self._changed(guild_id, changes.apply)
+        return changes
 
-    def add_user(self, guild_id: int, user_id: int) -> bool:
+    async def add_user(self, guild_id: int, user_id: int) -> bool:
         try:
-            with self.connect() as conn:
-                conn.execute(
-                    "INSERT INTO vc_allows VALUES (?, 'user', ?)",
-                    (guild_id, user_id)
-                )
-            return True
+            await self.database.run(_insert, guild_id, "user", user_id)
         except sqlite3.IntegrityError:
             return False
 
-    def remove_user(self, guild_id: int, user_id: int) -> bool:
-        with self.connect() as conn:
-            cur = conn.execute(
-                "DELETE FROM vc_allows WHERE guild_id = ? AND type='user' AND target_id = ?",
-                (guild_id, user_id)
-            )
-            return cur.rowcount > 0
+        self._changed(guild_id, lambda p: p.with_user(user_id))
+        return True
 
-    def add_role(self, guild_id: int, role_id: int) -> bool:
+    async def remove_user(self, guild_id: int, user_id: int) -> bool:
+        removed = await self.database.run(_delete, guild_id, "user", user_id)
+        if removed:
+            self._changed(guild_id, lambda p: p.with_user(user_id, False))
+        return removed
+
+    async def add_role(self, guild_id: int, role_id: int) -> bool:
         try:
-            with self.connect() as conn:
-                conn.execute(
-                    "INSERT INTO vc_allows VALUES (?, 'role', ?)",
-                    (guild_id, role_id)
-                )
-            return True
+            await self.database.run(_insert, guild_id, "role", role_id)
         except sqlite3.IntegrityError:
             return False
 
-    def remove_role(self, guild_id: int, role_id: int) -> bool:
-        with self.connect() as conn:
-            cur = conn.execute(
-                "DELETE FROM vc_allows WHERE guild_id = ? AND type='role' AND target_id = ?",
-                (guild_id, role_id)
-            )
-            return cur.rowcount > 0
+        self._changed(guild_id, lambda p: p.with_role(role_id))
+        return True
+
+    async def remove_role(self, guild_id: int, role_id: int) -> bool:
+        removed = await self.database.run(_delete, guild_id, "role", role_id)
+        if removed:
+            self._changed(guild_id, lambda p: p.with_role(role_id, False))
+        return removed
@@ -1,65 +1,197 @@
 import re
 import pyopenjtalk
-import soundfile as sf
 import asyncio
 import discord
 import unicodedata
+from typing import Optional
 import numpy as np
-import io
 from .logger import logger
 from .voicevox import VoicevoxEngine
+from .audio import (
+    OpusClip,
+    clip_duration,
+    encode_opus,
+    make_audio_source,
+    opus_available,
+    to_pcm,
+    wav_to_pcm
+)
+from .audio_cache import make_key
+from .tts_dictionary import TTSDictionary
+from .tts_frontend import estimate_text_duration, half_tone
+from .tts_pool import synthesize_text
+from .tts_queue import TTSQueue, make_request
 
+# 再生終了の通知が来ないときに接続状態を確かめるまでの余裕（秒）
+PLAYBACK_GRACE = 2.0
 
-def sanitize_text(text: str, guild=None) -> str:
-    # URL削除
-    text = re.sub(r'https?://\S+', '', text)
-
-    # メンション → 表示名（敬称付き）
-    def repl_mention(match):
-        if guild:
-            uid = int(match.group(1))
-            m = guild.get_member(uid)
-            if m:
-                return m.display_name + "さん"
-            return ""
-        return ""
 
-    text = re.sub(r'<@!?(\d+)>', repl_mention, text)
+# URL・ユーザーメンション・チャンネルメンション・カスタムスタンプをまとめて1回で処理する
+_MARKUP = re.compile(
+    r'https?://\S+'
+    r'|<@!?(?P<user>\d+)>'
+    r'|<#\d+>'
+    r'|<a?:\w+:\d+>'
+)
 
-    # チャンネルメンション削除
-    text = re.sub(r'<#\d+>', '', text)
+# OpenJTalk が嫌う記号・句読点（括弧、演算子、その他の記号、区切り文字）
+_DELETE_CHARS = '[]{}()<>=+*/^_|~`@#$%&¥\\、。，.!?？;:,\'"'
 
-    # カスタムスタンプ <:name:id> 削除
-    text = re.sub(r'<a?:\w+:\d+>', '', text)
 
-    # Unicode絵文字削除（Symbol カテゴリ）
-    text = ''.join(
-        ch for ch in text
-        if unicodedata.category(ch)[0] != 'S'
-    )
+class _DeleteTable(dict):
+    """
+    str.translate 用の削除テーブル
+
+    固定の記号に加え、Unicode の Symbol カテゴリ（絵文字など）の文字を削除する。
+    カテゴリは初めて出てきた文字だけ調べて結果を覚えておく
+    """
+
+    def __missing__(self, code: int):
+        value = None if unicodedata.category(chr(code))[0] == 'S' else code
+        self[code] = value
+        return value
+
 
-    # OpenJTalkが嫌う記号・特殊文字を積極的に削除
-    # 括弧、演算子、その他の記号
-    text = re.sub(r'[\[\]{}()<>]', '', text)
-    text = re.sub(r'[=+*/^_|~`]', '', text)
-    text = re.sub(r'[@#$%&]', '', text)
-    text = re.sub(r'[¥\\]', '', text)
+_DELETE_TABLE = _DeleteTable({ord(ch): None for ch in _DELETE_CHARS})
 
-    # 句読点とその他の区切り文字
-    text = re.sub(r'[、。，。.!?!？;:,\'"\"\'"`]', '', text)
+# 読み上げる最大文字数
+MAX_TEXT_LEN = 200
 
-    # 複数の空白を1つに統一
-    text = re.sub(r'\s+', ' ', text).strip()
 
-    # テキストが空またはあまりに短い場合は空文字を返す
-    if not text or len(text.strip()) < 1:
+def _strip_markup(text: str, guild=None) -> str:
+    """URL・チャンネルメンション・カスタムスタンプを消し、ユーザーメンションを表示名にする"""
+    def repl_markup(match):
+        uid = match.group('user')
+        if uid and guild:
+            member = guild.get_member(int(uid))
+            if member:
+                return member.display_name + "さん"
         return ""
 
-    return text[:200]
+    return _MARKUP.sub(repl_markup, text)
 
-def synthesize(text: str, guild_id: int, speaker=None) -> io.BytesIO:
+
+def _clean(text: str) -> str:
+    """記号・句読点を消して空白をまとめる"""
+    return " ".join(text.translate(_DELETE_TABLE).split())
+
+
+def sanitize_text(text: str, guild=None) -> str:
     """
-    テキストを音声に変換してメモリバッファに返す
+    読み上げ用にテキストを整える
+
+    - URL・チャンネルメンション・カスタムスタンプを消す
+    - ユーザーメンションは表示名（敬称付き）にする
+    - 絵文字などの記号と OpenJTalk が嫌う記号・句読点を消す
+    - 空白をまとめて、最大 MAX_TEXT_LEN 文字に切り詰める
+    """
+    return _clean(_strip_markup(text, guild))[:MAX_TEXT_LEN]
+
+# チャンク分割: 文末記号の直後で区切り、長すぎれば読点・空白でも区切る
+_SENTENCE_END = re.compile(r'(?<=[。．！？!?\n])')
+_SOFT_BREAK = re.compile(r'[、，,\s]')
+MIN_CHUNK_LEN = 6
+MAX_CHUNK_LEN = 40
+
+
+def split_text(text: str, min_len: int = MIN_CHUNK_LEN,
+               max_len: int = MAX_CHUNK_LEN) -> list:
+    """
+    読み上げテキストを、先に再生を始められるようチャンクに分割する
+
+    文末（。！？・改行）で区切ったうえで、短すぎる文は次の文とまとめ、
+    max_len を超える文は読点や空白の位置でさらに区切る
+
+    Args:
+        text: 読み上げテキスト（サニタイズ前）
+        min_len: これより短いチャンクは次とまとめる
+        max_len: これより長いチャンクは読点・空白で区切る
+
+    Returns:
+        list: チャンクのリスト（元の順）
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_len:
+            breaks = [m.end() for m in _SOFT_BREAK.finditer(sentence, 0, max_len)]
+            cut = breaks[-1] if breaks and breaks[-1] >= min_len else max_len
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        pieces.append(sentence)
+
+    chunks = []
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer.strip()) >= min_len:
+            chunks.append(buffer)
+            buffer = ""
+
+    if buffer.strip():
+        if chunks and len(chunks[-1]) + len(buffer) <= max_len:
+            chunks[-1] += buffer
+        else:
+            chunks.append(buffer)
+
+    return chunks
+
+
+def sanitize_sentences(text: str, guild=None) -> str:
+    """
+    文ごとにサニタイズして「。」でつなぎ直す
+
+    sanitize_text は句読点を消してしまうので、チャンク分割に使う
+    文の区切りを残したいときはこちらを使う。
+    URL などの「?」「!」で文を区切らないよう、マークアップは分割の前に
+    メッセージ全体から消す。全体で最大 MAX_TEXT_LEN 文字に切り詰める
+    """
+    text = _strip_markup(text, guild)
+    sentences = (_clean(s) for s in _SENTENCE_END.split(text))
+    return "。".join(s for s in sentences if s)[:MAX_TEXT_LEN]
+
+
+def prepare_chunks(text: str, guild=None, dictionary=None,
+                   sanitized: bool = False) -> list:
+    """
+    読み上げテキストを合成するチャンクに分ける（TTS ワーカーと先読みで共通）
+
+    辞書は記号を含む表記にも当たるよう、サニタイズの前に適用する。
+    URL などが途中で切れないよう、マークアップは分割の前にメッセージ全体から消す。
+    長さの上限もチャンクごとではなくメッセージ全体で MAX_TEXT_LEN 文字にする。
+    sanitized=True のテキスト（on_message で辞書の適用とサニタイズが済んだもの）は
+    文の区切りの「。」を落とすだけにする
+
+    Args:
+        text: 読み上げテキスト
+        guild: ギルド（メンションの表示名の解決に使う）
+        dictionary: ギルドの TTS 辞書
+        sanitized: 辞書の適用とサニタイズが済んでいるか
+
+    Returns:
+        list: サニタイズ済みのチャンク（空のものは除く）
+    """
+    if sanitized:
+        parts = (part.replace("。", "").strip() for part in split_text(text))
+        return [clean for clean in parts if clean]
+
+    if dictionary is not None:
+        text = dictionary.apply(text)
+    # マークアップを消してから区切りで分割し、区切り記号はチャンクごとに消す
+    chunks = []
+    remaining = MAX_TEXT_LEN
+    for part in split_text(_strip_markup(text, guild)):
+        clean = _clean(part)[:remaining]
+        if clean:
+            chunks.append(clean)
+            remaining -= len(clean)
+        if remaining <= 0:
+            break
+    return chunks
+
+
+def synthesize(text: str, guild_id: int, speaker=None) -> np.ndarray:
+    """
+    テキストを音声に変換して再生用の PCM を返す
     
     Args:
         text: 音声合成対象テキスト
@@ -67,75 +199,591 @@ def synthesize(text: str, guild_id: int, speaker=None) -> io.BytesIO:
         speaker: スピーカーID（未使用）
     
     Returns:
-        WAV データを含む BytesIO オブジェクト
+        48kHz ステレオ s16le の PCM（shape=(n, 2) の int16 配列）
     """
     # pyopenjtalk で音声合成（同期処理）
     wav, sr = pyopenjtalk.tts(text)
 
-    # 正規化
-    max_amp = np.max(np.abs(wav))
-    if max_amp > 0:
-        wav = wav / max_amp * 1.0
+    # 正規化・ステレオ化して PCM に変換
+    return to_pcm(wav, sr)
 
-    # メモリバッファに WAV を書き込む
-    buffer = io.BytesIO()
-    sf.write(buffer, wav, sr, format='WAV')
-    buffer.seek(0)
-    
-    return buffer
+async def render_audio(bot, guild_id: int, text: str,
+                       engine: str, speaker_id, speed, pitch):
+    """
+    音声プロファイルとテキストから再生用のクリップを得る
 
-async def tts_worker(bot, guild_id: int):
-    queue = bot.tts_queues[guild_id]
+    メモリキャッシュ → ディスクキャッシュの順に探し、あれば合成せずにそれを返す。
+    なければ合成して両方のキャッシュに登録する（ディスクへの書き込みは待たない）。
+    メモリキャッシュには Opus にエンコード済みのクリップを置き、再生時のエンコードを省く
+    （PCM のまま置かれていたものは、Opus が使えるようになった時点でエンコードし直す）
 
-    while True:
-        try:
-            text, user_id = await queue.get()
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        text: サニタイズ済みテキスト
+        engine: "openjtalk" / "voicevox"（大文字小文字は問わない）
+        speaker_id: 話者ID
+        speed: 速度
+        pitch: ピッチ
 
-            guild = bot.get_guild(guild_id)
-            if not guild:
-                queue.task_done()
-                continue
+    Returns:
+        OpusClip（Opus が使えないときは 48kHz ステレオ s16le の PCM）
+    """
+    # 音声設定には "Voicevox" のような表記も入っているので、キャッシュキーと揃える
+    engine = str(engine).lower()
+    key = make_key(engine, speaker_id, speed, pitch, text)
+    disk_cache = getattr(bot, "disk_cache", None)
 
-            vc = guild.voice_client
-            if not vc or not vc.is_connected():
-                queue.task_done()
-                continue
+    clip = bot.audio_cache.get(key)
+    if clip is not None:
+        if disk_cache is not None:
+            disk_cache.note_hit(key)
+        if isinstance(clip, OpusClip) or not opus_available():
+            return clip
 
-            clean = sanitize_text(text, guild)
-            if not clean:
-                queue.task_done()
-                continue
+    # Opus が読み込まれる前にキャッシュした PCM は、ここでエンコードして置き直す
+    pcm = clip
+    if pcm is None and disk_cache is not None:
+        pcm = await asyncio.to_thread(disk_cache.get, key)
 
-            engine, speaker_id, speed, pitch = \
-                await bot.db_initializer.get_user_voice(
-                    guild_id, user_id
-                )
+    if pcm is None:
+        cost = 1.0
+        if engine != "voicevox":
+            # テキスト解析は合成ジョブの中で行うので、コストはテキストから見積もる
+            cost = max(estimate_text_duration(text, speed), 0.1)
 
+        async def job():
             if engine == "voicevox":
                 buffer = await bot.voicevox.synthesize(
-                    clean, speaker_id, speed, pitch
+                    text, speaker_id, speed, pitch
                 )
-            else:
-                buffer = await asyncio.to_thread(
-                    synthesize, clean, guild_id, speaker_id
+                return await asyncio.to_thread(wav_to_pcm, buffer)
+            if getattr(bot, "tts_pool", None) is not None:
+                # 解析も波形生成もワーカープロセスで行う
+                return await bot.tts_pool.synthesize(
+                    text, guild_id, speed, half_tone(pitch)
                 )
+            return await asyncio.to_thread(
+                synthesize_text, text, speed, half_tone(pitch), bot.tts_frontend
+            )
 
-            audio = discord.FFmpegPCMAudio(
-                buffer,
-                pipe=True,
-                before_options="-nostdin",
-                options="-loglevel quiet"
+        # 合成はエンジンごとの同時実行上限の中で、ギルド間で公平に順番を回す
+        # （OpenJTalk は見積もった発話秒数をコストにする）
+        scheduler = getattr(bot, "tts_scheduler", None)
+        if scheduler is not None:
+            pcm = await scheduler.run(
+                "voicevox" if engine == "voicevox" else "openjtalk",
+                guild_id, job, cost
             )
+        else:
+            pcm = await job()
+
+        # ディスクに書く PCM は書き込み中に変わらないよう書き換え不可にする
+        pcm.flags.writeable = False
+        if disk_cache is not None:
+            # 書き込みは待たない（失敗はコールバックでログに出す）
+            asyncio.get_running_loop().run_in_executor(
+                None, disk_cache.put, key, pcm
+            ).add_done_callback(_log_disk_cache_error)
+
+    clip = await asyncio.to_thread(encode_opus, pcm) if opus_available() else pcm
+    bot.audio_cache.put(key, clip)
+    return clip
+
+
+def _log_disk_cache_error(future: asyncio.Future):
+    """ディスクキャッシュへのバックグラウンド書き込みで起きたエラーをログに出す"""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.warning(f"音声キャッシュ書き込みエラー: {error!r}")
+
+
+async def stream_chunks(bot, guild_id: int, chunks, playback_queue: asyncio.Queue,
+                        engine: str, speaker_id, speed, pitch):
+    """
+    分割したテキストをまとめて合成に出し、できた順ではなく文の順に再生キューへ積む
+
+    先頭のチャンクができた時点で再生が始まり、残りはその間に並行して合成される
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        chunks: サニタイズ済みのチャンク
+        playback_queue: 再生キュー
+        engine, speaker_id, speed, pitch: 音声プロファイル
+    """
+    tasks = [
+        asyncio.create_task(render_audio(
+            bot, guild_id, chunk, engine, speaker_id, speed, pitch
+        ))
+        for chunk in chunks
+    ]
+
+    try:
+        for chunk, task in zip(chunks, tasks):
+            try:
+                clip = await task
+            except Exception as e:
+                logger.error(f"TTS synthesis error ({chunk[:10]}...): {e}")
+                continue
+
+            # 再生キューが埋まっている間はここで待つ（先読みは N 件まで）
+            await playback_queue.put(clip)
+    finally:
+        # キャンセルされたときは未完了の合成も止める
+        for task in tasks:
+            task.cancel()
+
+
+def announcement_text(member, joined: bool) -> str:
+    """VC参加/退出の読み上げ文を作る"""
+    if joined:
+        return f"{member.display_name}さんが接続しました"
+    return f"{member.display_name}さんが退出しました"
+
+
+def announcement_candidates(guild, channel=None) -> list:
+    """
+    参加/退出アナウンスを先読みしておくメンバーを集める
+
+    channel（Botが入るVC）のメンバーを先頭に、ギルド内の他のVCにいるメンバーを続ける
+    """
+    channels = list(guild.voice_channels)
+    if channel is not None and channel in channels:
+        channels.remove(channel)
+        channels.insert(0, channel)
+
+    seen = set()
+    members = []
+    for vc_channel in channels:
+        for member in vc_channel.members:
+            if member.bot or member.id in seen:
+                continue
+            seen.add(member.id)
+            members.append(member)
+    return members
+
+
+async def prerender_announcements(bot, guild, members):
+    """
+    メンバーごとの参加/退出アナウンスを合成してキャッシュに入れておく
+
+    キャッシュキーは表示名と音声プロファイルを含むので、
+    どちらかが変わっていれば自動的に作り直しになる。
+    テキストは TTS ワーカーと同じく prepare_chunks で辞書を当ててから作る
+
+    Args:
+        bot: Botインスタンス
+        guild: ギルド
+        members: 対象メンバー
+    """
+    dictionary = await get_tts_dictionary(bot, guild.id)
+
+    rendered = 0
+    for member in members:
+        engine, speaker_id, speed, pitch = \
+            await bot.db_initializer.get_user_voice(guild.id, member.id)
+
+        for joined in (True, False):
+            text = announcement_text(member, joined)
+            for clean in prepare_chunks(text, guild, dictionary):
+                key = make_key(engine, speaker_id, speed, pitch, clean)
+                if key in bot.audio_cache:
+                    continue
+
+                try:
+                    await render_audio(
+                        bot, guild.id, clean, engine, speaker_id, speed, pitch
+                    )
+                    rendered += 1
+                except Exception as e:
+                    logger.debug(f"アナウンス先読みエラー: {e}")
+
+    if rendered:
+        logger.debug(f"[Guild {guild.id}] アナウンスを {rendered} 件先読みしました")
+
+
+def schedule_prerender(bot, guild, channel=None, members=None):
+    """
+    アナウンスの先読みをバックグラウンドで開始する
+
+    members を省略するとギルド内のVCにいる全員が対象になり、
+    そのギルドで実行中の全体先読みは新しいものに置き換える
+
+    Args:
+        bot: Botインスタンス
+        guild: ギルド
+        channel: Botが入るVC（優先して先読みする）
+        members: 対象メンバー（省略時は全員）
+    """
+    vc = guild.voice_client
+    if not vc or not vc.is_connected():
+        return
+
+    if members is not None:
+        targets = [
+            m for m in members
+            if not m.bot and m.voice and m.voice.channel
+        ]
+        if targets:
+            # 参照を持っておかないと実行中のタスクが GC で消えることがある
+            task = asyncio.create_task(prerender_announcements(bot, guild, targets))
+            tasks = bot.member_prerender_tasks.setdefault(guild.id, set())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        return
+
+    old = bot.prerender_tasks.pop(guild.id, None)
+    if old:
+        old.cancel()
+
+    targets = announcement_candidates(guild, channel or vc.channel)
+    bot.prerender_tasks[guild.id] = asyncio.create_task(
+        prerender_announcements(bot, guild, targets)
+    )
+
 
-            vc.play(audio)
+async def get_tts_dictionary(bot, guild_id: int) -> TTSDictionary:
+    """
+    ギルドの TTS 辞書を返す（初回だけ DB から読み込んでメモリに置く）
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+    """
+    dictionary: Optional[TTSDictionary] = bot.tts_dictionaries.get(guild_id)
+    if dictionary is None:
+        try:
+            entries = await bot.tts_dict_storage.list(guild_id)
+        except Exception as e:
+            # 辞書が読めなくても読み上げは止めない（次のメッセージで読み直す）
+            logger.warning(f"TTS辞書の読み込み失敗: {e}")
+            return TTSDictionary()
+        dictionary = bot.tts_dictionaries.setdefault(
+            guild_id, TTSDictionary(entries)
+        )
+    return dictionary
+
+
+def update_tts_dictionary(bot, guild_id: int, surface: str,
+                          reading: Optional[str] = None):
+    """
+    /tts_dict_add・/tts_dict_remove の変更をメモリ上の辞書に反映する
+
+    まだ読み込んでいないギルドは何もしない（次に使うときに DB から読み込む）
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        surface: 表記
+        reading: 読み方（None なら削除）
+    """
+    dictionary = bot.tts_dictionaries.get(guild_id)
+    if dictionary is None:
+        return
+    if reading is None:
+        dictionary.remove(surface)
+    else:
+        dictionary.add(surface, reading)
+
+
+# ウォームアップで合成する文
+WARMUP_TEXT = "こんにちは"
+
+
+async def warm_up_engines(bot, timeout: float = 60.0):
+    """
+    起動時に TTS エンジンを温めておく（最初の読み上げの遅延をなくす）
+
+    - OpenJTalk: 全ワーカーの辞書・HTS ボイスを読み込ませる（プールがなければ親プロセスで）
+    - VOICEVOX: 話者一覧を取得し、音声設定で使われている話者のモデルを読み込ませる
+
+    各手順は並行に行い、かかった時間をログに出す。
+    終わったら（失敗しても）bot.tts_ready をセットする。
+    tts_worker はこれを待ってから読み上げを始める
+
+    Args:
+        bot: Botインスタンス
+        timeout: 各手順のタイムアウト（秒）
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def step(name: str, coro):
+        step_started = loop.time()
+        try:
+            detail = await asyncio.wait_for(coro, timeout)
+        except Exception as e:
+            logger.warning(f"ウォームアップ失敗 ({name}): {e!r}")
+            return
+        elapsed = loop.time() - step_started
+        logger.info(f"ウォームアップ完了 ({name}): {elapsed:.2f}秒 {detail or ''}")
+
+    async def warm_frontend():
+        await asyncio.to_thread(bot.tts_frontend.labels, WARMUP_TEXT)
+
+    async def warm_pool():
+        timings = await bot.tts_pool.warm_up(WARMUP_TEXT)
+        return "ワーカーごと: " + ", ".join(f"{t:.2f}秒" for t in timings)
+
+    async def warm_voicevox():
+        await bot.voicevox.initialize()
+        speakers = await bot.db_initializer.get_used_speakers("voicevox")
+        await asyncio.gather(*(
+            bot.voicevox.initialize_speaker(speaker_id) for speaker_id in speakers
+        ))
+        return f"話者 {len(bot.voicevox.voice_dict)} 人 / 読み込み {len(speakers)} 件"
+
+    # プールがあれば解析もワーカーで行うので、親プロセスの辞書は読み込まない
+    if getattr(bot, "tts_pool", None) is not None:
+        steps = [step("OpenJTalk ワーカー", warm_pool())]
+    else:
+        steps = [step("OpenJTalk 解析", warm_frontend())]
+    if getattr(bot, "voicevox", None) is not None:
+        steps.append(step("VOICEVOX", warm_voicevox()))
+
+    try:
+        await asyncio.gather(*steps)
+    finally:
+        bot.tts_ready.set()
+        logger.info(f"TTS ウォームアップ: 合計 {loop.time() - started:.2f}秒")
+
+
+async def ensure_tts_worker(bot, guild_id: int, settings=None) -> TTSQueue:
+    """
+    ギルドの TTS キューとワーカーを用意する（既にあればそのまま使う）
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        settings: 取得済みのTTS設定（省略時はメモリ上の設定を使う）
+
+    Returns:
+        TTSQueue: そのギルドの TTS キュー
+    """
+    if guild_id not in bot.tts_queues:
+        if settings is None:
+            settings = bot.tts_settings_storage.get_cached(guild_id)
+        bot.tts_queues.setdefault(guild_id, TTSQueue(
+            settings["queue_max"],
+            settings["queue_ttl"],
+            settings["overflow_policy"]
+        ))
+
+    if guild_id not in bot.tts_tasks:
+        bot.tts_tasks[guild_id] = bot.loop.create_task(
+            tts_worker(bot, guild_id)
+        )
+
+    queue: TTSQueue = bot.tts_queues[guild_id]
+    return queue
+
+
+async def enqueue_tts(bot, guild_id: int, text: str, user_id: int, settings=None,
+                      sanitized: bool = False):
+    """
+    読み上げ要求をギルドの TTS キューに積む（あふれた分はキューのポリシーで捨てる）
+
+    辞書の適用と sanitize_sentences が済んだテキストなら sanitized=True にする
+    """
+    queue = await ensure_tts_worker(bot, guild_id, settings)
+    queue.put_nowait(make_request(text, user_id, sanitized))
+
+
+async def tts_worker(bot, guild_id: int):
+    """
+    ギルドごとのTTSワーカー（合成ステージ）
+
+    TTSキューからテキストを取り出して音声を合成し、再生キューへ積む。
+    再生キューには最大 bot.tts_prefetch 件まで先読みしておき、
+    再生ステージ（playback_worker）が前のクリップの終了と同時に次を再生する。
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+    """
+    queue = bot.tts_queues[guild_id]
+
+    playback_queue: asyncio.Queue = asyncio.Queue(maxsize=getattr(bot, "tts_prefetch", 3))
+    bot.playback_queues[guild_id] = playback_queue
+    player = asyncio.create_task(playback_worker(bot, guild_id, playback_queue))
+
+    try:
+        # 起動直後はエンジンのウォームアップが終わるまで読み上げを始めない
+        await bot.tts_ready.wait()
+
+        while True:
+            try:
+                # 有効期限切れの要求は TTSQueue.get が読み飛ばす
+                request = await queue.get()
+                text, user_id = request.text, request.user_id
+
+                guild = bot.get_guild(guild_id)
+                if not guild:
+                    queue.task_done()
+                    continue
+
+                vc = guild.voice_client
+                if not vc or not vc.is_connected():
+                    queue.task_done()
+                    continue
+
+                # 辞書の表記を読み方に置き換えてからサニタイズ・分割する
+                # （on_message から来たものは辞書の適用もサニタイズも済んでいる）
+                dictionary = None
+                if not request.sanitized:
+                    dictionary = await get_tts_dictionary(bot, guild_id)
+                chunks = prepare_chunks(text, guild, dictionary, request.sanitized)
+                if not chunks:
+                    queue.task_done()
+                    continue
+
+                engine, speaker_id, speed, pitch = \
+                    await bot.db_initializer.get_user_voice(
+                        guild_id, user_id
+                    )
+
+                # /skip でメッセージの残りのチャンクごと止められるよう、別タスクで流す
+                stream = asyncio.create_task(stream_chunks(
+                    bot, guild_id, chunks, playback_queue,
+                    engine, speaker_id, speed, pitch
+                ))
+                bot.tts_streams[guild_id] = stream
+                try:
+                    await asyncio.wait({stream})
+                finally:
+                    # ワーカー自身が止められたときは合成も止める
+                    stream.cancel()
+                    if bot.tts_streams.get(guild_id) is stream:
+                        del bot.tts_streams[guild_id]
+                if not stream.cancelled():
+                    stream.result()
+
+                queue.task_done()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"TTS worker error: {e}")
+                queue.task_done()
+    finally:
+        player.cancel()
+        if bot.playback_queues.get(guild_id) is playback_queue:
+            del bot.playback_queues[guild_id]
+
+
+def skip_tts(bot, guild_id: int, vc=None):
+    """
+    読み上げをスキップする（/skip 用）
+
+    合成中のメッセージの残りのチャンクを止め、未合成のキューと
+    合成済みの再生キューを両方空にしてから、再生中のクリップを止める
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        vc: VoiceClient（省略時は再生を止めない）
+    """
+    stream = bot.tts_streams.pop(guild_id, None)
+    if stream is not None:
+        stream.cancel()
+
+    for queue in (bot.tts_queues.get(guild_id), bot.playback_queues.get(guild_id)):
+        if not queue:
+            continue
+        while not queue.empty():
+            try:
+                queue.get_nowait()
+                queue.task_done()
+            except asyncio.QueueEmpty:
+                break
+
+    if vc is not None:
+        vc.stop()
+
+
+async def play_and_wait(vc, clip):
+    """
+    クリップを再生し、終わるまで待つ
+
+    終了は vc.play の after コールバックから Future で受け取る（ポーリングしない）。
+    切断などで after が来ない場合に備えて、クリップの長さ＋余裕を過ぎたら
+    一度だけ接続状態を確かめ、切断されていれば再生を打ち切る。
+
+    Args:
+        vc: VoiceClient
+        clip: 再生するクリップ（PCM または OpusClip）
+
+    Raises:
+        Exception: 再生スレッドで起きたエラー
+    """
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def after(error):
+        try:
+            loop.call_soon_threadsafe(_resolve_playback, finished, error)
+        except RuntimeError:
+            # シャットダウン中でイベントループが閉じている
+            pass
+
+    vc.play(make_audio_source(clip), after=after)
+
+    timeout = clip_duration(clip) + PLAYBACK_GRACE
+    while True:
+        try:
+            await asyncio.wait_for(asyncio.shield(finished), timeout)
+            return
+        except asyncio.TimeoutError:
+            if not vc.is_connected():
+                finished.cancel()
+                vc.stop()
+                raise ConnectionError("再生中にVCから切断されました")
+            # 接続中（再接続待ちで一時停止など）ならそのまま待ち続ける
+
+
+def _resolve_playback(finished: asyncio.Future, error):
+    if finished.done():
+        return
+    if error:
+        finished.set_exception(error)
+    else:
+        finished.set_result(None)
+
+
+async def playback_worker(bot, guild_id: int, playback_queue: asyncio.Queue):
+    """
+    ギルドごとのTTSワーカー（再生ステージ）
+
+    合成済みの音声を再生キューから取り出し、前のクリップが終わり次第
+    すぐに次のクリップを再生する。
+
+    Args:
+        bot: Botインスタンス
+        guild_id: ギルドID
+        playback_queue: 合成済み音声の再生キュー
+    """
+    while True:
+        try:
+            clip = await playback_queue.get()
+
+            guild = bot.get_guild(guild_id)
+            vc = guild.voice_client if guild else None
+            if not vc or not vc.is_connected():
+                playback_queue.task_done()
+                continue
 
-            while vc.is_connected() and vc.is_playing():
-                await asyncio.sleep(0.1)
+            try:
+                await play_and_wait(vc, clip)
+            except Exception as e:
+                logger.warning(f"[Guild {guild_id}] TTS再生エラー: {e}")
 
-            queue.task_done()
+            playback_queue.task_done()
 
         except asyncio.CancelledError:
             break
         except Exception as e:
-            logger.error(f"TTS worker error: {e}")
-            queue.task_done()
+            logger.error(f"TTS playback error: {e}")
+            playback_queue.task_done()
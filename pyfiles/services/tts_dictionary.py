@@ -0,0 +1,126 @@
+"""
+TTS 辞書の置換器
+
+ギルドごとの「表記 -> 読み方」を Aho–Corasick オートマトンにまとめ、
+メッセージ中の表記を一度の走査で読み方に置き換える。
+辞書が何千語あっても、置換にかかる時間はメッセージの長さに比例する。
+
+重なり合う表記は「より左から始まるもの、同じ位置なら長いもの」を優先する。
+そのため表記を逆順にしたオートマトンでテキストを後ろから走査し、
+各位置から始まる最長の表記を求めてから、前から貪欲に置き換える
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TTSDictionary:
+    """
+    1ギルドぶんの TTS 辞書
+
+    add / remove で登録内容を更新し、オートマトンは次に apply したときに
+    作り直す（連続した更新では1回だけ作り直す）
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()):
+        """
+        Args:
+            entries: (表記, 読み方) の組
+        """
+        self._entries: Dict[str, str] = {
+            surface: reading for surface, reading in entries if surface
+        }
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        # ノードで終わる最長の表記（fail をたどった先も含む）: (長さ, 読み方)
+        self._output: List[Optional[Tuple[int, str]]] = []
+        self._dirty = True
+
+    def add(self, surface: str, reading: str):
+        """表記を追加（登録済みなら読み方を上書き）する"""
+        if surface:
+            self._entries[surface] = reading
+            self._dirty = True
+
+    def remove(self, surface: str):
+        """表記を削除する"""
+        if self._entries.pop(surface, None) is not None:
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, surface: str) -> bool:
+        return surface in self._entries
+
+    def _build(self):
+        """表記を逆順にしたオートマトンを作り直す"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Optional[Tuple[int, str]]] = [None]
+
+        for surface, reading in self._entries.items():
+            node = 0
+            for ch in reversed(surface):
+                child = goto[node].get(ch)
+                if child is None:
+                    child = len(goto)
+                    goto[node][ch] = child
+                    goto.append({})
+                    output.append(None)
+                node = child
+            output[node] = (len(surface), reading)
+
+        # 幅優先で fail リンクを張り、出力を fail 先から引き継ぐ
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                if output[child] is None:
+                    output[child] = output[fail[child]]
+                queue.append(child)
+
+        self._goto, self._fail, self._output = goto, fail, output
+        self._dirty = False
+
+    def apply(self, text: str) -> str:
+        """テキスト中の表記を読み方に置き換える"""
+        if not self._entries or not text:
+            return text
+        if self._dirty:
+            self._build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+
+        # 後ろから走査して、各位置から始まる最長の表記を求める
+        longest: List[Optional[Tuple[int, str]]] = [None] * len(text)
+        state = 0
+        for index in range(len(text) - 1, -1, -1):
+            ch = text[index]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            longest[index] = output[state]
+
+        # 前から貪欲に置き換える
+        parts = []
+        start = 0
+        index = 0
+        while index < len(text):
+            match = longest[index]
+            if match is None:
+                index += 1
+                continue
+            length, reading = match
+            parts.append(text[start:index])
+            parts.append(reading)
+            index += length
+            start = index
+
+        if not parts:
+            return text
+        parts.append(text[start:])
+        return "".join(parts)
@@ -0,0 +1,106 @@
+"""
+OpenJTalk のフロントエンド（テキスト解析）キャッシュ
+
+pyopenjtalk.tts は毎回 MeCab/NJD によるテキスト解析と HTS による波形生成を行う。
+テキスト解析の結果（フルコンテキストラベル）は話者設定に依らないので、
+正規化したテキストごとにキャッシュし、キャッシュにあれば波形生成だけを行う。
+同じ文を速度・ピッチ違いで読み上げるときの解析の重複がなくなる。
+
+テキスト解析はプールのワーカープロセスで行い、ワーカーごとに LabelCache を持つ。
+親プロセスではラベルを作らず、テキストから発話時間を大まかに見積もって
+スケジューラのコストに使う（estimate_text_duration）
+"""
+import threading
+import unicodedata
+from typing import Optional, Tuple
+
+import pyopenjtalk
+
+from .audio_cache import normalize_text
+from .lru import LRUCache
+
+# キャッシュするテキストの件数
+DEFAULT_MAX_ENTRIES = 1024
+
+# 音素ごとのおおよその長さ（秒、速度 1.0 のとき）
+VOWEL_SECONDS = 0.09
+CONSONANT_SECONDS = 0.06
+PAUSE_SECONDS = 0.2
+
+# 前の文字と合わせて1モーラになる小書きのかな
+_SMALL_KANA = frozenset("ぁぃぅぇぉゃゅょゎァィゥェォャュョヮ")
+
+
+def estimate_text_duration(text: str, speed: float = 1.0) -> float:
+    """
+    テキストから発話時間（秒）を大まかに見積もる（ラベルを作らずに済む）
+
+    かなは1文字1モーラ、漢字は1文字2モーラ、その他の文字は1モーラ、
+    空白と句読点はポーズとして数える
+
+    Args:
+        text: 音声合成対象テキスト
+        speed: 話速（大きいほど短くなる）
+    """
+    morae = 0
+    pauses = 0
+    for ch in normalize_text(text):
+        if ch in _SMALL_KANA:
+            continue
+        if ch.isspace() or unicodedata.category(ch).startswith("P"):
+            pauses += 1
+        elif "\u4e00" <= ch <= "\u9fff":
+            morae += 2
+        else:
+            morae += 1
+    seconds = morae * (VOWEL_SECONDS + CONSONANT_SECONDS) + pauses * PAUSE_SECONDS
+    return seconds / (speed or 1.0)
+
+
+def half_tone(pitch: float) -> float:
+    """音声設定のピッチ（-0.5〜1.0）を OpenJTalk の半音単位に変換する"""
+    return (pitch or 0.0) * 12
+
+
+class LabelCache:
+    """
+    正規化したテキスト -> フルコンテキストラベルの LRU キャッシュ
+
+    プールのワーカーごとに1つ持つ（プールがないときは親プロセスで使う）。
+    labels() はスレッドから呼ばれてもよい（解析そのものはロックの外で行う）
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            max_entries: キャッシュする最大件数
+        """
+        self.max_entries = max_entries
+        self._cache = LRUCache(max_entries)
+        self._lock = threading.Lock()
+
+    def labels(self, text: str) -> Tuple[str, ...]:
+        """テキストのフルコンテキストラベルを返す（なければ解析してキャッシュする）"""
+        key = normalize_text(text)
+
+        with self._lock:
+            labels: Optional[Tuple[str, ...]] = self._cache.get(key)
+        if labels is not None:
+            return labels
+
+        labels = tuple(pyopenjtalk.extract_fullcontext(key))
+
+        with self._lock:
+            self._cache.put(key, labels)
+        return labels
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def stats(self) -> dict:
+        """キャッシュの統計を返す"""
+        return {**self._cache.stats(), "max_entries": self.max_entries}
@@ -0,0 +1,255 @@
+"""
+OpenJTalk 合成用プロセスプール
+
+pyopenjtalk の合成をイベントループのスレッドプールから切り離し、
+CPUコア数ぶんの専用プロセスで並列に行う。
+
+- 各ワーカーは起動時に辞書と HTS ボイスを一度だけ読み込む
+- テキスト解析（extract_fullcontext）もワーカーで行い、解析結果は
+  ワーカーごとの LabelCache に持つ（親プロセスのスレッドプールを使わない）
+- 同じギルドのジョブはなるべく同じワーカーへ送り、そのワーカーが埋まっていれば
+  一番空いているワーカーへ回す（ギルド間の公平さは SynthesisScheduler が受け持つ）
+- 合成結果はワーカーごとの共有メモリに書き込んで返す（pickle しない）
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pyopenjtalk
+
+from .audio import CHANNELS, to_pcm
+from .tts_frontend import LabelCache
+
+# ワーカーごとの共有メモリの大きさ（48kHz ステレオ s16le で約 40 秒）
+DEFAULT_SLOT_BYTES = 16 * 1024 * 1024
+
+# ワーカープロセス側の状態
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_labels: Optional[LabelCache] = None
+
+
+def _init_worker(shm_name: str):
+    """ワーカープロセスの初期化（共有メモリへの接続とモデルの読み込み）"""
+    global _worker_shm, _worker_labels
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_labels = LabelCache()
+
+    try:
+        # 辞書と HTS ボイスは初回の合成時に読み込まれるので、ここで済ませておく
+        pyopenjtalk.tts("あ")
+    except Exception:
+        # 読み込みに失敗しても、実際の合成時にエラーとして呼び出し側へ伝わる
+        pass
+
+
+def synthesize_labels(labels: Sequence[str], speed: float = 1.0,
+                      half_tone: float = 0.0) -> np.ndarray:
+    """
+    フルコンテキストラベルから波形を生成して再生用の PCM を返す
+
+    Args:
+        labels: pyopenjtalk.extract_fullcontext の結果
+        speed: 話速
+        half_tone: ピッチ（半音単位）
+
+    Returns:
+        48kHz ステレオ s16le の PCM（shape=(n, 2) の int16 配列）
+    """
+    wav, sr = pyopenjtalk.synthesize(list(labels), speed, half_tone)
+    return to_pcm(wav, sr)
+
+
+def synthesize_text(text: str, speed: float = 1.0, half_tone: float = 0.0,
+                    label_cache: Optional[LabelCache] = None) -> np.ndarray:
+    """
+    テキストを解析して波形を生成し、再生用の PCM を返す
+
+    Args:
+        text: 音声合成対象テキスト
+        speed: 話速
+        half_tone: ピッチ（半音単位）
+        label_cache: 解析結果のキャッシュ（省略時は毎回解析する）
+    """
+    if label_cache is None:
+        labels: Sequence[str] = pyopenjtalk.extract_fullcontext(text)
+    else:
+        labels = label_cache.labels(text)
+    return synthesize_labels(labels, speed, half_tone)
+
+
+def _synthesize_job(text: str, speed: float, half_tone: float):
+    """
+    ワーカープロセスで解析・合成して PCM を共有メモリへ書き込む
+
+    Returns:
+        共有メモリに書けたら ("shm", サンプル数)、
+        大きすぎて入らなければ ("bytes", PCMのバイト列)
+    """
+    pcm = synthesize_text(text, speed, half_tone, _worker_labels)
+
+    data = pcm.data.cast("B")
+    buf = _worker_shm.buf if _worker_shm is not None else None
+    if buf is None or len(data) > len(buf):
+        return "bytes", data.tobytes()
+
+    buf[:len(data)] = data
+    return "shm", pcm.shape[0]
+
+
+def _warm_up_job(text: str) -> int:
+    """ワーカープロセスで解析から波形生成まで一通り実行する（ウォームアップ用）"""
+    return len(synthesize_text(text, label_cache=_worker_labels))
+
+
+class OpenJTalkPool:
+    """
+    ギルドアフィニティつきの OpenJTalk 合成プロセスプール
+
+    ワーカー1つにつき1プロセスの ProcessPoolExecutor と共有メモリ1つを持つ。
+    共有メモリはワーカーごとに使い回すので、同じワーカーへのジョブは
+    asyncio.Lock で1件ずつ流し、待ち件数をキューの深さとして数える。
+
+    アフィニティは優先するだけで、担当ワーカーが埋まっていれば空いている
+    ワーカーへ回す（1つのギルドの長文が1プロセスに詰まらないようにする）
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 slot_bytes: int = DEFAULT_SLOT_BYTES):
+        """
+        Args:
+            workers: ワーカープロセス数（省略時はCPUコア数）
+            slot_bytes: ワーカーごとの共有メモリの大きさ
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.completed = 0
+        self.rerouted = 0  # 担当ワーカーが埋まっていて他へ回した件数
+
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=slot_bytes)
+            for _ in range(self.workers)
+        ]
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(slot.name,)
+            )
+            for slot in self._slots
+        ]
+        self._locks = [asyncio.Lock() for _ in range(self.workers)]
+        self._pending = [0] * self.workers
+
+    def route(self, guild_id: int) -> int:
+        """ギルドIDから担当ワーカーを決める（スノーフレークのタイムスタンプ部分を使う）"""
+        return (guild_id >> 22) % self.workers
+
+    def pick(self, guild_id: int) -> int:
+        """
+        ジョブを流すワーカーを選ぶ
+
+        担当ワーカーが空いていればそれを、埋まっていれば待ち件数の一番少ない
+        ワーカーを選ぶ（同じ件数なら担当ワーカーを優先する）
+        """
+        preferred = self.route(guild_id)
+        if self._pending[preferred] == 0:
+            return preferred
+
+        index = min(
+            range(self.workers),
+            key=lambda i: (self._pending[i], i != preferred)
+        )
+        if index != preferred:
+            self.rerouted += 1
+        return index
+
+    async def synthesize(self, text: str, guild_id: int,
+                         speed: float = 1.0, half_tone: float = 0.0) -> np.ndarray:
+        """
+        テキストを合成して再生用の PCM を返す（解析もワーカーで行う）
+
+        Args:
+            text: 音声合成対象テキスト
+            guild_id: ギルドID（優先するワーカーの決定に使う）
+            speed: 話速
+            half_tone: ピッチ（半音単位）
+
+        Returns:
+            48kHz ステレオ s16le の PCM（shape=(n, 2) の int16 配列）
+        """
+        index = self.pick(guild_id)
+        loop = asyncio.get_running_loop()
+
+        pcm: np.ndarray
+        self._pending[index] += 1
+        try:
+            async with self._locks[index]:
+                kind, payload = await loop.run_in_executor(
+                    self._executors[index], _synthesize_job,
+                    text, speed, half_tone
+                )
+
+                if kind == "shm":
+                    # 次のジョブで上書きされる前にロック内で取り出す
+                    shared = np.ndarray(
+                        (payload, CHANNELS), dtype=np.int16,
+                        buffer=self._slots[index].buf
+                    )
+                    pcm = shared.copy()
+                    del shared
+                else:
+                    pcm = np.frombuffer(payload, dtype=np.int16).reshape(-1, CHANNELS)
+        finally:
+            self._pending[index] -= 1
+
+        self.completed += 1
+        return pcm
+
+    async def warm_up(self, text: str = "こんにちは") -> List[float]:
+        """
+        全ワーカーを起動して一度ずつ合成させる
+
+        ワーカープロセスは最初のジョブで起動するので、ここで起動と
+        辞書・HTS ボイスの読み込みを済ませておく
+
+        Returns:
+            ワーカーごとにかかった秒数
+        """
+        loop = asyncio.get_running_loop()
+
+        async def warm(index: int) -> float:
+            started = loop.time()
+            async with self._locks[index]:
+                await loop.run_in_executor(
+                    self._executors[index], _warm_up_job, text
+                )
+            return loop.time() - started
+
+        return list(await asyncio.gather(*(warm(i) for i in range(self.workers))))
+
+    def queue_depth(self) -> List[int]:
+        """ワーカーごとの待ち件数（実行中を含む）"""
+        return list(self._pending)
+
+    def stats(self) -> dict:
+        """キューの深さなどの統計を返す"""
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth(),
+            "pending": sum(self._pending),
+            "completed": self.completed,
+            "rerouted": self.rerouted,
+        }
+
+    def shutdown(self):
+        """ワーカープロセスを止めて共有メモリを解放する"""
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for slot in self._slots:
+            slot.close()
+            try:
+                slot.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,118 @@
+"""
+ギルドごとの TTS キュー
+
+件数上限と有効期限つきの asyncio.Queue。
+大量に貼り付けられたメッセージで読み上げが何分も遅れないよう、
+あふれたときの捨て方（オーバーフローポリシー）をギルドごとに選べる
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Deque, NamedTuple
+
+# オーバーフローポリシー
+DROP_OLDEST = "drop_oldest"    # 一番古いものを捨てる
+DROP_NEWEST = "drop_newest"    # 新しく来たものを捨てる
+PER_USER = "per_user"          # 同じ人が複数積んでいれば、その人の古いものを捨てる
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, PER_USER)
+
+DEFAULT_MAX_SIZE = 20
+DEFAULT_TTL = 30.0
+
+
+class TTSRequest(NamedTuple):
+    """TTS キューに積む読み上げ要求"""
+    text: str
+    user_id: int
+    created_at: float
+    sanitized: bool = False  # 辞書の適用とサニタイズが済んでいるか（ワーカーで二重にしない）
+
+
+def make_request(text: str, user_id: int, sanitized: bool = False) -> TTSRequest:
+    """現在時刻つきの読み上げ要求を作る"""
+    return TTSRequest(text, user_id, time.monotonic(), sanitized)
+
+
+class TTSQueue(asyncio.Queue):
+    """
+    件数上限・有効期限つきの TTS キュー
+
+    put は待たずに即座に積み、上限を超えたらポリシーに従って1件捨てる。
+    get は有効期限（ttl 秒）を過ぎた要求を読み飛ばす。
+    捨てた件数は dropped に理由ごとに数える。
+    """
+
+    # asyncio.Queue の中身（asyncio.Queue._init が作る deque）
+    _queue: Deque[TTSRequest]
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE,
+                 ttl: float = DEFAULT_TTL,
+                 policy: str = DROP_OLDEST):
+        """
+        Args:
+            max_size: 最大件数（0 以下なら無制限）
+            ttl: 有効期限（秒、0 以下なら無期限）
+            policy: オーバーフローポリシー
+        """
+        # 上限は自前で管理するので、asyncio.Queue 自体は無制限にしておく
+        super().__init__()
+        self.dropped: "Counter[str]" = Counter()
+        self.configure(max_size, ttl, policy)
+
+    def configure(self, max_size: int, ttl: float, policy: str):
+        """上限・有効期限・ポリシーを変更する"""
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {policy}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.policy = policy
+
+    def expired(self, request: TTSRequest) -> bool:
+        """有効期限を過ぎているか"""
+        if self.ttl <= 0:
+            return False
+        return time.monotonic() - request.created_at > self.ttl
+
+    def put_nowait(self, item: TTSRequest):
+        if 0 < self.max_size <= self.qsize():
+            if self.policy == DROP_NEWEST:
+                self.dropped["overflow"] += 1
+                return
+            self._discard(self._overflow_victim())
+            self.dropped["overflow"] += 1
+
+        super().put_nowait(item)
+
+    async def put(self, item: TTSRequest):
+        self.put_nowait(item)
+
+    async def get(self) -> TTSRequest:
+        while True:
+            item: TTSRequest = await super().get()
+            if not self.expired(item):
+                return item
+            self.dropped["expired"] += 1
+            self.task_done()
+
+    def _overflow_victim(self) -> int:
+        """あふれたときに捨てる要求の位置を決める"""
+        if self.policy == PER_USER:
+            counts = Counter(item.user_id for item in self._queue)
+            for index, item in enumerate(self._queue):
+                if counts[item.user_id] > 1:
+                    return index
+        return 0
+
+    def _discard(self, index: int):
+        del self._queue[index]
+        self.task_done()
+
+    def stats(self) -> dict:
+        """キューの状態と捨てた件数を返す"""
+        return {
+            "size": self.qsize(),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "policy": self.policy,
+            "dropped": dict(self.dropped),
+        }
@@ -0,0 +1,193 @@
+"""
+音声合成の全体スケジューラ
+
+ギルドごとの TTS ワーカーは合成ジョブをここへ出す。
+エンジンごとに同時実行数の上限を設け、空きができたら
+ギルド間で Deficit Round Robin（重みつき）で順番を回す。
+発言の多いギルドが合成能力を独占しても、静かなギルドの待ち時間は増えない
+"""
+import asyncio
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class _GuildWait:
+    """ギルドごとの待ち時間統計"""
+
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, wait: float):
+        self.count += 1
+        self.total += wait
+        self.last = wait
+        if wait > self.max:
+            self.max = wait
+
+    def as_dict(self) -> dict:
+        return {
+            "jobs": self.count,
+            "avg_wait": self.total / self.count if self.count else 0.0,
+            "max_wait": self.max,
+            "last_wait": self.last,
+        }
+
+
+class _EngineState:
+    """エンジンごとの実行状況と待ち行列"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.queues: Dict[int, deque] = defaultdict(deque)  # guild_id -> (future, cost)
+        self.active: deque = deque()  # 待ちのあるギルド（巡回順）
+        self.deficit: Dict[int, float] = defaultdict(float)
+        self.current: Optional[int] = None  # 今回のラウンドで quantum を足したギルド
+        self.waits: Dict[int, _GuildWait] = defaultdict(_GuildWait)
+
+
+class SynthesisScheduler:
+    """
+    エンジンごとの同時実行上限つき・ギルド間公平な合成スケジューラ
+
+    使い方:
+        pcm = await scheduler.run("voicevox", guild_id, lambda: synth(...))
+    """
+
+    def __init__(self, limits: Dict[str, int], default_limit: int = 2,
+                 quantum: float = 1.0):
+        """
+        Args:
+            limits: エンジン名 -> 同時実行数の上限
+            default_limit: limits に無いエンジンの上限
+            quantum: 1ラウンドでギルドに与える実行枠（重み 1 のとき）
+        """
+        self.default_limit = default_limit
+        self.quantum = quantum
+        self._weights: Dict[int, float] = {}
+        self._engines: Dict[str, _EngineState] = {
+            engine: _EngineState(max(1, limit)) for engine, limit in limits.items()
+        }
+
+    def _state(self, engine: str) -> _EngineState:
+        state = self._engines.get(engine)
+        if state is None:
+            state = self._engines[engine] = _EngineState(self.default_limit)
+        return state
+
+    def set_weight(self, guild_id: int, weight: float):
+        """ギルドの重みを設定する（大きいほど1ラウンドで多く実行できる）"""
+        self._weights[guild_id] = weight
+
+    async def run(self, engine: str, guild_id: int,
+                  job: Callable[[], Awaitable], cost: float = 1.0):
+        """
+        順番が来たら job を実行して結果を返す
+
+        Args:
+            engine: エンジン名（同時実行数の上限の単位）
+            guild_id: ギルドID（公平性の単位）
+            job: 実行するコルーチンを返す関数
+            cost: このジョブの重さ（既定は1件=1）
+
+        Returns:
+            job の戻り値
+        """
+        state = self._state(engine)
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        enqueued_at = loop.time()
+
+        state.queues[guild_id].append((granted, cost))
+        if guild_id not in state.active:
+            state.active.append(guild_id)
+        self._dispatch(state)
+
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # 枠をもらった直後にキャンセルされた
+                state.running -= 1
+                self._dispatch(state)
+            else:
+                granted.cancel()
+            raise
+
+        state.waits[guild_id].record(loop.time() - enqueued_at)
+
+        try:
+            return await job()
+        finally:
+            state.running -= 1
+            self._dispatch(state)
+
+    def _dispatch(self, state: _EngineState):
+        """空き枠を Deficit Round Robin でギルドに割り当てる"""
+        while state.running < state.limit and state.active:
+            guild_id = state.active[0]
+            queue = state.queues[guild_id]
+
+            # キャンセル済みの待ちは捨てる
+            while queue and queue[0][0].done():
+                queue.popleft()
+
+            if not queue:
+                self._retire(state, guild_id)
+                continue
+
+            if state.current != guild_id:
+                state.current = guild_id
+                state.deficit[guild_id] += self.quantum * self._weights.get(guild_id, 1.0)
+
+            granted, cost = queue[0]
+            if state.deficit[guild_id] < cost:
+                # 今回のラウンドの枠を使い切ったので次のギルドへ
+                state.active.rotate(-1)
+                state.current = None
+                continue
+
+            queue.popleft()
+            state.deficit[guild_id] -= cost
+            state.running += 1
+            granted.set_result(None)
+
+            if not queue:
+                self._retire(state, guild_id)
+
+    @staticmethod
+    def _retire(state: _EngineState, guild_id: int):
+        """待ちのなくなったギルドを巡回から外す"""
+        state.active.remove(guild_id)
+        state.queues.pop(guild_id, None)
+        state.deficit.pop(guild_id, None)
+        if state.current == guild_id:
+            state.current = None
+
+    def queue_depth(self, engine: str) -> int:
+        """エンジンの待ち件数"""
+        state = self._state(engine)
+        return sum(
+            1 for queue in state.queues.values()
+            for granted, _ in queue if not granted.done()
+        )
+
+    def stats(self) -> dict:
+        """エンジンごとの実行状況とギルドごとの待ち時間を返す"""
+        return {
+            engine: {
+                "limit": state.limit,
+                "running": state.running,
+                "waiting": self.queue_depth(engine),
+                "guilds": {
+                    guild_id: wait.as_dict()
+                    for guild_id, wait in state.waits.items()
+                },
+            }
+            for engine, state in self._engines.items()
+        }
@@ -0,0 +1,53 @@
+"""
+読み上げ対象のテキストチャンネル -> VC の索引
+
+読み上げるのは次のチャンネルのメッセージ:
+- VC に組み込まれたテキストチャット（チャンネル自体が VoiceChannel）
+- VC と同じ名前のテキストチャンネル（従来の「VCテキスト」）
+
+ギルドごとに「チャンネルID -> VCのID」の辞書を持ち、on_message では
+辞書を1回引くだけで読み上げ対象かどうかを判定する。
+索引はギルドで初めて引いたときに作り、チャンネルの作成・変更・削除の
+イベントで作り直す
+"""
+from typing import Dict, Optional
+
+
+class VoiceTextIndex:
+    """ギルドごとのチャンネルID -> VCのID の索引"""
+
+    def __init__(self):
+        self._guilds: Dict[int, Dict[int, int]] = {}
+
+    def build(self, guild) -> Dict[int, int]:
+        """ギルドの索引を作り直す"""
+        # 同名の VC が複数あるときは並び順で先のものを使う
+        voice_by_name: Dict[str, int] = {}
+        mapping: Dict[int, int] = {}
+        for voice in guild.voice_channels:
+            voice_by_name.setdefault(voice.name, voice.id)
+            mapping[voice.id] = voice.id
+
+        for channel in guild.text_channels:
+            voice_id = voice_by_name.get(channel.name)
+            if voice_id is not None:
+                mapping[channel.id] = voice_id
+
+        self._guilds[guild.id] = mapping
+        return mapping
+
+    def refresh(self, guild):
+        """チャンネルが変わったギルドの索引を作り直す（まだ作っていなければ何もしない）"""
+        if guild.id in self._guilds:
+            self.build(guild)
+
+    def discard(self, guild_id: int):
+        """ギルドの索引を捨てる"""
+        self._guilds.pop(guild_id, None)
+
+    def voice_channel_id(self, guild, channel_id: int) -> Optional[int]:
+        """チャンネルに対応する VC のID（読み上げ対象でなければ None）"""
+        mapping = self._guilds.get(guild.id)
+        if mapping is None:
+            mapping = self.build(guild)
+        return mapping.get(channel_id)
@@ -1,50 +1,176 @@
 import aiohttp
 import io
+import unicodedata
+from typing import Dict, Optional
+
+from .lru import LRUCache
+
+# 1リクエストあたりのタイムアウト（秒）と、そのうち接続を張るまでの上限
+DEFAULT_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 5.0
+# 使っていない接続を残しておく時間（秒）
+KEEPALIVE_TIMEOUT = 60.0
+# audio_query の結果を覚えておく件数
+QUERY_CACHE_SIZE = 512
+# 1回に読ませる最大文字数
+MAX_TEXT_LEN = 120
+
+
+def normalize_text(text: str) -> str:
+    """audio_query に渡すテキスト（キャッシュのキーにもする）"""
+    return unicodedata.normalize("NFKC", text[:MAX_TEXT_LEN]).strip()
+
 
 class VoicevoxEngine:
+    """
+    VOICEVOX エンジンの HTTP クライアント
+
+    セッションは1つだけ作って使い回し、接続は keep-alive でプールする
+    （発話ごとにセッションを作ると、毎回接続の確立からやり直しになる）。
+    プールの大きさは合成スケジューラの同時実行数に合わせる
+
+    audio_query の結果は話速・音高に依らないので (テキスト, 話者) ごとに
+    覚えておき、同じフレーズは /synthesis だけで済ませる
+    """
 
-    def __init__(self, host="localhost", port=50021):
+    def __init__(self, host="localhost", port=50021,
+                 pool_size=4, timeout=DEFAULT_TIMEOUT,
+                 query_cache_size=QUERY_CACHE_SIZE) -> None:
         self.base = f"http://{host}:{port}"
-        self.voice_dict = {}
+        self.voice_dict: Dict[str, Dict[str, int]] = {}
+        self.pool_size = max(1, pool_size)
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout, connect=min(CONNECT_TIMEOUT, timeout)
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # (テキスト, 話者ID) -> audio_query の結果（LRU）
+        self.query_cache_size = query_cache_size
+        self._queries = LRUCache(query_cache_size)
+
+        # 接続の使い回し状況
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.connections_queued = 0  # プールが埋まっていて空きを待った回数
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            self.connections_queued += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_queued_start.append(on_connection_queued_start)
+        return trace
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """共有のセッション（イベントループ上で初めて使うときに作る）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._trace_config()]
+            )
+        return self._session
+
+    async def close(self):
+        """セッションとプール中の接続を閉じる（Bot終了時に呼ぶ）"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> dict:
+        """接続の使い回しと audio_query キャッシュの状況"""
+        connections = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "created": self.connections_created,
+            "reused": self.connections_reused,
+            "queued": self.connections_queued,
+            "reuse_rate": self.connections_reused / connections if connections else 0.0,
+            "query_cache": len(self._queries),
+            "query_hits": self._queries.hits,
+            "query_misses": self._queries.misses,
+        }
 
     async def initialize(self):
         """Bot起動時に一度だけ呼ぶ"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.base}/speakers") as res:
-                data = await res.json()
+        async with self.session.get(f"{self.base}/speakers") as res:
+            res.raise_for_status()
+            data = await res.json()
 
         self.voice_dict = {
             s["name"]: {st["name"]: st["id"] for st in s["styles"]}
             for s in data
         }
 
+    async def initialize_speaker(self, speaker_id):
+        """話者のモデルを読み込ませておく（初回合成の遅延をなくす）"""
+        async with self.session.post(
+            f"{self.base}/initialize_speaker",
+            params={"speaker": speaker_id, "skip_reinit": "true"}
+        ) as res:
+            res.raise_for_status()
+
     def get_id(self, name: str, style: str = "ノーマル"):
         if name in self.voice_dict:
             styles = self.voice_dict[name]
             return styles.get(style, list(styles.values())[0])
         return 1  # fallback
 
-    async def synthesize(self, text, speaker_id, speed=1.0, pitch=0.0):
-        """tts_workerから呼ぶ用"""
+    async def audio_query(self, text, speaker_id) -> dict:
+        """
+        audio_query の結果を返す（キャッシュにあればそれを返す）
+
+        返した辞書はキャッシュと共有なので書き換えないこと
+        """
+        key = (text, speaker_id)
+        cached: Optional[dict] = self._queries.get(key)
+        if cached is not None:
+            return cached
 
-        limited_text = text[:120]
+        async with self.session.post(
+            f"{self.base}/audio_query",
+            params={"text": text, "speaker": speaker_id}
+        ) as res:
+            res.raise_for_status()
+            query: dict = await res.json()
 
-        async with aiohttp.ClientSession() as session:
+        self._queries.put(key, query)
+        return query
+
+    async def synthesize(self, text, speaker_id, speed=1.0, pitch=0.0):
+        """tts_workerから呼ぶ用"""
 
-            async with session.post(
-                f"{self.base}/audio_query",
-                params={"text": limited_text, "speaker": speaker_id}
-            ) as res:
-                query = await res.json()
+        query = await self.audio_query(normalize_text(text), speaker_id)
 
-            query["speedScale"] = speed
-            query["pitchScale"] = pitch
+        # 浅いコピーで話速・音高だけ差し替える（accent_phrases はキャッシュと共有）
+        query = {**query, "speedScale": speed, "pitchScale": pitch}
 
-            async with session.post(
-                f"{self.base}/synthesis",
-                params={"speaker": speaker_id},
-                json=query
-            ) as res:
-                data = await res.read()
+        async with self.session.post(
+            f"{self.base}/synthesis",
+            params={"speaker": speaker_id},
+            json=query
+        ) as res:
+            res.raise_for_status()
+            data = await res.read()
 
         return io.BytesIO(data)
@@ -10,6 +10,20 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# config を読み込むモジュール（pyfiles.services.storage など）は
+# パッケージごとインポートするので、リポジトリのルートもパスに追加する
+sys.path.insert(0, str(project_root.parent))
+
+# config の必須設定（テスト用のダミー値）
+for name, value in {
+    "DISCORD_TOKEN": "test-token",
+    "DEVELOPER_ID": "1",
+    "VOICE_CHANNEL_ID": "1",
+    "RCON_HOST": "localhost",
+    "RCON_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
 
 @pytest.fixture
 def temp_db(tmp_path):
@@ -18,16 +32,34 @@ def temp_db(tmp_path):
 
 
 @pytest.fixture
-def db_storage(temp_db):
-    """テスト用の SQLiteStorage インスタンス"""
-    from services.storage import SQLiteStorage
-    storage = SQLiteStorage(temp_db)
-    yield storage
+def init_db(temp_db):
+    """テーブルを作成した一時データベースのパス"""
+    import asyncio
+    from pyfiles.services.storage.database import get_database
+    from pyfiles.services.storage.init_db import DBInitializer
+
+    asyncio.run(DBInitializer(temp_db).init())
+    yield temp_db
     # クリーンアップ
+    get_database(temp_db).close()
     if os.path.exists(temp_db):
         os.remove(temp_db)
 
 
+@pytest.fixture
+def db_storage(init_db):
+    """テスト用の AsyncVCAllowStorage インスタンス"""
+    from pyfiles.services.storage import AsyncVCAllowStorage
+    return AsyncVCAllowStorage(init_db)
+
+
+@pytest.fixture
+def dict_storage(init_db):
+    """テスト用の AsyncTTSDictStorage インスタンス"""
+    from pyfiles.services.storage import AsyncTTSDictStorage
+    return AsyncTTSDictStorage(init_db)
+
+
 @pytest.fixture
 def mock_interaction():
     """モック Discord Interaction"""
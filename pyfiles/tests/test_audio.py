@@ -0,0 +1,77 @@
+"""
+services/audio.py のテスト
+"""
+import io
+import pytest
+
+
+class TestPCM:
+    """PCM 変換と PCMAudioSource のテスト"""
+
+    def test_to_pcm_frame_aligned_stereo(self):
+        """48kHz ステレオ・20ms フレーム境界に揃う"""
+        import numpy as np
+        from services.audio import to_pcm, SAMPLES_PER_FRAME
+        pcm = to_pcm(np.ones(1000) * 0.5, 48000)
+
+        assert pcm.dtype == np.int16
+        assert pcm.shape == (SAMPLES_PER_FRAME * 2, 2)
+        assert pcm[0, 0] == pcm[0, 1] == 32767
+        assert not pcm[1000:].any()
+
+    def test_wav_to_pcm_resamples_voicevox(self):
+        """VOICEVOX の 24kHz WAV を 48kHz にする（音量はそのまま）"""
+        import numpy as np
+        import soundfile as sf
+        from services.audio import wav_to_pcm
+        wav = np.full(2400, 1000, dtype=np.int16)
+        buffer = io.BytesIO()
+        sf.write(buffer, wav, 24000, format="WAV", subtype="PCM_16")
+
+        pcm = wav_to_pcm(buffer)
+        assert pcm.shape == (4800, 2)
+        assert pcm[100, 0] == 1000
+
+    def test_pcm_source_reads_frames(self):
+        """20ms ずつ bytes で返し、終わったら空を返す"""
+        import numpy as np
+        from services.audio import PCMAudioSource, FRAME_SIZE
+        source = PCMAudioSource(np.zeros((960 * 3, 2), dtype=np.int16))
+
+        frames = []
+        while frame := source.read():
+            frames.append(frame)
+
+        assert len(frames) == 3
+        assert all(isinstance(f, bytes) and len(f) == FRAME_SIZE for f in frames)
+        assert not source.is_opus()
+
+
+class TestOpusClip:
+    """OpusClip と OpusAudioSource のテスト"""
+
+    def test_pack_and_read(self):
+        """詰めたパケットをそのままの順で読み出せる"""
+        from services.audio import OpusClip, OpusAudioSource, clip_duration
+        packets = [b"\x01\x02", b"", b"\x03" * 300]
+        clip = OpusClip.pack(packets)
+
+        assert clip.frames == 3
+        assert clip.nbytes == 2 * 3 + 302
+        assert clip_duration(clip) == pytest.approx(0.06)
+
+        source = OpusAudioSource(clip)
+        assert source.is_opus()
+        assert [source.read() for _ in range(3)] == packets
+        assert source.read() == b""
+
+    def test_make_audio_source(self):
+        """クリップの種類に合った AudioSource を選ぶ"""
+        import numpy as np
+        from services.audio import (
+            OpusClip, OpusAudioSource, PCMAudioSource, make_audio_source
+        )
+        assert isinstance(make_audio_source(OpusClip.pack([])), OpusAudioSource)
+        assert isinstance(
+            make_audio_source(np.zeros((960, 2), dtype=np.int16)), PCMAudioSource
+        )
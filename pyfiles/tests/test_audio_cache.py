@@ -0,0 +1,197 @@
+"""
+services/audio_cache.py のテスト
+"""
+import pytest
+
+
+class TestAudioCache:
+    """AudioCache クラスのテスト"""
+
+    def test_make_key_normalizes_text(self):
+        """全角・半角や空白の違いは同じキーになる"""
+        from services.audio_cache import make_key
+        assert make_key("openjtalk", 1, 1.0, 0.0, "ＡＢＣ  おはよう ") == \
+            make_key("OpenJTalk", 1, 1, 0, "ABC おはよう")
+
+    def test_make_key_distinguishes_profile(self):
+        """声の設定が違えば別のキーになる"""
+        from services.audio_cache import make_key
+        assert make_key("voicevox", 1, 1.0, 0.0, "草") != \
+            make_key("voicevox", 2, 1.0, 0.0, "草")
+        assert make_key("voicevox", 1, 1.0, 0.0, "草") != \
+            make_key("voicevox", 1, 1.5, 0.0, "草")
+
+    def test_get_miss_and_hit(self):
+        """ヒット・ミスが記録される"""
+        from services.audio_cache import AudioCache
+        cache = AudioCache(max_bytes=100)
+
+        assert cache.get("a") is None
+        cache.put("a", b"1234")
+        assert cache.get("a") == b"1234"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        """上限を超えたら最も使われていないものから追い出す"""
+        from services.audio_cache import AudioCache
+        cache = AudioCache(max_bytes=10)
+
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.current_bytes == 8
+        assert cache.evictions == 1
+
+    def test_put_replaces_existing(self):
+        """同じキーの再登録でバイト数が二重計上されない"""
+        from services.audio_cache import AudioCache
+        cache = AudioCache(max_bytes=10)
+
+        cache.put("a", b"1234")
+        cache.put("a", b"12")
+
+        assert len(cache) == 1
+        assert cache.current_bytes == 2
+
+    def test_put_too_large(self):
+        """単体で上限を超えるものは登録しない"""
+        from services.audio_cache import AudioCache
+        cache = AudioCache(max_bytes=4)
+
+        assert not cache.put("a", b"12345")
+        assert len(cache) == 0
+
+    def test_numpy_size(self):
+        """numpy 配列は nbytes で大きさを測る"""
+        import numpy as np
+        from services.audio_cache import AudioCache
+        cache = AudioCache(max_bytes=1000)
+
+        cache.put("a", np.zeros((10, 2), dtype=np.int16))
+        assert cache.current_bytes == 40
+
+
+class TestDiskAudioCache:
+    """DiskAudioCache クラスのテスト"""
+
+    @staticmethod
+    def _pcm(frames, value=1):
+        import numpy as np
+        return np.full((frames, 2), value, dtype=np.int16)
+
+    def test_put_and_get(self, tmp_path):
+        """書き込んだ PCM をメモリマップで読み戻せる"""
+        import numpy as np
+        from services.audio_cache import DiskAudioCache, make_key
+        cache = DiskAudioCache(str(tmp_path))
+        key = make_key("voicevox", 3, 1.0, 0.0, "おはよう")
+
+        assert cache.get(key) is None
+        assert cache.put(key, self._pcm(960, 7))
+
+        pcm = cache.get(key)
+        assert pcm.shape == (960, 2)
+        assert np.all(pcm == 7)
+        assert not pcm.flags.writeable
+
+    def test_survives_restart(self, tmp_path):
+        """作り直しても内容とヒット回数が残る"""
+        from services.audio_cache import DiskAudioCache, make_key
+        key = make_key("openjtalk", 1, 1.0, 0.0, "草")
+
+        cache = DiskAudioCache(str(tmp_path))
+        cache.put(key, self._pcm(960))
+        cache.get(key)
+        cache.save_index()
+
+        reopened = DiskAudioCache(str(tmp_path))
+        assert key in reopened
+        assert reopened.current_bytes == 960 * 4
+        assert reopened.most_frequent(10) == [key]
+
+    def test_evicts_oldest_access(self, tmp_path):
+        """容量上限を超えたらアクセスの古いものから削除する"""
+        import time
+        from services.audio_cache import DiskAudioCache
+        cache = DiskAudioCache(str(tmp_path), max_bytes=960 * 4 * 2)
+
+        cache.put(("a",), self._pcm(960))
+        time.sleep(0.01)
+        cache.put(("b",), self._pcm(960))
+        time.sleep(0.01)
+        cache.get(("a",))
+        cache.put(("c",), self._pcm(960))
+
+        assert ("a",) in cache
+        assert ("b",) not in cache
+        assert ("c",) in cache
+        assert len(list(tmp_path.glob("*.pcm"))) == 2
+
+    def test_warm_loads_most_frequent(self, tmp_path):
+        """ヒット回数の多いものからメモリキャッシュへ読み込む"""
+        from services.audio_cache import AudioCache, DiskAudioCache
+        disk = DiskAudioCache(str(tmp_path))
+        disk.put(("a",), self._pcm(960))
+        disk.put(("b",), self._pcm(960))
+        disk.get(("b",))
+        disk.note_hit(("b",))
+
+        memory = AudioCache()
+        assert disk.warm(memory, 1) == 1
+        assert ("b",) in memory
+        assert ("a",) not in memory
+
+    def test_warm_encodes_clips(self, tmp_path):
+        """変換関数を渡すと、変換したクリップをメモリキャッシュへ置く"""
+        from services.audio_cache import AudioCache, DiskAudioCache
+        disk = DiskAudioCache(str(tmp_path))
+        disk.put(("a",), self._pcm(960))
+
+        memory = AudioCache()
+        assert disk.warm(memory, 1, encode=lambda pcm: b"encoded") == 1
+        assert memory.get(("a",)) == b"encoded"
+
+    def test_note_hit_does_not_write_index(self, tmp_path):
+        """メモリ層のヒットは数えるだけで、インデックスは save_index で書き出す"""
+        from services.audio_cache import DiskAudioCache
+        disk = DiskAudioCache(str(tmp_path))
+        disk.put(("a",), self._pcm(960))
+        disk.save_index()
+        index = tmp_path / DiskAudioCache.INDEX_FILE
+        before = index.read_text(encoding="utf-8")
+
+        for _ in range(100):
+            disk.note_hit(("a",))
+
+        assert index.read_text(encoding="utf-8") == before
+        assert disk.dirty
+        assert disk.save_index()
+        assert not disk.dirty
+
+        reopened = DiskAudioCache(str(tmp_path))
+        assert reopened._entries[DiskAudioCache.digest(("a",))]["hits"] == 100
+
+    def test_flush_index_periodically(self, tmp_path):
+        """更新があればインデックスを書き出す"""
+        import asyncio
+        from services.audio_cache import DiskAudioCache, flush_index_periodically
+        disk = DiskAudioCache(str(tmp_path))
+        disk.put(("a",), self._pcm(960))
+
+        async def main():
+            task = asyncio.create_task(flush_index_periodically(disk, 0.01))
+            await asyncio.sleep(0.1)
+            task.cancel()
+
+        asyncio.run(main())
+        assert not disk.dirty
+        assert DiskAudioCache(str(tmp_path)).most_frequent(1) == [("a",)]
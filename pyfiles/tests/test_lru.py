@@ -0,0 +1,53 @@
+"""
+services/lru.py のテスト
+"""
+import pytest
+
+
+class TestLRUCache:
+    """LRUCache クラスのテスト"""
+
+    def test_get_records_hits(self):
+        """ヒット・ミスを数え、peek は数えない"""
+        from services.lru import LRUCache
+        cache = LRUCache(2)
+        cache.put("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.peek("a") == 1
+        assert cache.stats() == {
+            "entries": 1, "evictions": 0, "hits": 1, "misses": 1, "hit_rate": 0.5
+        }
+
+    def test_evicts_least_recently_used(self):
+        """件数の上限を超えたら一番使われていないものから追い出す"""
+        from services.lru import LRUCache
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert cache.evictions == 1
+
+    def test_sizeof(self):
+        """sizeof を渡すと大きさの合計で上限を数える"""
+        from services.lru import LRUCache
+        cache = LRUCache(5, sizeof=len)
+
+        assert cache.put("a", "123")
+        assert not cache.put("b", "123456")
+        assert cache.put("a", "1")
+        assert cache.size == 1
+        assert cache.pop("a") == "1"
+        assert cache.size == 0
+
+    def test_zero_size_disables_cache(self):
+        """上限 0 なら何も覚えない"""
+        from services.lru import LRUCache
+        cache = LRUCache(0)
+        assert not cache.put("a", 1)
+        assert len(cache) == 0
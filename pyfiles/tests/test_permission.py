@@ -9,39 +9,39 @@ class TestPermission:
     
     def test_is_admin_or_dev_with_dev(self, mock_interaction):
         """開発者IDの場合は True"""
-        from services.permission import is_admin_or_dev
+        from pyfiles.services.permission import is_admin_or_dev
         from unittest.mock import patch
         
         # DEVELOPER_ID を mock_interaction.user.id と同じにする
-        with patch('services.permission.DEVELOPER_ID', mock_interaction.user.id):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', mock_interaction.user.id):
             assert is_admin_or_dev(mock_interaction)
     
     def test_is_admin_or_dev_with_admin(self, mock_interaction):
         """管理者権限がある場合は True"""
-        from services.permission import is_admin_or_dev
+        from pyfiles.services.permission import is_admin_or_dev
         from unittest.mock import patch, MagicMock
         
         # 管理者権限を持つ user をモック
         mock_interaction.user.guild_permissions = MagicMock()
         mock_interaction.user.guild_permissions.administrator = True
         
-        with patch('services.permission.DEVELOPER_ID', 99999):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 99999):
             assert is_admin_or_dev(mock_interaction)
     
     def test_is_admin_or_dev_without_permissions(self, mock_interaction):
         """権限がない場合は False"""
-        from services.permission import is_admin_or_dev
+        from pyfiles.services.permission import is_admin_or_dev
         from unittest.mock import patch, MagicMock
         
         mock_interaction.user.guild_permissions = MagicMock()
         mock_interaction.user.guild_permissions.administrator = False
         
-        with patch('services.permission.DEVELOPER_ID', 99999):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 99999):
             assert not is_admin_or_dev(mock_interaction)
     
     def test_can_use_vc_with_admin(self, mock_interaction):
         """管理者は VC コマンド を使用可能"""
-        from services.permission import can_use_vc
+        from pyfiles.services.permission import can_use_vc
         from unittest.mock import patch, MagicMock
         
         mock_interaction.user.guild_permissions = MagicMock()
@@ -49,12 +49,12 @@ class TestPermission:
         
         allow_data = {"users": [], "roles": []}
         
-        with patch('services.permission.DEVELOPER_ID', 99999):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 99999):
             assert can_use_vc(mock_interaction, allow_data)
     
     def test_can_use_vc_with_permitted_user(self, mock_interaction):
         """許可ユーザーは VC コマンド を使用可能"""
-        from services.permission import can_use_vc
+        from pyfiles.services.permission import can_use_vc
         from unittest.mock import patch, MagicMock
         
         mock_interaction.user.guild_permissions = MagicMock()
@@ -63,12 +63,12 @@ class TestPermission:
         user_id = mock_interaction.user.id
         allow_data = {"users": [user_id], "roles": []}
         
-        with patch('services.permission.DEVELOPER_ID', 99999):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 99999):
             assert can_use_vc(mock_interaction, allow_data)
     
     def test_can_use_vc_with_permitted_role(self, mock_interaction):
         """許可ロールを持つユーザーは VC コマンド を使用可能"""
-        from services.permission import can_use_vc
+        from pyfiles.services.permission import can_use_vc
         from unittest.mock import patch, MagicMock
         
         mock_interaction.user.guild_permissions = MagicMock()
@@ -82,12 +82,12 @@ class TestPermission:
         
         allow_data = {"users": [], "roles": [role_id]}
         
-        with patch('services.permission.DEVELOPER_ID', 77777):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 77777):
             assert can_use_vc(mock_interaction, allow_data)
     
     def test_can_use_vc_without_permissions(self, mock_interaction):
         """許可がないユーザーは VC コマンド を使用不可"""
-        from services.permission import can_use_vc
+        from pyfiles.services.permission import can_use_vc
         from unittest.mock import patch, MagicMock
         
         mock_interaction.user.guild_permissions = MagicMock()
@@ -96,5 +96,41 @@ class TestPermission:
         
         allow_data = {"users": [], "roles": []}
         
-        with patch('services.permission.DEVELOPER_ID', 99999):
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 99999):
             assert not can_use_vc(mock_interaction, allow_data)
+
+    def test_can_use_vc_with_snapshot(self, mock_interaction):
+        """VCPermissions でも辞書と同じように判定できる"""
+        from pyfiles.services.permission import can_use_vc, VCPermissions
+        from unittest.mock import patch, MagicMock
+
+        mock_interaction.user.guild_permissions = MagicMock()
+        mock_interaction.user.guild_permissions.administrator = False
+        mock_role = MagicMock()
+        mock_role.id = 99999
+        mock_interaction.user.roles = [mock_role]
+
+        with patch('pyfiles.services.permission.DEVELOPER_ID', 77777):
+            assert can_use_vc(mock_interaction, VCPermissions(roles=frozenset({99999})))
+            assert can_use_vc(mock_interaction, VCPermissions(users=frozenset({12345})))
+            assert not can_use_vc(mock_interaction, VCPermissions(frozenset({1}), frozenset({2})))
+
+
+class TestVCPermissions:
+    """VCPermissions のテスト"""
+
+    def test_from_data(self):
+        """辞書から frozenset のスナップショットを作る"""
+        from pyfiles.services.permission import VCPermissions
+        perms = VCPermissions.from_data({"users": [1, 2], "roles": [3]})
+        assert perms.users == frozenset({1, 2})
+        assert perms.roles == frozenset({3})
+
+    def test_with_user_and_role(self):
+        """追加・削除は新しいスナップショットを返し、元は変えない"""
+        from pyfiles.services.permission import VCPermissions
+        perms = VCPermissions()
+        added = perms.with_user(1).with_role(2)
+        assert added == VCPermissions(frozenset({1}), frozenset({2}))
+        assert perms == VCPermissions()
+        assert added.with_user(1, False).with_role(2, False) == VCPermissions()
@@ -0,0 +1,106 @@
+"""
+services/reply_cache.py のテスト
+"""
+import asyncio
+import pytest
+
+
+class TestMessageAuthorCache:
+    """MessageAuthorCache クラスのテスト"""
+
+    def test_remember_and_get(self):
+        """覚えた発言者名を返し、知らないものは None"""
+        from services.reply_cache import MessageAuthorCache
+        cache = MessageAuthorCache()
+        cache.remember(1, 100, "ふらん")
+
+        assert cache.get(1, 100) == "ふらん"
+        assert cache.get(1, 101) is None
+        assert cache.get(2, 100) is None
+        assert cache.stats()["hits"] == 1
+
+    def test_per_channel_limit(self):
+        """チャンネルごとに古いメッセージから忘れる"""
+        from services.reply_cache import MessageAuthorCache
+        cache = MessageAuthorCache(per_channel=2)
+        cache.remember(1, 100, "a")
+        cache.remember(1, 101, "b")
+        cache.get(1, 100)
+        cache.remember(1, 102, "c")  # 101 が消える
+
+        assert cache.get(1, 100) == "a"
+        assert cache.get(1, 101) is None
+        assert cache.get(1, 102) == "c"
+
+    def test_channel_limit(self):
+        """チャンネル数の上限を超えたら古いチャンネルから忘れる"""
+        from services.reply_cache import MessageAuthorCache
+        cache = MessageAuthorCache(max_channels=2)
+        for channel_id in (1, 2, 3):
+            cache.remember(channel_id, 100, str(channel_id))
+
+        assert cache.get(1, 100) is None
+        assert cache.get(3, 100) == "3"
+
+
+class TestResolveReplyAuthor:
+    """resolve_reply_author 関数のテスト"""
+
+    @staticmethod
+    def make_message(fetched=None):
+        class Reference:
+            message_id = 100
+            channel_id = 1
+            resolved = None
+            cached_message = None
+
+        class Channel:
+            id = 1
+            fetch_count = 0
+
+            async def fetch_message(self, message_id):
+                Channel.fetch_count += 1
+                return fetched
+
+        class Message:
+            reference = Reference()
+            channel = Channel()
+
+        return Message()
+
+    def test_uses_cache_before_rest(self):
+        """覚えている発言者名があれば REST を使わない"""
+        from services.reply_cache import MessageAuthorCache, resolve_reply_author
+        cache = MessageAuthorCache()
+        cache.remember(1, 100, "ふらん")
+        message = self.make_message()
+
+        name = asyncio.run(resolve_reply_author(message, cache))
+        assert name == "ふらん"
+        assert message.channel.fetch_count == 0
+
+    def test_skip_rest(self):
+        """fetch=False なら見つからなくても REST を使わない"""
+        from services.reply_cache import MessageAuthorCache, resolve_reply_author
+        message = self.make_message()
+
+        name = asyncio.run(resolve_reply_author(message, MessageAuthorCache(), fetch=False))
+        assert name is None
+        assert message.channel.fetch_count == 0
+
+    def test_rest_result_is_remembered(self):
+        """REST で取った発言者名は覚えておく"""
+        from services.reply_cache import MessageAuthorCache, resolve_reply_author
+
+        class Author:
+            display_name = "れみりあ"
+
+        class Fetched:
+            id = 100
+            author = Author()
+
+        cache = MessageAuthorCache()
+        message = self.make_message(Fetched())
+
+        assert asyncio.run(resolve_reply_author(message, cache)) == "れみりあ"
+        assert cache.get(1, 100) == "れみりあ"
@@ -1,110 +1,296 @@
 """
-services/storage.py のテスト
+services/storage のテスト
 """
+import asyncio
 import pytest
 
+GUILD_ID = 67890
 
-class TestSQLiteStorage:
-    """SQLiteStorage クラスのテスト"""
-    
-    def test_init_creates_database(self, temp_db):
+
+class TestAsyncVCAllowStorage:
+    """AsyncVCAllowStorage クラスのテスト"""
+
+    def test_init_creates_database(self, init_db):
         """データベース初期化が成功"""
-        from services.storage import SQLiteStorage
-        storage = SQLiteStorage(temp_db)
-        assert storage.db_path == temp_db
-    
+        from pyfiles.services.storage import AsyncVCAllowStorage
+        storage = AsyncVCAllowStorage(init_db)
+        assert storage.db_path == init_db
+
     def test_add_user(self, db_storage):
         """ユーザー許可を追加"""
         user_id = 12345
-        assert db_storage.add_user(user_id)
-        
+        assert asyncio.run(db_storage.add_user(GUILD_ID, user_id))
+
         # 追加したユーザーが含まれているか確認
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert user_id in data["users"]
-    
+
     def test_add_user_duplicate(self, db_storage):
         """重複したユーザーは追加不可"""
         user_id = 12345
-        db_storage.add_user(user_id)
-        
+        asyncio.run(db_storage.add_user(GUILD_ID, user_id))
+
         # 2回目は失敗
-        assert not db_storage.add_user(user_id)
-    
+        assert not asyncio.run(db_storage.add_user(GUILD_ID, user_id))
+
     def test_remove_user(self, db_storage):
         """ユーザー許可を削除"""
         user_id = 12345
-        db_storage.add_user(user_id)
-        assert db_storage.remove_user(user_id)
-        
+        asyncio.run(db_storage.add_user(GUILD_ID, user_id))
+        assert asyncio.run(db_storage.remove_user(GUILD_ID, user_id))
+
         # 削除後は存在しない
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert user_id not in data["users"]
-    
+
     def test_remove_user_not_exists(self, db_storage):
         """存在しないユーザーの削除は失敗"""
-        assert not db_storage.remove_user(99999)
-    
+        assert not asyncio.run(db_storage.remove_user(GUILD_ID, 99999))
+
     def test_add_role(self, db_storage):
         """ロール許可を追加"""
         role_id = 54321
-        assert db_storage.add_role(role_id)
-        
+        assert asyncio.run(db_storage.add_role(GUILD_ID, role_id))
+
         # 追加したロールが含まれているか確認
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert role_id in data["roles"]
-    
+
     def test_add_role_duplicate(self, db_storage):
         """重複したロールは追加不可"""
         role_id = 54321
-        db_storage.add_role(role_id)
-        
+        asyncio.run(db_storage.add_role(GUILD_ID, role_id))
+
         # 2回目は失敗
-        assert not db_storage.add_role(role_id)
-    
+        assert not asyncio.run(db_storage.add_role(GUILD_ID, role_id))
+
     def test_remove_role(self, db_storage):
         """ロール許可を削除"""
         role_id = 54321
-        db_storage.add_role(role_id)
-        assert db_storage.remove_role(role_id)
-        
+        asyncio.run(db_storage.add_role(GUILD_ID, role_id))
+        assert asyncio.run(db_storage.remove_role(GUILD_ID, role_id))
+
         # 削除後は存在しない
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert role_id not in data["roles"]
-    
+
     def test_remove_role_not_exists(self, db_storage):
         """存在しないロールの削除は失敗"""
-        assert not db_storage.remove_role(99999)
-    
+        assert not asyncio.run(db_storage.remove_role(GUILD_ID, 99999))
+
     def test_load_empty(self, db_storage):
         """空のデータを読み込む"""
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert data == {"users": [], "roles": []}
-    
+
     def test_save_and_load(self, db_storage):
         """データの保存と読み込み"""
         test_data = {
             "users": [11111, 22222, 33333],
             "roles": [44444, 55555]
         }
-        db_storage.save(test_data)
-        
-        loaded_data = db_storage.load()
+        assert asyncio.run(db_storage.save(GUILD_ID, test_data))
+
+        loaded_data = asyncio.run(db_storage.load(GUILD_ID))
         assert sorted(loaded_data["users"]) == sorted(test_data["users"])
         assert sorted(loaded_data["roles"]) == sorted(test_data["roles"])
-    
+
+    def test_save_returns_changes(self, db_storage):
+        """保存すると追加・削除した ID だけが返る"""
+        asyncio.run(db_storage.save(GUILD_ID, {"users": [1, 2], "roles": [10]}))
+        changes = asyncio.run(db_storage.save(GUILD_ID, {"users": [2, 3], "roles": [10]}))
+
+        assert changes.added_users == frozenset({3})
+        assert changes.removed_users == frozenset({1})
+        assert not changes.added_roles and not changes.removed_roles
+
+        # 同じ内容なら何も変わらない（保存自体は成功）
+        same = asyncio.run(db_storage.save(GUILD_ID, {"users": [2, 3], "roles": [10]}))
+        assert same and not same.changed
+
+    def test_save_keeps_other_guilds(self, db_storage):
+        """保存は他のギルドの行に触れない"""
+        asyncio.run(db_storage.add_user(GUILD_ID + 1, 111))
+        asyncio.run(db_storage.save(GUILD_ID, {"users": [], "roles": []}))
+        assert asyncio.run(db_storage.load(GUILD_ID + 1))["users"] == [111]
+
     def test_multiple_users_and_roles(self, db_storage):
         """複数のユーザーとロールを管理"""
         # ユーザーを複数追加
         users = [111, 222, 333]
         for uid in users:
-            assert db_storage.add_user(uid)
-        
+            assert asyncio.run(db_storage.add_user(GUILD_ID, uid))
+
         # ロールを複数追加
         roles = [444, 555, 666]
         for rid in roles:
-            assert db_storage.add_role(rid)
-        
+            assert asyncio.run(db_storage.add_role(GUILD_ID, rid))
+
         # 全て含まれているか確認
-        data = db_storage.load()
+        data = asyncio.run(db_storage.load(GUILD_ID))
         assert sorted(data["users"]) == sorted(users)
         assert sorted(data["roles"]) == sorted(roles)
+
+    def test_guilds_are_separated(self, db_storage):
+        """ギルドごとに別々に管理される"""
+        asyncio.run(db_storage.add_user(GUILD_ID, 111))
+        assert asyncio.run(db_storage.load(GUILD_ID + 1)) == {"users": [], "roles": []}
+
+    def test_permissions_snapshot(self, db_storage):
+        """許可リストのスナップショットは書き込みに合わせて更新される"""
+        from pyfiles.services.permission import VCPermissions
+        asyncio.run(db_storage.add_user(GUILD_ID, 111))
+        assert asyncio.run(db_storage.permissions(GUILD_ID)) == VCPermissions(frozenset({111}))
+
+        asyncio.run(db_storage.add_role(GUILD_ID, 444))
+        asyncio.run(db_storage.remove_user(GUILD_ID, 111))
+        assert asyncio.run(db_storage.permissions(GUILD_ID)) == VCPermissions(roles=frozenset({444}))
+
+        asyncio.run(db_storage.save(GUILD_ID, {"users": [222], "roles": []}))
+        assert asyncio.run(db_storage.permissions(GUILD_ID)) == VCPermissions(frozenset({222}))
+
+    def test_permissions_cached(self, db_storage, init_db):
+        """読み込み後は DB を読まない"""
+        from pyfiles.services.storage import AsyncVCAllowStorage
+        assert asyncio.run(db_storage.permissions(GUILD_ID)).users == frozenset()
+
+        # 別のストレージから直接書き込んでも、スナップショットはそのまま
+        asyncio.run(AsyncVCAllowStorage(init_db).add_user(GUILD_ID, 111))
+        assert asyncio.run(db_storage.permissions(GUILD_ID)).users == frozenset()
+
+
+class TestAsyncTTSDictStorage:
+    """AsyncTTSDictStorage クラスのテスト"""
+
+    def test_add_and_list(self, dict_storage):
+        """単語を追加して一覧に出る"""
+        assert asyncio.run(dict_storage.add(GUILD_ID, "擬音語", "ぎおんご"))
+        assert asyncio.run(dict_storage.list(GUILD_ID)) == [("擬音語", "ぎおんご")]
+
+    def test_add_duplicate(self, dict_storage):
+        """同じ表記は追加不可"""
+        asyncio.run(dict_storage.add(GUILD_ID, "草", "くさ"))
+        assert not asyncio.run(dict_storage.add(GUILD_ID, "草", "わら"))
+
+    def test_add_too_long(self, dict_storage):
+        """長すぎる表記・読み方は追加不可"""
+        assert not asyncio.run(dict_storage.add(GUILD_ID, "あ" * 101, "あ"))
+        assert not asyncio.run(dict_storage.add(GUILD_ID, "あ", "あ" * 201))
+        assert not asyncio.run(dict_storage.add(GUILD_ID, "", "あ"))
+
+    def test_remove(self, dict_storage):
+        """単語を削除（無ければ失敗）"""
+        asyncio.run(dict_storage.add(GUILD_ID, "草", "くさ"))
+        assert asyncio.run(dict_storage.remove(GUILD_ID, "草"))
+        assert not asyncio.run(dict_storage.remove(GUILD_ID, "草"))
+        assert asyncio.run(dict_storage.list(GUILD_ID)) == []
+
+
+class TestTTSSettingsStorage:
+    """TTSSettingsStorage クラスのテスト"""
+
+    def test_update_keeps_db_values_before_load(self, init_db):
+        """一括読み込み前に書き込んでも、DB にある他の設定をデフォルト値で上書きしない"""
+        from pyfiles.services.storage.tts_settings import TTSSettingsStorage
+        from pyfiles.services.tts_queue import DROP_NEWEST
+
+        asyncio.run(TTSSettingsStorage(init_db).set_queue_policy(GUILD_ID, 5, 30.0, DROP_NEWEST))
+
+        storage = TTSSettingsStorage(init_db)
+        asyncio.run(storage.set_enabled(GUILD_ID, True))
+        settings = asyncio.run(storage.get(GUILD_ID))
+
+        assert settings["enabled"] is True
+        assert settings["queue_max"] == 5
+        assert settings["overflow_policy"] == DROP_NEWEST
+
+    def test_update_after_load(self, init_db):
+        """読み込み済みならメモリ上の設定に変更分だけ重ねる"""
+        from pyfiles.services.storage.tts_settings import TTSSettingsStorage
+
+        storage = TTSSettingsStorage(init_db)
+        asyncio.run(storage.load_all())
+        asyncio.run(storage.set_enabled(GUILD_ID, True))
+
+        assert storage.get_cached(GUILD_ID)["enabled"] is True
+        assert storage.get_cached(GUILD_ID)["queue_max"] == storage._defaults()["queue_max"]
+
+
+class TestDBInitializer:
+    """DBInitializer クラスのテスト"""
+
+    def test_voice_cache(self, init_db):
+        """2回目からはキャッシュから返し、設定を変えたら読み直す"""
+        from pyfiles.services.storage.init_db import DBInitializer, DEFAULT_VOICE
+        db = DBInitializer(init_db)
+
+        assert asyncio.run(db.get_user_voice(GUILD_ID, 1)) == DEFAULT_VOICE
+        assert asyncio.run(db.get_user_voice(GUILD_ID, 1)) == DEFAULT_VOICE
+        asyncio.run(db.set_user_voice(GUILD_ID, 1, "voicevox", 3, 1.2, 0.1))
+        assert asyncio.run(db.get_user_voice(GUILD_ID, 1)) == ("voicevox", 3, 1.2, 0.1)
+
+        stats = db.voice_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_stale_read_is_not_cached(self, init_db):
+        """読み込み中に設定が変わったら、読み込んだ古い値はキャッシュしない"""
+        from pyfiles.services.storage.init_db import DBInitializer, DEFAULT_VOICE
+        db = DBInitializer(init_db)
+        fetchone = db.db.fetchone
+
+        async def main():
+            started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_fetchone(*args):
+                row = await fetchone(*args)
+                started.set()
+                await release.wait()
+                return row
+
+            db.db.fetchone = slow_fetchone
+            reading = asyncio.create_task(db.get_user_voice(GUILD_ID, 1))
+            await started.wait()
+            await db.set_user_voice(GUILD_ID, 1, "voicevox", 3)
+            release.set()
+            stale = await reading
+
+            db.db.fetchone = fetchone
+            return stale, await db.get_user_voice(GUILD_ID, 1)
+
+        stale, fresh = asyncio.run(main())
+        assert stale == DEFAULT_VOICE
+        assert fresh == ("voicevox", 3, 1.0, 0.0)
+
+    def test_import_legacy(self, init_db, tmp_path):
+        """以前の DB の音声設定と TTS 設定を取り込み、既にある行は上書きしない"""
+        import sqlite3
+        from pyfiles.services.storage.init_db import DBInitializer
+        legacy_path = str(tmp_path / "flandre_bot.db")
+        legacy = sqlite3.connect(legacy_path)
+        legacy.executescript("""
+            CREATE TABLE tts_voice_profiles (
+                guild_id INTEGER, user_id INTEGER, engine TEXT,
+                speaker_id INTEGER, speed REAL, pitch REAL
+            );
+            CREATE TABLE tts_settings (guild_id INTEGER, enabled INTEGER, speaker_id INTEGER);
+            INSERT INTO tts_voice_profiles VALUES (67890, 1, 'voicevox', 3, 1.2, 0.1);
+            INSERT INTO tts_voice_profiles VALUES (67890, 2, 'voicevox', 8, 1.0, 0.0);
+            INSERT INTO tts_settings VALUES (67890, 0, 5);
+        """)
+        legacy.commit()
+        legacy.close()
+
+        db = DBInitializer(init_db)
+        asyncio.run(db.set_user_voice(GUILD_ID, 2, "openjtalk", 1))
+
+        assert asyncio.run(db.import_legacy(legacy_path)) == 2
+        assert asyncio.run(db.import_legacy(legacy_path)) == 0
+        assert asyncio.run(db.get_user_voice(GUILD_ID, 1)) == ("voicevox", 3, 1.2, 0.1)
+        assert asyncio.run(db.get_user_voice(GUILD_ID, 2)) == ("openjtalk", 1, 1.0, 0.0)
+        row = asyncio.run(db.db.fetchone(
+            "SELECT enabled, speaker_id, queue_max FROM tts_settings WHERE guild_id=?",
+            (GUILD_ID,)
+        ))
+        assert tuple(row) == (0, 5, 20)
@@ -0,0 +1,648 @@
+"""
+services/tts.py のテスト
+"""
+import pytest
+
+
+class TestSplitText:
+    """split_text 関数のテスト"""
+
+    def test_split_at_sentence_end(self):
+        """文末記号で区切る"""
+        from services.tts import split_text
+        chunks = split_text("ふらんさんへのリプライ。今日はいい天気ですね！明日も晴れるといいな")
+        assert chunks == [
+            "ふらんさんへのリプライ。",
+            "今日はいい天気ですね！",
+            "明日も晴れるといいな",
+        ]
+
+    def test_merge_short_sentences(self):
+        """短すぎる文は次とまとめる"""
+        from services.tts import split_text
+        assert split_text("おはよう。w。草。") == ["おはよう。w。草。"]
+
+    def test_split_long_sentence_at_comma(self):
+        """長すぎる文は読点で区切る"""
+        from services.tts import split_text
+        text = "これは長い文章で、読点がいくつかあって、とても長くなってしまったので、途中で区切られるはずです"
+        chunks = split_text(text)
+        assert len(chunks) == 2
+        assert chunks[0].endswith("、")
+        assert "".join(chunks) == text
+
+    def test_split_without_break(self):
+        """区切れる場所がなければ max_len で切る"""
+        from services.tts import split_text
+        chunks = split_text("あ" * 100, max_len=40)
+        assert [len(c) for c in chunks] == [40, 40, 20]
+
+    def test_keeps_all_text(self):
+        """分割してもテキストは失われない"""
+        from services.tts import split_text
+        text = "a。bb！ccc？dddd\neeeee、ffffff"
+        assert "".join(split_text(text)) == text
+
+
+class TestSanitizeSentences:
+    """sanitize_sentences 関数のテスト"""
+
+    def test_keeps_sentence_boundaries(self):
+        """文の区切りが「。」として残る"""
+        from services.tts import sanitize_sentences
+        text = "おはよう? https://example.com 今日は(晴れ)。"
+        assert sanitize_sentences(text) == "おはよう。今日は晴れ"
+
+    def test_mention_is_not_split(self):
+        """<@!id> の「!」で区切らず、表示名にする"""
+        from services.tts import sanitize_sentences
+
+        class Member:
+            display_name = "れみりあ"
+
+        class Guild:
+            def get_member(self, uid):
+                return Member() if uid == 42 else None
+
+        assert sanitize_sentences("<@!42> おはよう", Guild()) == "れみりあさん おはよう"
+
+    def test_url_with_question_mark(self):
+        """「?」「!」を含む URL も丸ごと消す"""
+        from services.tts import sanitize_sentences
+        assert sanitize_sentences(
+            "見て https://www.youtube.com/watch?v=dQw4w9WgXcQ です"
+        ) == "見て です"
+        assert sanitize_sentences("https://x.com/search?q=flandre!") == ""
+
+    def test_truncates_whole_message(self):
+        """長さの上限はメッセージ全体にかける"""
+        from services.tts import sanitize_sentences, MAX_TEXT_LEN
+        assert len(sanitize_sentences("あいうえお。" * 100)) == MAX_TEXT_LEN
+
+
+class TestSanitizeText:
+    """sanitize_text 関数のテスト"""
+
+    def test_removes_markup_and_symbols(self):
+        """URL・チャンネルメンション・スタンプ・絵文字・記号を消す"""
+        from services.tts import sanitize_text
+        text = "見て https://example.com <#123> <:flan:456> 🎉 (笑)！"
+        assert sanitize_text(text) == "見て 笑！"
+
+    def test_mention_to_display_name(self):
+        """ユーザーメンションは表示名＋さんにする（表示名の絵文字も消す）"""
+        from services.tts import sanitize_text
+
+        class Member:
+            display_name = "れみりあ🦇"
+
+        class Guild:
+            def get_member(self, uid):
+                return Member() if uid == 42 else None
+
+        assert sanitize_text("<@!42> <@7> おはよう", Guild()) == "れみりあさん おはよう"
+        assert sanitize_text("<@42> おはよう") == "おはよう"
+
+    def test_truncates(self):
+        """最大文字数で切り詰める"""
+        from services.tts import sanitize_text, MAX_TEXT_LEN
+        assert sanitize_text("あ" * 300) == "あ" * MAX_TEXT_LEN
+
+
+def _wav_bytes(samples: int = 2400):
+    """VOICEVOX が返すような 24kHz の WAV"""
+    import io
+    import numpy as np
+    import soundfile as sf
+    buffer = io.BytesIO()
+    sf.write(buffer, np.full(samples, 1000, dtype=np.int16), 24000,
+             format="WAV", subtype="PCM_16")
+    buffer.seek(0)
+    return buffer
+
+
+class FakeVoicevox:
+    """合成した回数を数える VOICEVOX の代わり"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def synthesize(self, text, speaker_id, speed=1.0, pitch=0.0):
+        self.calls.append(text)
+        return _wav_bytes()
+
+
+class TestPrepareChunks:
+    """prepare_chunks 関数のテスト"""
+
+    def test_dictionary_before_sanitize(self):
+        """記号を含む表記もサニタイズで消える前に置き換える"""
+        from services.tts import prepare_chunks
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary([
+            ("C++", "シープラスプラス"), ("Re:ゼロ", "リゼロ"), ("w(ﾟДﾟ)w", "おおお")
+        ])
+
+        assert prepare_chunks("C++むずい", dictionary=dictionary) == ["シープラスプラスむずい"]
+        assert prepare_chunks("Re:ゼロ見た", dictionary=dictionary) == ["リゼロ見た"]
+        assert prepare_chunks("w(ﾟДﾟ)w すごい", dictionary=dictionary) == ["おおお すごい"]
+
+    def test_long_url_is_not_split(self):
+        """チャンクの長さで URL が途中から切れて読まれない"""
+        from services.tts import prepare_chunks
+        assert prepare_chunks("https://example.com/" + "a" * 60) == []
+        assert prepare_chunks("見て https://example.com/" + "a" * 60 + " すごい") == ["見て すごい"]
+
+    def test_caps_whole_message(self):
+        """長いメッセージも合計 MAX_TEXT_LEN 文字で打ち切る"""
+        from services.tts import prepare_chunks, MAX_TEXT_LEN
+        chunks = prepare_chunks("あ" * 500)
+        assert sum(len(c) for c in chunks) == MAX_TEXT_LEN
+
+    def test_sanitized_text_is_not_changed(self):
+        """サニタイズ済みのテキストには辞書を当て直さず、「。」だけ落とす"""
+        from services.tts import prepare_chunks
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary([("咲夜", "さくや")])
+
+        assert prepare_chunks("咲夜さんおはよう。", dictionary=dictionary,
+                              sanitized=True) == ["咲夜さんおはよう"]
+
+
+class TestRenderAudio:
+    """render_audio 関数のテスト"""
+
+    def test_engine_name_is_case_insensitive(self):
+        """"Voicevox" の音声設定も VOICEVOX で合成し、同じキーでキャッシュする"""
+        import asyncio
+        from types import SimpleNamespace
+        from services.audio_cache import AudioCache, make_key
+        from services.tts import render_audio
+
+        bot = SimpleNamespace(audio_cache=AudioCache(), voicevox=FakeVoicevox())
+        asyncio.run(render_audio(bot, 1, "こんにちは", "Voicevox", 3, 1.0, 0.0))
+        asyncio.run(render_audio(bot, 1, "こんにちは", "voicevox", 3, 1.0, 0.0))
+
+        assert bot.voicevox.calls == ["こんにちは"]
+        assert make_key("voicevox", 3, 1.0, 0.0, "こんにちは") in bot.audio_cache
+
+    def test_pcm_hit_is_encoded_once_opus_is_loaded(self, monkeypatch):
+        """Opus が読み込まれる前に置いた PCM は、次のヒットでエンコードして置き直す"""
+        import asyncio
+        import numpy as np
+        from types import SimpleNamespace
+        import services.tts as tts
+        from services.audio import OpusClip
+        from services.audio_cache import AudioCache, make_key
+
+        bot = SimpleNamespace(audio_cache=AudioCache(), voicevox=FakeVoicevox())
+        key = make_key("voicevox", 3, 1.0, 0.0, "こんにちは")
+        bot.audio_cache.put(key, np.zeros((960, 2), dtype=np.int16))
+
+        monkeypatch.setattr(tts, "opus_available", lambda: True)
+        monkeypatch.setattr(tts, "encode_opus", lambda pcm: OpusClip.pack([b"x"]))
+        clip = asyncio.run(tts.render_audio(bot, 1, "こんにちは", "voicevox", 3, 1.0, 0.0))
+
+        assert isinstance(clip, OpusClip)
+        assert bot.audio_cache.get(key) is clip
+        # 合成し直してはいない
+        assert bot.voicevox.calls == []
+
+
+class TestSchedulePrerender:
+    """schedule_prerender 関数のテスト"""
+
+    def test_member_tasks_are_tracked(self):
+        """メンバー単位の先読みタスクは終わるまで参照を持っておく"""
+        import asyncio
+        from types import SimpleNamespace
+        from services.audio_cache import AudioCache
+        from services.tts import schedule_prerender
+        from services.tts_dictionary import TTSDictionary
+
+        class VoiceClient:
+            def is_connected(self):
+                return True
+
+        class DB:
+            async def get_user_voice(self, guild_id, user_id):
+                return "voicevox", 3, 1.0, 0.0
+
+        member = SimpleNamespace(
+            id=7, bot=False, display_name="さくや", voice=SimpleNamespace(channel=object())
+        )
+        guild = SimpleNamespace(id=1, voice_client=VoiceClient())
+        bot = SimpleNamespace(
+            audio_cache=AudioCache(), voicevox=FakeVoicevox(),
+            db_initializer=DB(), member_prerender_tasks={},
+            tts_dictionaries={1: TTSDictionary([("さくや", "咲夜")])}
+        )
+
+        async def main():
+            schedule_prerender(bot, guild, members=[member])
+            (task,) = bot.member_prerender_tasks[1]
+            await task
+            return task
+
+        asyncio.run(main())
+        assert bot.member_prerender_tasks[1] == set()
+        # 辞書を当てたテキスト（TTS ワーカーと同じキー）で先読みする
+        assert bot.voicevox.calls == ["咲夜さんが接続しました", "咲夜さんが退出しました"]
+
+
+class FakeVoiceClient:
+    """
+    VoiceClient の代わり
+
+    play() は after を別スレッドから呼ぶ（discord.py の再生スレッドと同じ）。
+    auto_finish=False なら stop() されるまで再生が終わらない
+    """
+
+    def __init__(self, auto_finish=True, error=None):
+        self.auto_finish = auto_finish
+        self.error = error
+        self.connected = True
+        self.played = []
+        self._after = None
+
+    def is_connected(self):
+        return self.connected
+
+    def is_playing(self):
+        return self._after is not None
+
+    def play(self, source, after=None):
+        self.played.append(source)
+        self._after = after
+        if self.auto_finish:
+            self._finish(self.error)
+
+    def stop(self):
+        self._finish(None)
+
+    def _finish(self, error):
+        import threading
+        after, self._after = self._after, None
+        if after is not None:
+            threading.Thread(target=after, args=(error,)).start()
+
+
+def _make_worker_bot(vc, guild_id=1):
+    """tts_worker を動かすための最小限の Bot"""
+    import asyncio
+    from types import SimpleNamespace
+    from services.audio_cache import AudioCache
+    from services.tts_dictionary import TTSDictionary
+
+    class DB:
+        async def get_user_voice(self, guild_id, user_id):
+            return "voicevox", 3, 1.0, 0.0
+
+    guild = SimpleNamespace(id=guild_id, voice_client=vc, get_member=lambda uid: None)
+    ready = asyncio.Event()
+    ready.set()
+    return SimpleNamespace(
+        tts_queues={}, playback_queues={}, tts_streams={}, tts_prefetch=3,
+        tts_ready=ready, audio_cache=AudioCache(), voicevox=FakeVoicevox(),
+        db_initializer=DB(), tts_dictionaries={guild_id: TTSDictionary()},
+        get_guild=lambda gid: guild if gid == guild_id else None
+    )
+
+
+async def _until(condition, timeout=2.0):
+    """条件を満たすまで待つ"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+class TestSkip:
+    """skip_tts 関数のテスト"""
+
+    def test_skip_drops_rest_of_message(self):
+        """スキップするとメッセージの残りのチャンクも読まない"""
+        import asyncio
+        from services.tts import skip_tts, tts_worker
+        from services.tts_queue import TTSQueue, make_request
+
+        vc = FakeVoiceClient(auto_finish=False)
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            # 先読みを1件にして、3つめのチャンクが合成済みのまま再生キューの空きを待つ状態にする
+            bot.tts_prefetch = 1
+            queue = bot.tts_queues[1] = TTSQueue()
+            worker = asyncio.create_task(tts_worker(bot, 1))
+            try:
+                queue.put_nowait(make_request("一文目です。二文目です。三文目です。", 7))
+                await _until(lambda: len(vc.played) == 1)
+
+                skip_tts(bot, 1, vc)
+                await asyncio.sleep(0.2)
+                assert len(vc.played) == 1
+
+                # ワーカーは止まらず、次のメッセージは読む
+                queue.put_nowait(make_request("次のメッセージです", 7))
+                await _until(lambda: len(vc.played) == 2)
+                assert not worker.done()
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(main())
+
+
+def _pcm_clip(frames=5):
+    """20ms フレーム単位の無音クリップ"""
+    import numpy as np
+    return np.zeros((960 * frames, 2), dtype=np.int16)
+
+
+class TestPlayAndWait:
+    """play_and_wait 関数のテスト"""
+
+    def test_waits_for_after_callback(self):
+        """再生スレッドから after が呼ばれるまで戻らない"""
+        import asyncio
+        from services.tts import play_and_wait
+
+        vc = FakeVoiceClient(auto_finish=False)
+
+        async def main():
+            playing = asyncio.create_task(play_and_wait(vc, _pcm_clip()))
+            await _until(lambda: vc.is_playing())
+            await asyncio.sleep(0.05)
+            assert not playing.done()
+
+            vc.stop()
+            await asyncio.wait_for(playing, 1.0)
+
+        asyncio.run(main())
+        assert len(vc.played) == 1
+
+    def test_reraises_player_error(self):
+        """再生スレッドで起きたエラーをそのまま送出する"""
+        import asyncio
+        from services.tts import play_and_wait
+
+        vc = FakeVoiceClient(error=RuntimeError("opus error"))
+        with pytest.raises(RuntimeError, match="opus error"):
+            asyncio.run(play_and_wait(vc, _pcm_clip()))
+
+    def test_disconnect_during_clip(self, monkeypatch):
+        """after が来ないまま切断されていたら、再生を止めて ConnectionError"""
+        import asyncio
+        import services.tts as tts
+
+        monkeypatch.setattr(tts, "PLAYBACK_GRACE", 0.05)
+        vc = FakeVoiceClient(auto_finish=False)
+
+        async def main():
+            playing = asyncio.create_task(tts.play_and_wait(vc, _pcm_clip()))
+            await _until(lambda: vc.is_playing())
+            vc.connected = False
+            await asyncio.wait_for(playing, 1.0)
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(main())
+        assert not vc.is_playing()
+
+    def test_keeps_waiting_while_connected(self, monkeypatch):
+        """クリップの長さを過ぎても、接続中なら after を待ち続ける"""
+        import asyncio
+        import services.tts as tts
+
+        monkeypatch.setattr(tts, "PLAYBACK_GRACE", 0.05)
+        vc = FakeVoiceClient(auto_finish=False)
+
+        async def main():
+            playing = asyncio.create_task(tts.play_and_wait(vc, _pcm_clip()))
+            await asyncio.sleep(0.3)
+            assert not playing.done()
+
+            vc.stop()
+            await asyncio.wait_for(playing, 1.0)
+
+        asyncio.run(main())
+
+
+class TestPlaybackWorker:
+    """playback_worker 関数のテスト"""
+
+    def test_continues_after_player_error(self):
+        """再生エラーが起きても次のクリップを再生する"""
+        import asyncio
+        from services.tts import playback_worker
+
+        vc = FakeVoiceClient(error=RuntimeError("opus error"))
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            queue = asyncio.Queue()
+            worker = asyncio.create_task(playback_worker(bot, 1, queue))
+            try:
+                queue.put_nowait(_pcm_clip())
+                queue.put_nowait(_pcm_clip())
+                await asyncio.wait_for(queue.join(), 1.0)
+                assert not worker.done()
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(main())
+        assert len(vc.played) == 2
+
+    def test_drops_clips_while_disconnected(self):
+        """VC に接続していなければ再生せずに読み捨てる"""
+        import asyncio
+        from services.tts import playback_worker
+
+        vc = FakeVoiceClient()
+        vc.connected = False
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            queue = asyncio.Queue()
+            worker = asyncio.create_task(playback_worker(bot, 1, queue))
+            try:
+                queue.put_nowait(_pcm_clip())
+                await asyncio.wait_for(queue.join(), 1.0)
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(main())
+        assert vc.played == []
+
+
+class TestTTSWorker:
+    """tts_worker 関数のテスト"""
+
+    def test_plays_chunks_in_order(self):
+        """メッセージをチャンクに分けて合成し、順番どおりに1つずつ再生する"""
+        import asyncio
+        from services.tts import tts_worker
+        from services.tts_queue import TTSQueue, make_request
+
+        vc = FakeVoiceClient()
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            queue = bot.tts_queues[1] = TTSQueue()
+            worker = asyncio.create_task(tts_worker(bot, 1))
+            try:
+                queue.put_nowait(make_request("一文目です。二文目です。三文目です。", 7))
+                await _until(lambda: len(vc.played) == 3)
+                await asyncio.wait_for(bot.playback_queues[1].join(), 1.0)
+                return bot
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        bot = asyncio.run(main())
+        assert bot.voicevox.calls == ["一文目です", "二文目です", "三文目です"]
+        # ワーカーを止めると再生ステージも片付く
+        assert bot.playback_queues == {}
+
+    def test_disconnect_during_clip(self, monkeypatch):
+        """再生中に切断されても残りは読み捨て、再接続後のメッセージは読む"""
+        import asyncio
+        import services.tts as tts
+        from services.tts_queue import TTSQueue, make_request
+
+        monkeypatch.setattr(tts, "PLAYBACK_GRACE", 0.05)
+        vc = FakeVoiceClient(auto_finish=False)
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            queue = bot.tts_queues[1] = TTSQueue()
+            worker = asyncio.create_task(tts.tts_worker(bot, 1))
+            try:
+                queue.put_nowait(make_request("一文目です。二文目です。三文目です。", 7))
+                await _until(lambda: len(vc.played) == 1)
+
+                # after が来ないまま切断される
+                vc.connected = False
+                await asyncio.wait_for(queue.join(), 1.0)
+                await asyncio.wait_for(bot.playback_queues[1].join(), 1.0)
+                assert len(vc.played) == 1
+
+                vc.connected = True
+                vc.auto_finish = True
+                queue.put_nowait(make_request("次のメッセージです", 7))
+                await _until(lambda: len(vc.played) == 2)
+                assert not worker.done()
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(main())
+
+
+class FakeWarmUpVoicevox:
+    """ウォームアップの呼び出しを記録する VOICEVOX の代わり"""
+
+    def __init__(self, init_delay=0.0):
+        self.init_delay = init_delay
+        self.voice_dict = {}
+        self.loaded = []
+
+    async def initialize(self):
+        import asyncio
+        await asyncio.sleep(self.init_delay)
+        self.voice_dict = {3: "ずんだもん", 8: "春日部つむぎ"}
+
+    async def initialize_speaker(self, speaker_id):
+        self.loaded.append(speaker_id)
+
+
+def _make_warm_up_bot(pool, voicevox):
+    """warm_up_engines を動かすための最小限の Bot"""
+    import asyncio
+    from types import SimpleNamespace
+
+    class DB:
+        async def get_used_speakers(self, engine):
+            return [3, 8]
+
+    return SimpleNamespace(
+        tts_pool=pool, voicevox=voicevox, db_initializer=DB(),
+        tts_ready=asyncio.Event()
+    )
+
+
+class TestWarmUpEngines:
+    """warm_up_engines 関数のテスト"""
+
+    def test_warms_pool_and_voicevox(self):
+        """プールのワーカーと、音声設定で使われている VOICEVOX の話者を温める"""
+        import asyncio
+        from services.tts import warm_up_engines, WARMUP_TEXT
+
+        class Pool:
+            def __init__(self):
+                self.texts = []
+
+            async def warm_up(self, text):
+                self.texts.append(text)
+                return [0.1, 0.2]
+
+        async def main():
+            bot = _make_warm_up_bot(Pool(), FakeWarmUpVoicevox())
+            await warm_up_engines(bot, timeout=1.0)
+            return bot
+
+        bot = asyncio.run(main())
+        assert bot.tts_pool.texts == [WARMUP_TEXT]
+        assert sorted(bot.voicevox.loaded) == [3, 8]
+        assert bot.tts_ready.is_set()
+
+    def test_failed_and_timed_out_steps(self):
+        """失敗やタイムアウトした手順があっても待ち続けず、tts_ready をセットする"""
+        import asyncio
+        from services.tts import warm_up_engines
+
+        class Pool:
+            async def warm_up(self, text):
+                raise RuntimeError("worker died")
+
+        async def main():
+            bot = _make_warm_up_bot(Pool(), FakeWarmUpVoicevox(init_delay=10.0))
+            await asyncio.wait_for(warm_up_engines(bot, timeout=0.05), 1.0)
+            return bot
+
+        bot = asyncio.run(main())
+        assert bot.voicevox.loaded == []
+        assert bot.tts_ready.is_set()
+
+    def test_worker_waits_for_ready(self):
+        """tts_worker はウォームアップが終わるまで読み上げを始めない"""
+        import asyncio
+        from services.tts import tts_worker
+        from services.tts_queue import TTSQueue, make_request
+
+        vc = FakeVoiceClient()
+
+        async def main():
+            bot = _make_worker_bot(vc)
+            bot.tts_ready.clear()
+            queue = bot.tts_queues[1] = TTSQueue()
+            worker = asyncio.create_task(tts_worker(bot, 1))
+            try:
+                queue.put_nowait(make_request("おはようございます", 7))
+                await asyncio.sleep(0.1)
+                assert bot.voicevox.calls == []
+                assert vc.played == []
+
+                bot.tts_ready.set()
+                await _until(lambda: len(vc.played) == 1)
+                return bot
+            finally:
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+
+        bot = asyncio.run(main())
+        assert bot.voicevox.calls == ["おはようございます"]
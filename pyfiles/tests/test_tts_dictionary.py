@@ -0,0 +1,50 @@
+"""
+services/tts_dictionary.py のテスト
+"""
+import pytest
+
+
+class TestTTSDictionary:
+    """TTSDictionary クラスのテスト"""
+
+    def test_replace(self):
+        """表記を読み方に置き換える"""
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary([("擬音語", "ぎおんご"), ("w", "わら")])
+        assert dictionary.apply("擬音語ですw") == "ぎおんごですわら"
+        assert dictionary.apply("なにもない") == "なにもない"
+
+    def test_longest_match_first(self):
+        """同じ位置から始まる表記は長いほうを優先する"""
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary([("東京", "とうきょう"), ("東京都", "とうきょうと")])
+        assert dictionary.apply("東京都と東京") == "とうきょうとととうきょう"
+
+    def test_leftmost_match_first(self):
+        """重なる表記は左から始まるほうを優先する"""
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary([("ab", "X"), ("bcd", "Y"), ("c", "Z")])
+        assert dictionary.apply("abcd") == "XZd"
+        assert dictionary.apply("xbcd") == "xY"
+
+    def test_add_and_remove(self):
+        """追加・削除が次の置換から反映される"""
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary()
+        assert dictionary.apply("草") == "草"
+
+        dictionary.add("草", "くさ")
+        assert dictionary.apply("草") == "くさ"
+
+        dictionary.add("草", "わら")
+        assert dictionary.apply("草") == "わら"
+
+        dictionary.remove("草")
+        assert dictionary.apply("草") == "草"
+        assert len(dictionary) == 0
+
+    def test_many_entries(self):
+        """登録数が多くても正しく置き換える"""
+        from services.tts_dictionary import TTSDictionary
+        dictionary = TTSDictionary((f"単語{i}", f"たんご{i}") for i in range(3000))
+        assert dictionary.apply("単語12と単語2999") == "たんご12とたんご2999"
@@ -0,0 +1,88 @@
+"""
+services/tts_frontend.py のテスト
+"""
+import pytest
+
+# "こんにちは" 相当のフルコンテキストラベル（音素部分以外は省略）
+LABELS = [
+    "xx^xx-sil+k=o/A:xx",
+    "xx^sil-k+o=N/A:-4",
+    "sil^k-o+N=n/A:-4",
+    "k^o-N+n=i/A:-3",
+    "o^N-n+i=ch/A:-2",
+    "N^n-i+ch=i/A:-2",
+    "n^i-ch+i=w/A:-1",
+    "i^ch-i+w=a/A:-1",
+    "ch^i-w+a=pau/A:0",
+    "i^w-a+pau=xx/A:0",
+    "w^a-pau+sil=xx/A:xx",
+    "a^pau-sil+xx=xx/A:xx",
+]
+
+
+class TestEstimateDuration:
+    """テキストからの発話時間の見積もりのテスト"""
+
+    def test_estimate_text_duration(self):
+        """かなは1モーラ（小書きは数えない）、漢字は2モーラ、句読点はポーズ"""
+        from services.tts_frontend import (
+            estimate_text_duration, VOWEL_SECONDS, CONSONANT_SECONDS, PAUSE_SECONDS
+        )
+        mora = VOWEL_SECONDS + CONSONANT_SECONDS
+        assert estimate_text_duration("きょう、晴れ") == pytest.approx(
+            mora * 5 + PAUSE_SECONDS
+        )
+        assert estimate_text_duration("あいう", speed=2.0) == pytest.approx(mora * 3 / 2)
+        assert estimate_text_duration("") == 0.0
+
+    def test_half_tone(self):
+        """ピッチ設定を半音単位にする"""
+        from services.tts_frontend import half_tone
+        assert half_tone(0.0) == 0.0
+        assert half_tone(0.5) == 6.0
+        assert half_tone(None) == 0.0
+
+
+class TestLabelCache:
+    """LabelCache クラスのテスト"""
+
+    def test_reuses_analysis(self, monkeypatch):
+        """正規化して同じテキストは解析し直さない"""
+        import pyopenjtalk
+        from services.tts_frontend import LabelCache
+        calls = []
+
+        def extract(text):
+            calls.append(text)
+            return list(LABELS)
+
+        monkeypatch.setattr(pyopenjtalk, "extract_fullcontext", extract)
+        cache = LabelCache(max_entries=2)
+
+        assert cache.labels("こんにちは") == tuple(LABELS)
+        assert cache.labels(" こんにちは ") == tuple(LABELS)
+        assert calls == ["こんにちは"]
+        assert cache.stats()["hits"] == 1
+
+    def test_evicts_least_recently_used(self, monkeypatch):
+        """上限を超えたら一番使われていないものから消す"""
+        import pyopenjtalk
+        from services.tts_frontend import LabelCache
+        calls = []
+
+        def extract(text):
+            calls.append(text)
+            return [text]
+
+        monkeypatch.setattr(pyopenjtalk, "extract_fullcontext", extract)
+        cache = LabelCache(max_entries=2)
+
+        cache.labels("a")
+        cache.labels("b")
+        cache.labels("a")
+        cache.labels("c")  # b が消える
+        cache.labels("a")
+        cache.labels("b")
+
+        assert calls == ["a", "b", "c", "b"]
+        assert len(cache) == 2
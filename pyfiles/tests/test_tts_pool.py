@@ -0,0 +1,100 @@
+"""
+services/tts_pool.py のテスト
+"""
+import pytest
+
+
+@pytest.fixture
+def pool():
+    """3ワーカー・共有メモリ 4096 バイトの OpenJTalkPool（ワーカーは最初のジョブで起動する）"""
+    from services.tts_pool import OpenJTalkPool
+    pool = OpenJTalkPool(3, slot_bytes=4096)
+    yield pool
+    pool.shutdown()
+
+
+class TestOpenJTalkPool:
+    """OpenJTalkPool のワーカー選択のテスト"""
+
+    def test_prefers_routed_worker(self, pool):
+        """担当ワーカーが空いていればそれを使う"""
+        guild_id = 5 << 22
+        assert pool.pick(guild_id) == pool.route(guild_id) == 2
+        assert pool.rerouted == 0
+
+    def test_falls_back_to_least_loaded(self, pool):
+        """担当ワーカーが埋まっていれば一番空いているワーカーへ回す"""
+        guild_id = 5 << 22
+        pool._pending[:] = [1, 0, 2]
+        assert pool.pick(guild_id) == 1
+        assert pool.rerouted == 1
+
+    def test_keeps_routed_worker_on_tie(self, pool):
+        """どこも同じだけ埋まっていれば担当ワーカーのまま"""
+        guild_id = 5 << 22
+        pool._pending[:] = [1, 1, 1]
+        assert pool.pick(guild_id) == 2
+        assert pool.rerouted == 0
+
+
+@pytest.fixture
+def fake_openjtalk(monkeypatch):
+    """
+    辞書を読み込まない pyopenjtalk の代わり
+
+    ラベルは1文字1つ、波形はラベル1つにつき 100 サンプル（48kHz）にする。
+    ワーカーは fork で起動するので、差し替えはワーカープロセスにも効く
+    """
+    import multiprocessing
+    import numpy as np
+    import pyopenjtalk
+
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("ワーカーへ差し替えを引き継ぐには fork が必要")
+
+    def synthesize(labels, speed=1.0, half_tone=0.0):
+        wav = np.sin(np.arange(len(labels) * 100) * (0.1 + half_tone / 100))
+        return wav * speed, 48000
+
+    monkeypatch.setattr(pyopenjtalk, "extract_fullcontext", lambda text: list(text))
+    monkeypatch.setattr(pyopenjtalk, "synthesize", synthesize)
+    monkeypatch.setattr(pyopenjtalk, "tts", lambda text: (np.zeros(1), 48000))
+
+
+class TestOpenJTalkPoolJobs:
+    """ワーカープロセスで合成するジョブのテスト"""
+
+    def test_synthesize(self, pool, fake_openjtalk):
+        """共有メモリに入る結果も入らない結果も、親プロセスで合成したものと同じになる"""
+        import asyncio
+        import numpy as np
+        from services.tts_pool import synthesize_text
+
+        short = "あい"  # 1フレーム（3840 バイト）で共有メモリに入る
+        long = "あ" * 20  # 共有メモリ（4096 バイト）に入らず bytes で返る
+
+        async def main():
+            return await asyncio.gather(
+                pool.synthesize(short, 5 << 22, 1.0, 0.0),
+                pool.synthesize(long, 5 << 22, 1.0, 0.0),
+                pool.synthesize(short, 6 << 22, 1.2, 3.0),
+            )
+
+        results = asyncio.run(main())
+        expected = [
+            synthesize_text(short),
+            synthesize_text(long),
+            synthesize_text(short, 1.2, 3.0),
+        ]
+
+        assert len(results[1]) * 4 > 4096
+        for pcm, want in zip(results, expected):
+            assert pcm.dtype == np.int16
+            np.testing.assert_array_equal(pcm, want)
+        assert pool.completed == 3
+        assert pool.queue_depth() == [0, 0, 0]
+
+    def test_warm_up(self, pool, fake_openjtalk):
+        """全ワーカーを起動して、ワーカーごとの時間を返す"""
+        import asyncio
+        assert len(asyncio.run(pool.warm_up())) == 3
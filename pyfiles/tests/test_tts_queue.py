@@ -0,0 +1,90 @@
+"""
+services/tts_queue.py のテスト
+"""
+import asyncio
+import pytest
+
+
+def _drain(queue):
+    """キューの中身を user_id のリストで返す"""
+    return [item.user_id for item in list(queue._queue)]
+
+
+class TestTTSQueue:
+    """TTSQueue クラスのテスト"""
+
+    def test_drop_oldest(self):
+        """上限を超えたら一番古いものを捨てる"""
+        from services.tts_queue import TTSQueue, make_request, DROP_OLDEST
+        queue = TTSQueue(max_size=2, ttl=0, policy=DROP_OLDEST)
+
+        for uid in (1, 2, 3):
+            queue.put_nowait(make_request("a", uid))
+
+        assert _drain(queue) == [2, 3]
+        assert queue.dropped["overflow"] == 1
+
+    def test_drop_newest(self):
+        """上限を超えたら新しく来たものを捨てる"""
+        from services.tts_queue import TTSQueue, make_request, DROP_NEWEST
+        queue = TTSQueue(max_size=2, ttl=0, policy=DROP_NEWEST)
+
+        for uid in (1, 2, 3):
+            queue.put_nowait(make_request("a", uid))
+
+        assert _drain(queue) == [1, 2]
+        assert queue.dropped["overflow"] == 1
+
+    def test_per_user(self):
+        """上限を超えたら複数積んでいる人の古いものから捨てる"""
+        from services.tts_queue import TTSQueue, make_request, PER_USER
+        queue = TTSQueue(max_size=3, ttl=0, policy=PER_USER)
+
+        for uid in (1, 2, 2, 3):
+            queue.put_nowait(make_request("a", uid))
+
+        assert _drain(queue) == [1, 2, 3]
+
+    def test_per_user_all_distinct(self):
+        """全員1件ずつなら一番古いものを捨てる"""
+        from services.tts_queue import TTSQueue, make_request, PER_USER
+        queue = TTSQueue(max_size=2, ttl=0, policy=PER_USER)
+
+        for uid in (1, 2, 3):
+            queue.put_nowait(make_request("a", uid))
+
+        assert _drain(queue) == [2, 3]
+
+    def test_get_skips_expired(self):
+        """有効期限切れの要求は get で読み飛ばす"""
+        from services.tts_queue import TTSQueue, TTSRequest, make_request
+        queue = TTSQueue(max_size=10, ttl=5)
+
+        async def run():
+            queue.put_nowait(TTSRequest("古い", 1, 0.0))
+            queue.put_nowait(make_request("新しい", 2))
+            return await queue.get()
+
+        item = asyncio.run(run())
+        assert item.text == "新しい"
+        assert queue.dropped["expired"] == 1
+
+    def test_task_done_balanced(self):
+        """捨てた分も task_done されて join が終わる"""
+        from services.tts_queue import TTSQueue, make_request
+        queue = TTSQueue(max_size=1, ttl=0)
+
+        async def run():
+            queue.put_nowait(make_request("a", 1))
+            queue.put_nowait(make_request("b", 2))
+            await queue.get()
+            queue.task_done()
+            await asyncio.wait_for(queue.join(), 1)
+
+        asyncio.run(run())
+
+    def test_unknown_policy(self):
+        """未知のポリシーはエラー"""
+        from services.tts_queue import TTSQueue
+        with pytest.raises(ValueError):
+            TTSQueue(policy="unknown")
@@ -0,0 +1,115 @@
+"""
+services/tts_scheduler.py のテスト
+"""
+import asyncio
+import pytest
+
+
+class TestSynthesisScheduler:
+    """SynthesisScheduler クラスのテスト"""
+
+    def test_concurrency_limit(self):
+        """エンジンごとの同時実行数を超えない"""
+        from services.tts_scheduler import SynthesisScheduler
+        scheduler = SynthesisScheduler({"voicevox": 2})
+        running = 0
+        peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "ok"
+
+        async def run():
+            return await asyncio.gather(*[
+                scheduler.run("voicevox", gid % 3, job) for gid in range(10)
+            ])
+
+        assert asyncio.run(run()) == ["ok"] * 10
+        assert peak == 2
+
+    def test_round_robin_between_guilds(self):
+        """大量に積んだギルドがあっても、他のギルドは順番に割り込める"""
+        from services.tts_scheduler import SynthesisScheduler
+        scheduler = SynthesisScheduler({"openjtalk": 1})
+        order = []
+
+        def job(gid):
+            async def run():
+                order.append(gid)
+                await asyncio.sleep(0)
+            return run
+
+        async def run():
+            tasks = [
+                asyncio.create_task(scheduler.run("openjtalk", 1, job(1)))
+                for _ in range(5)
+            ]
+            await asyncio.sleep(0)
+            tasks += [
+                asyncio.create_task(scheduler.run("openjtalk", 2, job(2)))
+                for _ in range(2)
+            ]
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        # ギルド2は最初の1件が終わった直後から交互に実行される
+        assert order[:5] == [1, 1, 2, 1, 2]
+
+    def test_weight(self):
+        """重みの大きいギルドは1ラウンドで多く実行できる"""
+        from services.tts_scheduler import SynthesisScheduler
+        scheduler = SynthesisScheduler({"openjtalk": 1})
+        scheduler.set_weight(1, 2)
+        order = []
+
+        def job(gid):
+            async def run():
+                order.append(gid)
+                await asyncio.sleep(0)
+            return run
+
+        async def run():
+            # 全部積み終わるまで枠をふさいでおく
+            release = asyncio.Event()
+            blocker = asyncio.create_task(
+                scheduler.run("openjtalk", 9, release.wait)
+            )
+            await asyncio.sleep(0)
+
+            tasks = []
+            for _ in range(4):
+                tasks.append(asyncio.create_task(scheduler.run("openjtalk", 2, job(2))))
+                tasks.append(asyncio.create_task(scheduler.run("openjtalk", 1, job(1))))
+            await asyncio.sleep(0)
+
+            release.set()
+            await asyncio.gather(blocker, *tasks)
+
+        asyncio.run(run())
+        assert order[:6] == [2, 1, 1, 2, 1, 1]
+
+    def test_cancelled_waiter_releases_turn(self):
+        """待っている間にキャンセルされても枠が失われない"""
+        from services.tts_scheduler import SynthesisScheduler
+        scheduler = SynthesisScheduler({"voicevox": 1})
+
+        async def slow():
+            await asyncio.sleep(0.01)
+
+        async def run():
+            first = asyncio.create_task(scheduler.run("voicevox", 1, slow))
+            waiter = asyncio.create_task(scheduler.run("voicevox", 2, slow))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await first
+            await asyncio.wait_for(scheduler.run("voicevox", 3, slow), 1)
+
+        asyncio.run(run())
+        stats = scheduler.stats()["voicevox"]
+        assert stats["running"] == 0
+        assert stats["waiting"] == 0
+        assert set(stats["guilds"]) == {1, 3}
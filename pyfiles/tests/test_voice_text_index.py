@@ -0,0 +1,60 @@
+"""
+services/voice_text_index.py のテスト
+"""
+from types import SimpleNamespace
+
+import pytest
+
+
+def make_guild(voice, text, guild_id=1):
+    """(id, name) の組からテスト用のギルドを作る"""
+    return SimpleNamespace(
+        id=guild_id,
+        voice_channels=[SimpleNamespace(id=i, name=n) for i, n in voice],
+        text_channels=[SimpleNamespace(id=i, name=n) for i, n in text],
+    )
+
+
+class TestVoiceTextIndex:
+    """VoiceTextIndex クラスのテスト"""
+
+    def test_native_and_same_name(self):
+        """VC 自体と同名のテキストチャンネルが VC に対応する"""
+        from services.voice_text_index import VoiceTextIndex
+        guild = make_guild(
+            voice=[(10, "雑談"), (11, "ゲーム")],
+            text=[(20, "雑談"), (21, "お知らせ")],
+        )
+        index = VoiceTextIndex()
+
+        assert index.voice_channel_id(guild, 10) == 10
+        assert index.voice_channel_id(guild, 11) == 11
+        assert index.voice_channel_id(guild, 20) == 10
+        assert index.voice_channel_id(guild, 21) is None
+
+    def test_duplicate_names_use_first(self):
+        """同名の VC が複数あれば先のものを使う"""
+        from services.voice_text_index import VoiceTextIndex
+        guild = make_guild(voice=[(10, "雑談"), (11, "雑談")], text=[(20, "雑談")])
+        assert VoiceTextIndex().voice_channel_id(guild, 20) == 10
+
+    def test_refresh_after_rename(self):
+        """チャンネルの変更は refresh で反映される"""
+        from services.voice_text_index import VoiceTextIndex
+        guild = make_guild(voice=[(10, "雑談")], text=[(20, "雑談")])
+        index = VoiceTextIndex()
+        assert index.voice_channel_id(guild, 20) == 10
+
+        guild.text_channels[0].name = "別の名前"
+        assert index.voice_channel_id(guild, 20) == 10  # 作り直すまでは古いまま
+
+        index.refresh(guild)
+        assert index.voice_channel_id(guild, 20) is None
+
+    def test_refresh_unknown_guild(self):
+        """まだ引いていないギルドの refresh では索引を作らない"""
+        from services.voice_text_index import VoiceTextIndex
+        index = VoiceTextIndex()
+        guild = make_guild(voice=[(10, "雑談")], text=[])
+        index.refresh(guild)
+        assert index._guilds == {}
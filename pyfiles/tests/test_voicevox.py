@@ -0,0 +1,100 @@
+"""
+services/voicevox.py のテスト
+"""
+import asyncio
+import pytest
+
+
+async def _start_server():
+    """VOICEVOX の API を真似たローカルサーバー"""
+    from aiohttp import web
+
+    async def speakers(request):
+        return web.json_response([
+            {"name": "ずんだもん", "styles": [{"name": "ノーマル", "id": 3}]}
+        ])
+
+    async def audio_query(request):
+        return web.json_response({"text": request.query["text"], "speedScale": 1.0})
+
+    async def synthesis(request):
+        query = await request.json()
+        return web.Response(body=f"{query['speedScale']}".encode())
+
+    app = web.Application()
+    app.router.add_get("/speakers", speakers)
+    app.router.add_post("/audio_query", audio_query)
+    app.router.add_post("/synthesis", synthesis)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+class TestVoicevoxEngine:
+    """VoicevoxEngine クラスのテスト"""
+
+    def test_reuses_connection(self):
+        """セッションと接続を使い回す"""
+        from services.voicevox import VoicevoxEngine
+
+        async def main():
+            runner, port = await _start_server()
+            engine = VoicevoxEngine("127.0.0.1", port, pool_size=2)
+            try:
+                await engine.initialize()
+                session = engine.session
+                first = await engine.synthesize("こんにちは", 3, speed=1.5)
+                await engine.synthesize("こんばんは", 3)
+                return engine, session, first
+            finally:
+                await engine.close()
+                await runner.cleanup()
+
+        engine, session, first = asyncio.run(main())
+
+        assert first.getvalue() == b"1.5"
+        assert engine.get_id("ずんだもん") == 3
+        assert session.closed
+        stats = engine.stats()
+        assert stats["requests"] == 5
+        assert stats["created"] == 1
+        assert stats["reused"] == 4
+
+    def test_query_cache(self):
+        """同じテキスト・話者なら audio_query を呼ばず、話速はそのつど反映する"""
+        from services.voicevox import VoicevoxEngine
+
+        async def main():
+            runner, port = await _start_server()
+            engine = VoicevoxEngine("127.0.0.1", port, query_cache_size=1)
+            try:
+                slow = await engine.synthesize("ＡＢＣ ", 3, speed=0.5)
+                fast = await engine.synthesize("ABC", 3, speed=2.0)
+                cached = dict(await engine.audio_query("ABC", 3))
+                await engine.synthesize("ABC", 1)
+                return engine, slow, fast, cached
+            finally:
+                await engine.close()
+                await runner.cleanup()
+
+        engine, slow, fast, cached = asyncio.run(main())
+
+        assert slow.getvalue() == b"0.5"
+        assert fast.getvalue() == b"2.0"
+        # キャッシュの中身は話速の差し替えで書き換わらない
+        assert cached["speedScale"] == 1.0
+        stats = engine.stats()
+        assert stats["query_misses"] == 2
+        assert stats["query_hits"] == 2
+        assert stats["query_cache"] == 1
+
+    def test_close_without_session(self):
+        """一度も使っていなくても close できる"""
+        from services.voicevox import VoicevoxEngine
+        engine = VoicevoxEngine()
+        asyncio.run(engine.close())
+        assert engine.stats()["reuse_rate"] == 0.0